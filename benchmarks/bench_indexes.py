@@ -0,0 +1,98 @@
+"""Measure query latency on weather_data as the table grows (SQLite).
+
+Runs the freshness, recent-window and per-city queries used by the health
+monitor and dashboard at increasing row counts. With the timestamp and
+(city, timestamp) indexes the latency should stay flat; pass
+--compare-unindexed to also time the same queries without them.
+
+Usage:
+    python -m benchmarks.bench_indexes --sizes 100000,1000000,10000000
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from db.engine import get_engine, ensure_schema
+from db.models import Base
+
+CITIES = 1000
+
+QUERIES = {
+    "freshness_max_timestamp": "SELECT MAX(timestamp) FROM weather_data",
+    "recent_24h_ordered": "SELECT * FROM weather_data WHERE timestamp >= :since_day ORDER BY timestamp DESC",
+    "city_7d_ordered": "SELECT * FROM weather_data WHERE city = :city AND timestamp >= :since_week ORDER BY timestamp",
+}
+
+def grow_table(conn, start: int, stop: int, now: datetime):
+    """Append rows start..stop-1: one row per city per hour, going back in time"""
+    conn.execute(text("""
+        WITH RECURSIVE seq(n) AS (SELECT :start UNION ALL SELECT n + 1 FROM seq WHERE n + 1 < :stop)
+        INSERT INTO weather_data (city, temperature, humidity, weather, timestamp, province)
+        SELECT 'City ' || (n % :cities), 10 + (n % 20), 50 + (n % 50), 'clear sky',
+               strftime('%Y-%m-%d %H:%M:%S.000000', :now, '-' || (n / :cities) || ' hours'), 'Utrecht'
+        FROM seq
+    """), {"start": start, "stop": stop, "cities": CITIES, "now": now.strftime("%Y-%m-%d %H:%M:%S")})
+
+def time_queries(conn, now: datetime, repeats: int = 5) -> dict:
+    params = {
+        "since_day": now - timedelta(days=1),
+        "since_week": now - timedelta(days=7),
+        "city": "City 42",
+    }
+    timings = {}
+    for name, sql in QUERIES.items():
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            conn.execute(text(sql), params).fetchall()
+            samples.append((time.perf_counter() - start) * 1000)
+        timings[name] = round(statistics.median(samples), 3)
+    return timings
+
+def run(sizes: list, compare_unindexed: bool) -> list:
+    table = Base.metadata.tables["weather_data"]
+    now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = get_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        ensure_schema(engine)
+        rows = 0
+        for size in sorted(sizes):
+            with engine.begin() as conn:
+                grow_table(conn, rows, size, now)
+                conn.exec_driver_sql("ANALYZE")
+            rows = size
+
+            result = {"rows": rows}
+            with engine.connect() as conn:
+                result["indexed_ms"] = time_queries(conn, now)
+
+            if compare_unindexed:
+                with engine.begin() as conn:
+                    for index in table.indexes:
+                        conn.exec_driver_sql(f"DROP INDEX {index.name}")
+                with engine.connect() as conn:
+                    result["unindexed_ms"] = time_queries(conn, now, repeats=1)
+                with engine.begin() as conn:
+                    for index in table.indexes:
+                        index.create(conn)
+
+            results.append(result)
+            print(json.dumps(result))
+        engine.dispose()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100000,1000000", help="Comma-separated row counts")
+    parser.add_argument("--compare-unindexed", action="store_true")
+    args = parser.parse_args()
+    run([int(size) for size in args.sizes.split(",")], args.compare_unindexed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Compare the legacy per-call loader with the batched loader on SQLite.
+
+Usage:
+    python -m benchmarks.bench_load --rows 100000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from db.models import Base
+from etl.load import load_batch
+
+def make_frames(forecast_rows: int, cities: int = 1000) -> dict:
+    """Build synthetic weather, air quality and forecast frames"""
+    rng = np.random.default_rng(42)
+    now = datetime.utcnow()
+    city_names = [f"City {i}" for i in range(cities)]
+
+    weather = pd.DataFrame({
+        "city": city_names,
+        "temperature": rng.normal(12, 6, cities),
+        "humidity": rng.integers(30, 100, cities),
+        "weather": "clear sky",
+        "timestamp": now,
+        "province": "Utrecht",
+        "coordinates_lat": rng.uniform(50, 54, cities),
+        "coordinates_lon": rng.uniform(3, 7, cities),
+        "wind_speed": rng.uniform(0, 20, cities),
+        "wind_direction": rng.uniform(0, 360, cities),
+        "pressure": rng.normal(1013, 8, cities),
+        "visibility": 10.0,
+        "feels_like": rng.normal(11, 6, cities),
+    })
+    air_quality = pd.DataFrame({
+        "city": city_names,
+        "coordinates_lat": weather["coordinates_lat"],
+        "coordinates_lon": weather["coordinates_lon"],
+        "aqi": rng.integers(1, 6, cities),
+        **{component: rng.uniform(0, 100, cities)
+           for component in ["co", "no", "no2", "o3", "so2", "pm2_5", "pm10", "nh3"]},
+        "timestamp": now,
+    })
+    forecast = pd.DataFrame({
+        "city": np.resize(city_names, forecast_rows),
+        "forecast_date": [now + timedelta(hours=3 * (i // cities)) for i in range(forecast_rows)],
+        "temperature": rng.normal(12, 6, forecast_rows),
+        "humidity": rng.integers(30, 100, forecast_rows),
+        "weather": "light rain",
+        "created_at": now,
+    })
+    return {"weather_data": weather, "air_quality": air_quality, "weather_forecast": forecast}
+
+def legacy_load_to_sql(df: pd.DataFrame, connection_string: str, table_name: str):
+    """The original loader: new engine, create_all and default to_sql on every call"""
+    engine = create_engine(connection_string)
+    Base.metadata.create_all(engine)
+    df.to_sql(table_name, engine, if_exists="append", index=False)
+    engine.dispose()
+
+def time_call(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def run(rows: int, chunk_size: int) -> dict:
+    frames = make_frames(rows)
+    results = {"forecast_rows": rows, "chunk_size": chunk_size}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_url = f"sqlite:///{os.path.join(tmp, 'legacy.db')}"
+        batched_url = f"sqlite:///{os.path.join(tmp, 'batched.db')}"
+
+        results["legacy_seconds"] = sum(
+            time_call(legacy_load_to_sql, df, legacy_url, table_name) for table_name, df in frames.items()
+        )
+        results["batched_seconds"] = time_call(load_batch, frames, batched_url, chunk_size, "append")
+        # Re-running the same batch in merge mode should leave every row untouched
+        results["merge_rerun_seconds"] = time_call(load_batch, frames, batched_url, chunk_size, "merge")
+
+    results["speedup"] = round(results["legacy_seconds"] / results["batched_seconds"], 2)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000, help="Number of forecast rows")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.chunk_size), indent=2))
+
+if __name__ == "__main__":
+    main()
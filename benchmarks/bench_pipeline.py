@@ -0,0 +1,184 @@
+"""Measure end-to-end run_etl throughput, per-stage cost and peak memory on SQLite.
+
+Starts the fake OpenWeather API, optionally with latency and injected errors,
+and runs pipeline.run_etl once per city count. Each scenario runs in a fresh
+process so its peak memory is its own. The per-stage cost comes from the
+pipeline's own metrics registry. Extract time is summed over concurrent
+requests, so it can exceed the wall-clock time.
+
+Results are printed as JSON lines and can be written to a file. A scenario
+whose run fails or whose process dies is recorded with an "error" instead of
+its measurements. Passing an earlier file as --baseline flags throughput or
+memory regressions, and scenarios that no longer complete, and exits with
+status 1.
+
+Usage:
+    python -m benchmarks.bench_pipeline --cities 16,1000,10000 --output results.json
+    python -m benchmarks.bench_pipeline --baseline results.json --tolerance 0.2
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import tempfile
+import time
+from benchmarks.fake_openweather import free_port, configure, start_server
+
+def synthetic_cities(count: int) -> list:
+    """Registry-style cities with OpenWeather ids and coordinates matching the fake API"""
+    return [{"name": f"City {i}", "province": "Synthetic", "lat": 50.0 + (i % 400) / 100,
+             "lon": 3.0 + (i % 500) / 100, "owm_id": i + 1} for i in range(count)]
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process"""
+    try:
+        import resource
+    except ImportError:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / 2**20, 1)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (2**20 if sys.platform == "darwin" else 1024), 1)
+
+def stage_costs(summary: dict) -> dict:
+    """Condense a metrics summary into seconds spent per stage"""
+    def series(name):
+        return summary.get(name, {})
+
+    return {
+        "extract": {endpoint: {"requests": stats["count"], "seconds": stats["sum"], "p95": stats["p95"]}
+                    for endpoint, stats in series("etl_extract_seconds").items()},
+        "rate_limit_wait": {endpoint: stats["sum"] for endpoint, stats in series("etl_rate_limit_wait_seconds").items()},
+        "request_outcomes": series("etl_extract_requests_total"),
+        "transform": {table: stats["sum"] for table, stats in series("etl_transform_seconds").items()},
+        "load": {table: {"seconds": stats["sum"],
+                         "rows_per_second": round(series("etl_rows_loaded_total").get(table, 0) / stats["sum"])
+                         if stats["sum"] else None}
+                 for table, stats in series("etl_load_seconds").items()},
+    }
+
+def failed_scenario(cities: int, mode: str, error: str) -> dict:
+    return {"cities": cities, "mode": mode, "error": error}
+
+def run_scenario(base_url: str, cities: int, mode: str, results):
+    """Run one run_etl against a fresh SQLite database; executes in a child process"""
+    configure(base_url)
+    os.environ["PIPELINE_MODE"] = mode
+    os.environ["METRICS_SINKS"] = ""
+
+    import logging
+    import pipeline
+    from db.engine import get_engine
+    from monitoring.metrics import metrics
+    # Injected errors would otherwise log a line per failed request
+    logging.disable(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        connection_string = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        before = metrics.snapshot()
+        start = time.perf_counter()
+        try:
+            run = pipeline.run_etl(connection_string, synthetic_cities(cities))
+        except Exception as e:
+            results.put(failed_scenario(cities, mode, repr(e)))
+            return
+        finally:
+            get_engine(connection_string).dispose()
+        seconds = time.perf_counter() - start
+
+    if run is None:
+        results.put(failed_scenario(cities, mode, "database initialization failed"))
+        return
+    results.put({
+        "cities": cities,
+        "mode": mode,
+        "seconds": round(seconds, 3),
+        "cities_per_second": round(run["succeeded"] / seconds, 1),
+        "succeeded": run["succeeded"],
+        "failed": run["failed"],
+        "row_counts": run["row_counts"],
+        "stages": stage_costs(metrics.summarize(before)),
+        "peak_rss_mb": peak_rss_mb(),
+    })
+
+def find_regressions(results: list, baseline: list, tolerance: float) -> list:
+    """Scenarios whose throughput dropped or peak memory grew by more than tolerance"""
+    previous = {(result["cities"], result["mode"]): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result["cities"], result["mode"]))
+        if before is None or "error" in before:
+            continue
+        if "error" in result:
+            regressions.append({"cities": result["cities"], "mode": result["mode"], "metric": "error",
+                                "baseline": None, "current": result["error"]})
+            continue
+        if result["cities_per_second"] < before["cities_per_second"] * (1 - tolerance):
+            regressions.append({"cities": result["cities"], "mode": result["mode"], "metric": "cities_per_second",
+                                "baseline": before["cities_per_second"], "current": result["cities_per_second"]})
+        if result["peak_rss_mb"] > before["peak_rss_mb"] * (1 + tolerance):
+            regressions.append({"cities": result["cities"], "mode": result["mode"], "metric": "peak_rss_mb",
+                                "baseline": before["peak_rss_mb"], "current": result["peak_rss_mb"]})
+    return regressions
+
+def wait_for_result(process, results_queue, cities: int, mode: str, poll: float = 1.0) -> dict:
+    """The scenario's result, or a failed scenario once its process has died without one"""
+    result = None
+    while result is None and process.is_alive():
+        try:
+            result = results_queue.get(timeout=poll)
+        except queue.Empty:
+            pass
+    if result is None:
+        # Whatever it put before exiting is readable by now
+        try:
+            result = results_queue.get(timeout=poll)
+        except queue.Empty:
+            result = failed_scenario(cities, mode, f"process exited with code {process.exitcode}")
+    process.join()
+    return result
+
+def run(city_counts: list, mode: str, latency: float, error_rate: float) -> list:
+    port = free_port()
+    server = start_server(port, latency, error_rate)
+    context = multiprocessing.get_context("spawn")
+    results = []
+    try:
+        for cities in city_counts:
+            results_queue = context.Queue()
+            process = context.Process(target=run_scenario,
+                                      args=(f"http://127.0.0.1:{port}", cities, mode, results_queue))
+            process.start()
+            result = wait_for_result(process, results_queue, cities, mode)
+            print(json.dumps(result))
+            results.append(result)
+    finally:
+        server.terminate()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cities", default="16,1000,10000", help="Comma-separated city counts")
+    parser.add_argument("--mode", choices=["batch", "streaming"], default="batch")
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake API latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of API requests that fail")
+    parser.add_argument("--output", help="Write all results to this JSON file")
+    parser.add_argument("--baseline", help="Earlier --output file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    results = run([int(count) for count in args.cities.split(",")], args.mode, args.latency, args.error_rate)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        print(json.dumps({"regressions": regressions}))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Measure sharded-run throughput against the fake OpenWeather API (SQLite).
+
+Seeds a registry of synthetic cities with known OpenWeather ids, then runs
+the full extract/transform/load through etl.sharding with increasing worker
+counts. Throughput should grow close to linearly with the number of cores
+until the API latency or the database becomes the bottleneck.
+
+Usage:
+    python -m benchmarks.bench_sharding --cities 50000 --workers 1,2,4,8
+"""
+import argparse
+import json
+import os
+import tempfile
+from benchmarks.fake_openweather import free_port, configure, start_server
+
+def seed_cities(connection_string: str, count: int):
+    import pandas as pd
+    from etl.load import load_batch
+
+    index = pd.RangeIndex(count)
+    load_batch({"cities": pd.DataFrame({
+        "name": [f"City {i}" for i in index],
+        "province": "Synthetic",
+        "lat": 50.0 + (index % 400) / 100,
+        "lon": 3.0 + (index % 500) / 100,
+        "owm_id": index + 1,
+    })}, connection_string, mode="append")
+
+def run(cities: int, worker_counts: list, latency: float) -> list:
+    port = free_port()
+    server = start_server(port, latency)
+    configure(f"http://127.0.0.1:{port}")
+
+    import logging
+    from db.engine import get_engine
+    from etl.sharding import run_sharded
+    logging.basicConfig(level=logging.WARNING)
+
+    results = []
+    try:
+        for workers in worker_counts:
+            with tempfile.TemporaryDirectory() as tmp:
+                connection_string = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+                seed_cities(connection_string, cities)
+                merged = run_sharded(connection_string, workers=workers)
+                get_engine(connection_string).dispose()
+
+            result = {
+                "cities": cities,
+                "workers": workers,
+                "seconds": merged.get("seconds"),
+                "succeeded": merged["succeeded"],
+                "cities_per_second": round(merged["succeeded"] / merged["seconds"], 1) if merged.get("seconds") else None,
+                "row_counts": merged["row_counts"],
+            }
+            if results and result["cities_per_second"] and results[0]["cities_per_second"]:
+                result["speedup"] = round(result["cities_per_second"] / results[0]["cities_per_second"], 2)
+            results.append(result)
+            print(json.dumps(result))
+    finally:
+        server.terminate()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cities", type=int, default=50_000)
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--latency", type=float, default=0.02, help="Fake API latency in seconds")
+    args = parser.parse_args()
+    run(args.cities, [int(workers) for workers in args.workers.split(",")], args.latency)
+
+if __name__ == "__main__":
+    main()
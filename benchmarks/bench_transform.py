@@ -0,0 +1,76 @@
+"""Micro-benchmark for weather and forecast payload normalization.
+
+Compares the batch transform with the per-city normalize + concat path and
+reports the cost per payload, which should stay flat as the batch grows.
+Forecasts are timed at the full 40-step horizon per city.
+
+Usage:
+    python -m benchmarks.bench_transform --sizes 1000,10000,100000
+"""
+import argparse
+import json
+import time
+import pandas as pd
+from etl.transform import normalize_weather, normalize_weather_batch, normalize_forecast_batch
+
+def make_payloads(count: int) -> list:
+    return [{
+        "name": f"City {i}",
+        "main": {"temp": 10 + i % 20, "humidity": 50 + i % 50, "pressure": 1013, "feels_like": 9 + i % 20},
+        "weather": [{"description": "clear sky"}],
+        "coord": {"lat": 52.0 + i % 100 / 100, "lon": 5.0},
+        "wind": {"speed": 3.5, "deg": 180},
+        "visibility": 10000,
+    } for i in range(count)]
+
+def make_forecast_payloads(count: int, steps: int = 40) -> list:
+    return [{
+        "city": {"name": f"City {i}"},
+        "list": [{
+            "dt": 1751371200 + step * 10800,
+            "main": {"temp": 10 + step % 20, "humidity": 70, "pressure": 1013},
+            "weather": [{"description": "light rain"}],
+            "wind": {"speed": 3.5, "deg": 180},
+        } for step in range(steps)],
+    } for i in range(count)]
+
+def time_call(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def per_city(payloads: list) -> pd.DataFrame:
+    return pd.concat([normalize_weather(payload) for payload in payloads], ignore_index=True)
+
+def run(sizes: list, per_city_limit: int) -> list:
+    results = []
+    for size in sizes:
+        payloads = make_payloads(size)
+        batch_seconds = time_call(normalize_weather_batch, payloads)
+        result = {
+            "payloads": size,
+            "batch_seconds": round(batch_seconds, 4),
+            "batch_us_per_payload": round(batch_seconds / size * 1e6, 2),
+        }
+        forecast_seconds = time_call(normalize_forecast_batch, make_forecast_payloads(size))
+        result["forecast_rows"] = size * 40
+        result["forecast_seconds"] = round(forecast_seconds, 4)
+        result["forecast_us_per_row"] = round(forecast_seconds / (size * 40) * 1e6, 2)
+        if size <= per_city_limit:
+            per_city_seconds = time_call(per_city, payloads)
+            result["per_city_seconds"] = round(per_city_seconds, 4)
+            result["per_city_us_per_payload"] = round(per_city_seconds / size * 1e6, 2)
+        results.append(result)
+        print(json.dumps(result))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated batch sizes")
+    parser.add_argument("--per-city-limit", type=int, default=10000,
+                        help="Largest batch to also time with the per-city path")
+    args = parser.parse_args()
+    run([int(size) for size in args.sizes.split(",")], args.per_city_limit)
+
+if __name__ == "__main__":
+    main()
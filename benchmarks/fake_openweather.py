@@ -0,0 +1,139 @@
+"""Local stand-in for the OpenWeather API serving any number of synthetic cities.
+
+Answers /weather, /group, /air_pollution and /forecast with deterministic
+payloads for names like "City 123" (OpenWeather id 124), after an optional
+artificial latency. A seeded fraction of requests can be failed with an
+injected HTTP status to exercise error handling. Runs in its own process so
+it does not compete with the pipeline for the GIL.
+
+Usage:
+    python -m benchmarks.fake_openweather --port 8089 --latency 0.05 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import socket
+import time
+import zlib
+from aiohttp import web
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def configure(base_url: str):
+    """Point the pipeline at the fake API with no quota, cache or email; must run before importing etl"""
+    os.environ["OPENWEATHER_BASE_URL"] = base_url
+    os.environ["OPENWEATHER_API_KEY"] = "benchmark"
+    os.environ["OPENWEATHER_CALLS_PER_MINUTE"] = "100000000"
+    os.environ["OPENWEATHER_BURST"] = "100000"
+    os.environ["CACHE_BACKEND"] = "none"
+    os.environ["EMAIL_USER"] = ""
+
+def city_id(name: str) -> int:
+    """Synthetic OpenWeather id: index + 1 for "City <index>", a stable hash otherwise"""
+    suffix = name.rsplit(" ", 1)[-1]
+    return int(suffix) + 1 if suffix.isdigit() else zlib.crc32(name.encode()) % 10_000_000
+
+def weather_payload(city_id: int, name: str = None) -> dict:
+    index = city_id - 1
+    return {
+        "id": city_id,
+        "name": name or f"City {index}",
+        "coord": {"lat": 50.0 + (index % 400) / 100, "lon": 3.0 + (index % 500) / 100},
+        "main": {"temp": 5.0 + index % 25, "humidity": 40 + index % 60, "pressure": 1000 + index % 30,
+                 "feels_like": 4.0 + index % 25},
+        "weather": [{"description": "clear sky"}],
+        "wind": {"speed": 1.0 + index % 10, "deg": index % 360},
+        "visibility": 10000,
+        "dt": int(time.time()),
+    }
+
+def air_pollution_payload(lat: float, lon: float) -> dict:
+    return {
+        "coord": {"lat": lat, "lon": lon},
+        "list": [{
+            "main": {"aqi": 1 + int(lat * 10) % 5},
+            "components": {"co": 200.0, "no": 0.1, "no2": 10.0, "o3": 60.0, "so2": 1.0,
+                           "pm2_5": 5.0, "pm10": 8.0, "nh3": 2.0},
+        }],
+    }
+
+def forecast_payload(name: str, steps: int = 40) -> dict:
+    start = int(time.time()) // 10800 * 10800
+    return {
+        "city": {"name": name},
+        "list": [{
+            "dt": start + step * 10800,
+            "main": {"temp": 10.0 + step % 8, "humidity": 70},
+            "weather": [{"description": "light rain"}],
+        } for step in range(steps)],
+    }
+
+def make_app(latency: float = 0.0, error_rate: float = 0.0, error_status: int = 500,
+             seed: int = 0) -> web.Application:
+    rng = random.Random(seed)
+
+    async def respond(payload):
+        if latency:
+            await asyncio.sleep(latency)
+        if error_rate and rng.random() < error_rate:
+            return web.json_response({"cod": error_status, "message": "injected error"}, status=error_status)
+        return web.json_response(payload)
+
+    async def weather(request):
+        name = request.query["q"]
+        return await respond(weather_payload(city_id(name), name))
+
+    async def group(request):
+        ids = [int(value) for value in request.query["id"].split(",")]
+        return await respond({"cnt": len(ids), "list": [weather_payload(value) for value in ids]})
+
+    async def air_pollution(request):
+        return await respond(air_pollution_payload(float(request.query["lat"]), float(request.query["lon"])))
+
+    async def forecast(request):
+        return await respond(forecast_payload(request.query["q"]))
+
+    app = web.Application()
+    app.router.add_get("/weather", weather)
+    app.router.add_get("/group", group)
+    app.router.add_get("/air_pollution", air_pollution)
+    app.router.add_get("/forecast", forecast)
+    return app
+
+def serve(port: int, latency: float = 0.0, error_rate: float = 0.0, error_status: int = 500, seed: int = 0):
+    web.run_app(make_app(latency, error_rate, error_status, seed), host="127.0.0.1", port=port,
+                print=None, access_log=None)
+
+def start_server(port: int, latency: float = 0.0, error_rate: float = 0.0, error_status: int = 500,
+                 seed: int = 0) -> multiprocessing.Process:
+    """Start the fake API in a child process and wait until it accepts requests"""
+    process = multiprocessing.Process(target=serve, args=(port, latency, error_rate, error_status, seed),
+                                      daemon=True)
+    process.start()
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"Fake OpenWeather server did not start on port {port}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests to fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected errors")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    serve(args.port, args.latency, args.error_rate, args.error_status, args.seed)
+
+if __name__ == "__main__":
+    main()
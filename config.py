@@ -1,7 +1,132 @@
 from dotenv import load_dotenv
+from sqlalchemy.engine import URL
 import os
 
 load_dotenv()
 
+# Database: DATABASE_URL takes any SQLAlchemy URL (e.g. sqlite:///weather.db or
+# postgresql://...); without it the SQL Server settings below are used
+DATABASE_URL = os.getenv("DATABASE_URL")
+DB_SERVER = os.getenv("DB_SERVER", "localhost")
+DB_PORT = os.getenv("DB_PORT")
+DB_DATABASE = os.getenv("DB_DATABASE", "WeatherDB")
+DB_USERNAME = os.getenv("DB_USERNAME")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+DB_DRIVER = os.getenv("DB_DRIVER", "ODBC Driver 17 for SQL Server")
+
+def get_connection_string() -> str:
+    """The database URL shared by the pipeline, the dashboard and the maintenance scripts"""
+    if DATABASE_URL:
+        return DATABASE_URL
+    # URL.create escapes credentials, so a password may contain '@' or '/'
+    url = URL.create("mssql+pyodbc", username=DB_USERNAME, password=DB_PASSWORD, host=DB_SERVER,
+                     port=int(DB_PORT) if DB_PORT else None, database=DB_DATABASE,
+                     query={"driver": DB_DRIVER})
+    return url.render_as_string(hide_password=False)
+
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
-BASE_URL = "https://api.openweathermap.org/data/2.5/weather"
\ No newline at end of file
+OPENWEATHER_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org/data/2.5")
+BASE_URL = f"{OPENWEATHER_BASE_URL}/weather"
+AIR_POLLUTION_URL = f"{OPENWEATHER_BASE_URL}/air_pollution"
+FORECAST_URL = f"{OPENWEATHER_BASE_URL}/forecast"
+GROUP_URL = f"{OPENWEATHER_BASE_URL}/group"
+# The group endpoint accepts at most 20 city ids per request
+GROUP_BATCH_SIZE = int(os.getenv("GROUP_BATCH_SIZE", "20"))
+
+# Extraction settings
+EXTRACT_MODE = os.getenv("EXTRACT_MODE", "threaded")  # 'threaded' or 'async'
+EXTRACT_CONCURRENCY = int(os.getenv("EXTRACT_CONCURRENCY", "20"))
+REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "30"))
+# Cities whose requests may be in flight at once; bounds memory for very large registries
+CITY_WINDOW = int(os.getenv("CITY_WINDOW", "100"))
+# Number of 3-hour forecast steps to keep; the 5-day forecast has 40
+FORECAST_HORIZON = int(os.getenv("FORECAST_HORIZON", "40"))
+
+# OpenWeather free plan allows 60 calls per minute
+OPENWEATHER_CALLS_PER_MINUTE = int(os.getenv("OPENWEATHER_CALLS_PER_MINUTE", "60"))
+OPENWEATHER_BURST = int(os.getenv("OPENWEATHER_BURST", "10"))
+
+# Retries with exponential backoff and per-endpoint circuit breakers
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "4"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "30"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+# Response cache: 'memory', 'sqlite' or 'none'
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_PATH = os.getenv("CACHE_PATH", "openweather_cache.db")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+# Seconds a response stays fresh, per endpoint; roughly OpenWeather's own refresh rate
+CACHE_TTLS = {
+    "weather": int(os.getenv("CACHE_TTL_WEATHER", "600")),
+    "group": int(os.getenv("CACHE_TTL_WEATHER", "600")),
+    "air_pollution": int(os.getenv("CACHE_TTL_AIR_POLLUTION", "3600")),
+    "forecast": int(os.getenv("CACHE_TTL_FORECAST", "10800")),
+}
+
+# Pipeline mode: 'batch' loads once after every city is extracted, 'streaming'
+# runs extract, transform and load as concurrent stages with bounded queues
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "batch")
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "50"))  # cities per micro-batch
+STREAM_FLUSH_SECONDS = float(os.getenv("STREAM_FLUSH_SECONDS", "5"))
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "100"))
+
+# Sharded runs (python -m etl.sharding): local worker processes and lease length
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", str(os.cpu_count() or 1)))
+SHARD_LEASE_SECONDS = int(os.getenv("SHARD_LEASE_SECONDS", "600"))
+# Hosts working a sharded run at once; each keeps an equal share of the OpenWeather quota
+SHARD_HOSTS = int(os.getenv("SHARD_HOSTS", "1"))
+
+# Scheduler: seconds between runs of each job (python pipeline.py)
+WEATHER_INTERVAL = int(os.getenv("WEATHER_INTERVAL", "600"))
+AIR_QUALITY_INTERVAL = int(os.getenv("AIR_QUALITY_INTERVAL", "3600"))
+FORECAST_INTERVAL = int(os.getenv("FORECAST_INTERVAL", "10800"))
+HEALTH_CHECK_INTERVAL = int(os.getenv("HEALTH_CHECK_INTERVAL", "300"))
+HEALTH_SAMPLE_SECONDS = float(os.getenv("HEALTH_SAMPLE_SECONDS", "5"))  # background CPU/memory/disk sampling
+SCHEDULE_JITTER = float(os.getenv("SCHEDULE_JITTER", "30"))  # max random delay per run
+SCHEDULE_CATCH_UP = os.getenv("SCHEDULE_CATCH_UP", "once")  # 'skip', 'once' or 'all'
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "4"))
+
+# Run metrics: comma-separated sinks out of 'prometheus', 'json' and 'database'
+METRICS_SINKS = [name.strip() for name in os.getenv("METRICS_SINKS", "prometheus,json,database").split(",") if name.strip()]
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+METRICS_SUMMARY_PATH = os.getenv("METRICS_SUMMARY_PATH", "pipeline_run.json")
+
+# Status endpoints of the scheduler process (/healthz, /readyz, /metrics, /runs/latest)
+STATUS_HOST = os.getenv("STATUS_HOST", "0.0.0.0")
+STATUS_PORT = int(os.getenv("STATUS_PORT", "8080"))
+
+# Email alerts: delivered in the background as digests over one SMTP connection
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "10"))
+EMAIL_USER = os.getenv("EMAIL_USER")
+EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
+ALERT_RECIPIENTS = [address.strip() for address in os.getenv("ALERT_RECIPIENTS", "").split(",") if address.strip()]
+ALERT_DIGEST_SECONDS = float(os.getenv("ALERT_DIGEST_SECONDS", "60"))  # max wait before an unflushed digest is sent
+ALERT_COOLDOWN_SECONDS = float(os.getenv("ALERT_COOLDOWN_SECONDS", "3600"))  # repeats of a sent alert are dropped
+ALERT_MAX_EMAILS_PER_HOUR = int(os.getenv("ALERT_MAX_EMAILS_PER_HOUR", "12"))
+
+# Dashboard: seconds a rollup query result is reused across Streamlit reruns
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "60"))
+DASHBOARD_REFRESH_SECONDS = int(os.getenv("DASHBOARD_REFRESH_SECONDS", "60"))  # auto-refresh default
+DASHBOARD_CHUNK_SIZE = int(os.getenv("DASHBOARD_CHUNK_SIZE", "50000"))  # rows fetched per round trip
+
+# Loading settings
+LOAD_CHUNK_SIZE = int(os.getenv("LOAD_CHUNK_SIZE", "1000"))
+LOAD_MODE = os.getenv("LOAD_MODE", "merge")  # 'merge' or 'append'
+
+# Storage maintenance
+PARTITIONING_ENABLED = os.getenv("PARTITIONING_ENABLED", "false").lower() == "true"
+DATA_RETENTION_DAYS = int(os.getenv("DATA_RETENTION_DAYS", "365"))
+
+# Parquet archive of every loaded batch, partitioned by table, date and city (etl/archive.py)
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "false").lower() == "true"
+ARCHIVE_PATH = os.getenv("ARCHIVE_PATH", "archive")
+
+# Statistical anomaly detection against per-city baselines
+ANOMALY_Z_THRESHOLD = float(os.getenv("ANOMALY_Z_THRESHOLD", "4.0"))
+ANOMALY_MIN_SAMPLES = int(os.getenv("ANOMALY_MIN_SAMPLES", "30"))
+ANOMALY_HALF_LIFE = float(os.getenv("ANOMALY_HALF_LIFE", "48"))
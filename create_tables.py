@@ -1,14 +1,5 @@
 from db.init_db import init_database
-import os
-from dotenv import load_dotenv
+from config import get_connection_string
 
-load_dotenv()
-
-DB_SERVER = os.getenv("DB_SERVER")
-DB_NAME = os.getenv("DB_DATABASE") 
-DB_USER = os.getenv("DB_USERNAME")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-
-connection = f"mssql+pyodbc://{DB_USER}:{DB_PASSWORD}@{DB_SERVER}/{DB_NAME}?driver=ODBC+Driver+17+for+SQL+Server"
-init_database(connection)
+init_database(get_connection_string())
 print("Database tables created!")
\ No newline at end of file
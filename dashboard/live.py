@@ -0,0 +1,56 @@
+"""Sliding windows kept current by delta queries, for the dashboard's auto-refresh mode.
+
+A window holds its rows across Streamlit reruns (in st.session_state) and
+remembers a cursor: the highest id for append-only raw tables, the latest
+updated_at for rollups that are rewritten in place. Each refresh fetches only
+rows past the cursor, replaces rows with the same key, and evicts rows that
+have fallen out of the time window, so a tick costs one small query however
+long the window is.
+"""
+from datetime import datetime, timedelta
+import pandas as pd
+from dashboard.queries import concat_compact
+
+class LiveWindow:
+    """Rows from the last `days` days, updated incrementally through fetch(cursor).
+
+    freq aligns the window start like the queries do ('h' or 'D' for rollup
+    buckets); key_columns identify rows that a later delta replaces.
+    """
+
+    def __init__(self, fetch, cursor_column: str, time_column: str, days: float,
+                 key_columns: list = None, freq: str = None):
+        self.fetch = fetch
+        self.cursor_column = cursor_column
+        self.time_column = time_column
+        self.days = days
+        self.key_columns = key_columns
+        self.freq = freq
+        self.cursor = None
+        self.frame = pd.DataFrame()
+        self.last_delta = 0
+
+    def refresh(self, now: datetime = None) -> pd.DataFrame:
+        """Apply rows past the cursor, evict expired rows and return the window"""
+        delta = self.fetch(self.cursor)
+        self.last_delta = len(delta)
+        if not delta.empty:
+            # Plain Python value so every driver can bind it
+            cursor = delta[self.cursor_column].max()
+            self.cursor = cursor.to_pydatetime() if isinstance(cursor, pd.Timestamp) else getattr(cursor, 'item', lambda: cursor)()
+            if self.frame.empty:
+                self.frame = delta
+            else:
+                self.frame = concat_compact([self.frame, delta[self.frame.columns]])
+                if self.key_columns:
+                    self.frame = self.frame.drop_duplicates(self.key_columns, keep='last')
+                # Replaced rows moved to the end
+                self.frame = self.frame.sort_values(self.time_column, ignore_index=True, kind='stable')
+        cutoff = pd.Timestamp((now or datetime.utcnow()) - timedelta(days=self.days))
+        if self.freq:
+            cutoff = cutoff.floor(self.freq)
+        if not self.frame.empty:
+            expired = pd.to_datetime(self.frame[self.time_column]) < cutoff
+            if expired.any():
+                self.frame = self.frame[~expired].reset_index(drop=True)
+        return self.frame
@@ -0,0 +1,200 @@
+"""Dashboard reads served from the rollup tables through a TTL cache.
+
+Streamlit re-executes the dashboard script on every interaction, but
+imported modules persist, so the cache here survives reruns. Entries are
+keyed on the query name and its parameters and expire after
+DASHBOARD_CACHE_TTL seconds; the rollups themselves only change when the
+pipeline loads new readings.
+
+Every query selects only the columns its chart uses and filters on the
+server: the time window, cities and provinces are bound parameters, never
+formatted into SQL. Results stream in chunks of DASHBOARD_CHUNK_SIZE rows
+and are narrowed to float32 and categorical columns as they arrive.
+"""
+from datetime import datetime, timedelta
+import pandas as pd
+from pandas.api.types import union_categoricals
+from sqlalchemy import select
+from config import DASHBOARD_CACHE_TTL, DASHBOARD_CHUNK_SIZE
+from db.engine import get_engine
+from db.models import WeatherData, City, WeatherRollup, AirQualityRollup
+from etl.cache import MemoryCache, cache_key
+
+# Low-cardinality text columns stored as pandas categoricals
+CATEGORY_COLUMNS = ('city', 'province', 'weather')
+
+_cache = MemoryCache(max_entries=256)
+
+def cached(name: str, params: dict, loader, ttl: int = DASHBOARD_CACHE_TTL):
+    """Return loader() from the cache, calling it at most once per ttl for the same name and parameters"""
+    key = cache_key(name, params)
+    entry = _cache.lookup(key)
+    if entry is not None and entry.is_fresh(_cache.clock()):
+        return entry.value
+    value = loader()
+    _cache.store(key, value, ttl)
+    return value
+
+def clear_cache():
+    _cache.clear()
+
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    """Downcast floats to float32 and text dimensions to categoricals"""
+    for column in df.columns:
+        if df[column].dtype == 'float64':
+            df[column] = df[column].astype('float32')
+        elif column in CATEGORY_COLUMNS and df[column].dtype == object:
+            df[column] = df[column].astype('category')
+    return df
+
+def concat_compact(chunks: list) -> pd.DataFrame:
+    """Concatenate compacted chunks, merging categories instead of falling back to object columns"""
+    if len(chunks) == 1:
+        return chunks[0]
+    columns = {}
+    for column in chunks[0].columns:
+        parts = [chunk[column] for chunk in chunks]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            columns[column] = union_categoricals(parts)
+        else:
+            columns[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+def read_frame(connection_string: str, query, chunk_size: int = DASHBOARD_CHUNK_SIZE) -> pd.DataFrame:
+    """Run a query, fetching and compacting its result chunk by chunk"""
+    with get_engine(connection_string).connect() as conn:
+        conn = conn.execution_options(stream_results=True, max_row_buffer=chunk_size)
+        chunks = [compact(chunk) for chunk in pd.read_sql(query, conn, chunksize=chunk_size)]
+    return concat_compact(chunks)
+
+def _where(query, table, cities: list = None, provinces: list = None):
+    """Restrict a query to cities and provinces; tables without a province column match on the registry"""
+    if cities:
+        query = query.where(table.c.city.in_(cities))
+    if provinces:
+        if 'province' in table.c:
+            query = query.where(table.c.province.in_(provinces))
+        else:
+            query = query.where(table.c.city.in_(select(City.__table__.c.name).where(City.__table__.c.province.in_(provinces))))
+    return query
+
+def _filters(cities: list = None, provinces: list = None) -> dict:
+    """Cache key parameters for a city/province filter, independent of selection order"""
+    return {'cities': sorted(cities or []), 'provinces': sorted(provinces or [])}
+
+def _cutoff(days: int, granularity: str) -> datetime:
+    """Start of the window, aligned to the bucket size so cached results match the rollup grid"""
+    return pd.Timestamp(datetime.utcnow() - timedelta(days=days)).floor('h' if granularity == 'hour' else 'D').to_pydatetime()
+
+def load_filter_options(connection_string: str) -> pd.DataFrame:
+    """Registry cities and their provinces, for the sidebar filters"""
+    table = City.__table__
+    query = select(table.c.name.label('city'), table.c.province).order_by(table.c.province, table.c.name)
+    return cached('filter_options', {'db': connection_string}, lambda: read_frame(connection_string, query))
+
+def _weather_rollup_query(days: int, granularity: str, cities: list = None, provinces: list = None):
+    table = WeatherRollup.__table__
+    query = (select(table.c.bucket, table.c.city, table.c.province, table.c.samples,
+                    table.c.temperature_avg, table.c.temperature_min, table.c.temperature_max,
+                    table.c.humidity_avg, table.c.wind_speed_avg, table.c.last_seen)
+             .where(table.c.granularity == granularity, table.c.bucket >= _cutoff(days, granularity))
+             .order_by(table.c.bucket))
+    return _where(query, table, cities, provinces)
+
+def _air_quality_rollup_query(days: int, granularity: str, cities: list = None, provinces: list = None):
+    table = AirQualityRollup.__table__
+    query = (select(table.c.bucket, table.c.city, table.c.samples, table.c.aqi_avg, table.c.aqi_max,
+                    table.c.pm2_5_avg, table.c.pm10_avg)
+             .where(table.c.granularity == granularity, table.c.bucket >= _cutoff(days, granularity))
+             .order_by(table.c.bucket))
+    return _where(query, table, cities, provinces)
+
+def _weather_readings_query(days: int, columns, cities: list = None, provinces: list = None):
+    table = WeatherData.__table__
+    query = (select(table.c.timestamp, table.c.city, *(table.c[column] for column in columns))
+             .where(table.c.timestamp >= datetime.utcnow() - timedelta(days=days))
+             .order_by(table.c.timestamp))
+    return _where(query, table, cities, provinces)
+
+def _changed_since(query, table, changed_since: datetime):
+    """Add the updated_at cursor to a rollup query and keep only rows refreshed after it"""
+    query = query.add_columns(table.c.updated_at)
+    if changed_since is not None:
+        query = query.where(table.c.updated_at > changed_since)
+    return query
+
+def load_weather_rollups(connection_string: str, days: int, granularity: str = 'hour',
+                         cities: list = None, provinces: list = None) -> pd.DataFrame:
+    """Per-city weather rollups of the last N days"""
+    query = _weather_rollup_query(days, granularity, cities, provinces)
+    params = {'db': connection_string, 'days': days, 'granularity': granularity, **_filters(cities, provinces)}
+    return cached('weather_rollups', params, lambda: read_frame(connection_string, query))
+
+def load_air_quality_rollups(connection_string: str, days: int, granularity: str = 'day',
+                             cities: list = None, provinces: list = None) -> pd.DataFrame:
+    """Per-city air quality rollups of the last N days"""
+    query = _air_quality_rollup_query(days, granularity, cities, provinces)
+    params = {'db': connection_string, 'days': days, 'granularity': granularity, **_filters(cities, provinces)}
+    return cached('air_quality_rollups', params, lambda: read_frame(connection_string, query))
+
+def load_recent_weather(connection_string: str, limit: int = 20,
+                        cities: list = None, provinces: list = None) -> pd.DataFrame:
+    """The latest raw weather readings"""
+    table = WeatherData.__table__
+    query = _where(select(table.c.city, table.c.temperature, table.c.humidity, table.c.weather, table.c.timestamp)
+                   .order_by(table.c.timestamp.desc())
+                   .limit(limit), table, cities, provinces)
+    params = {'db': connection_string, 'limit': limit, **_filters(cities, provinces)}
+    return cached('recent_weather', params, lambda: read_frame(connection_string, query))
+
+def load_weather_readings(connection_string: str, days: int, columns: list = ('temperature', 'humidity'),
+                          cities: list = None, provinces: list = None) -> pd.DataFrame:
+    """Raw weather readings of the last N days with only the requested measurement columns"""
+    query = _weather_readings_query(days, columns, cities, provinces)
+    params = {'db': connection_string, 'days': days, 'columns': sorted(columns), **_filters(cities, provinces)}
+    return cached('weather_readings', params, lambda: read_frame(connection_string, query))
+
+# Delta reads for the live view: never cached, each returns only what changed after its cursor
+
+def weather_rollup_changes(connection_string: str, days: int, granularity: str, changed_since: datetime = None,
+                           cities: list = None, provinces: list = None) -> pd.DataFrame:
+    """Weather rollups in the window refreshed after changed_since, with their updated_at"""
+    query = _weather_rollup_query(days, granularity, cities, provinces)
+    return read_frame(connection_string, _changed_since(query, WeatherRollup.__table__, changed_since))
+
+def air_quality_rollup_changes(connection_string: str, days: int, granularity: str, changed_since: datetime = None,
+                               cities: list = None, provinces: list = None) -> pd.DataFrame:
+    """Air quality rollups in the window refreshed after changed_since, with their updated_at"""
+    query = _air_quality_rollup_query(days, granularity, cities, provinces)
+    return read_frame(connection_string, _changed_since(query, AirQualityRollup.__table__, changed_since))
+
+def weather_reading_changes(connection_string: str, days: float, after_id: int = None,
+                            columns: list = ('temperature', 'humidity'),
+                            cities: list = None, provinces: list = None) -> pd.DataFrame:
+    """Raw weather readings in the window with an id above after_id, with their id"""
+    table = WeatherData.__table__
+    query = _weather_readings_query(days, columns, cities, provinces).add_columns(table.c.id)
+    if after_id is not None:
+        query = query.where(table.c.id > after_id)
+    return read_frame(connection_string, query)
+
+def province_rollups(city_rollups: pd.DataFrame) -> pd.DataFrame:
+    """Combine per-city rollups into per-province rows for the same buckets, weighting means by samples"""
+    if city_rollups.empty:
+        return city_rollups
+    df = city_rollups.assign(
+        temperature_sum=city_rollups['temperature_avg'] * city_rollups['samples'],
+        humidity_sum=city_rollups['humidity_avg'] * city_rollups['samples'],
+        wind_speed_sum=city_rollups['wind_speed_avg'] * city_rollups['samples'],
+    )
+    provinces = df.groupby(['province', 'bucket'], sort=False, observed=True).agg(
+        samples=('samples', 'sum'),
+        temperature_sum=('temperature_sum', 'sum'),
+        temperature_min=('temperature_min', 'min'),
+        temperature_max=('temperature_max', 'max'),
+        humidity_sum=('humidity_sum', 'sum'),
+        wind_speed_sum=('wind_speed_sum', 'sum'),
+    ).reset_index()
+    for metric in ['temperature', 'humidity', 'wind_speed']:
+        provinces[f'{metric}_avg'] = provinces.pop(f'{metric}_sum') / provinces['samples']
+    return provinces.sort_values('bucket', ignore_index=True)
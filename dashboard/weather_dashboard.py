@@ -1,66 +1,78 @@
+import os
+import sys
+import time
+from functools import partial
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import streamlit as st
-from sqlalchemy import create_engine
-from datetime import datetime, timedelta
 import logging
+from datetime import datetime
+
+# Streamlit runs this file as a script; make the pipeline packages importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DASHBOARD_REFRESH_SECONDS, get_connection_string
+from dashboard import queries
+from dashboard.live import LiveWindow
 
 class WeatherDashboard:
-    def __init__(self, connection_string: str):
-        self.engine = create_engine(connection_string)
+    """Charts over the pre-rolled hourly and daily tables maintained by the pipeline"""
+
+    def __init__(self, connection_string: str, cities: list = None, provinces: list = None):
+        self.connection_string = connection_string
+        # Applied by the database in every query, not in pandas
+        self.filters = {'cities': cities, 'provinces': provinces}
     
-    def load_weather_data(self, days: int = 7) -> pd.DataFrame:
-        """Load weather data from the last N days"""
-        query = f"""
-        SELECT * FROM weather_data 
-        WHERE timestamp >= DATEADD(day, -{days}, GETDATE())
-        ORDER BY timestamp DESC
-        """
+    def load_weather_rollups(self, days: int = 7, granularity: str = 'hour') -> pd.DataFrame:
+        """Load per-city weather rollups from the last N days"""
         try:
-            return pd.read_sql(query, self.engine)
+            return queries.load_weather_rollups(self.connection_string, days, granularity, **self.filters)
         except Exception as e:
-            logging.error("Error loading weather data: %s", e)
+            logging.error("Error loading weather rollups: %s", e)
             return pd.DataFrame()
     
-    def load_air_quality_data(self, days: int = 7) -> pd.DataFrame:
-        """Load air quality data from the last N days"""
-        query = f"""
-        SELECT * FROM air_quality 
-        WHERE timestamp >= DATEADD(day, -{days}, GETDATE())
-        ORDER BY timestamp DESC
-        """
+    def load_air_quality_rollups(self, days: int = 7) -> pd.DataFrame:
+        """Load daily per-city air quality rollups from the last N days"""
+        try:
+            return queries.load_air_quality_rollups(self.connection_string, days, 'day', **self.filters)
+        except Exception as e:
+            logging.error("Error loading air quality rollups: %s", e)
+            return pd.DataFrame()
+
+    def load_recent_weather(self, limit: int = 20) -> pd.DataFrame:
+        """Load the latest raw weather readings"""
         try:
-            return pd.read_sql(query, self.engine)
+            return queries.load_recent_weather(self.connection_string, limit, **self.filters)
         except Exception as e:
-            logging.error("Error loading air quality data: %s", e)
+            logging.error("Error loading recent weather data: %s", e)
             return pd.DataFrame()
     
-    def create_temperature_trends_chart(self, df: pd.DataFrame):
+    def create_temperature_trends_chart(self, province_hours: pd.DataFrame):
         """Create temperature trends chart by province"""
-        fig = px.line(df, x='timestamp', y='temperature', 
+        fig = px.line(province_hours, x='bucket', y='temperature_avg', 
                      color='province', 
                      title='Temperature Trends by Province',
-                     labels={'temperature': 'Temperature (°C)', 'timestamp': 'Time'})
+                     labels={'temperature_avg': 'Temperature (°C)', 'bucket': 'Time'})
         return fig
     
-    def create_province_comparison_chart(self, df: pd.DataFrame):
+    def create_province_comparison_chart(self, province_hours: pd.DataFrame):
         """Create province weather comparison chart"""
-        latest_data = df.groupby('province').last().reset_index()
+        latest_data = province_hours.groupby('province', observed=True).last().reset_index()
         
         fig = go.Figure()
         fig.add_trace(go.Bar(
             name='Temperature',
             x=latest_data['province'],
-            y=latest_data['temperature'],
+            y=latest_data['temperature_avg'],
             yaxis='y',
             offsetgroup=1
         ))
         fig.add_trace(go.Bar(
             name='Humidity',
             x=latest_data['province'],
-            y=latest_data['humidity'],
+            y=latest_data['humidity_avg'],
             yaxis='y2',
             offsetgroup=2
         ))
@@ -74,12 +86,13 @@ class WeatherDashboard:
         )
         return fig
     
-    def create_air_quality_heatmap(self, df: pd.DataFrame):
+    def create_air_quality_heatmap(self, daily_air_quality: pd.DataFrame):
         """Create air quality heatmap"""
-        if df.empty:
+        if daily_air_quality.empty:
             return None
         
-        aqi_pivot = df.pivot_table(values='aqi', index='city', columns=df['timestamp'].dt.date, aggfunc='mean')
+        aqi_pivot = daily_air_quality.pivot_table(values='aqi_avg', index='city',
+                                                  columns=pd.to_datetime(daily_air_quality['bucket']).dt.date, observed=True)
         
         fig = px.imshow(aqi_pivot, 
                        title='Air Quality Index Heatmap by City',
@@ -87,16 +100,35 @@ class WeatherDashboard:
                        color_continuous_scale='RdYlGn_r')
         return fig
     
-    def create_weather_summary_table(self, df: pd.DataFrame):
+    def create_weather_summary_table(self, city_days: pd.DataFrame):
         """Create weather summary statistics table"""
-        summary = df.groupby('province').agg({
-            'temperature': ['mean', 'min', 'max'],
-            'humidity': 'mean',
-            'wind_speed': 'mean'
-        }).round(2)
-        
-        summary.columns = ['Avg Temp', 'Min Temp', 'Max Temp', 'Avg Humidity', 'Avg Wind Speed']
-        return summary.reset_index()
+        # One bucket for the whole window gives one sample-weighted row per province
+        provinces = queries.province_rollups(city_days.assign(bucket=city_days['bucket'].min()))
+        summary = provinces[['province', 'temperature_avg', 'temperature_min', 'temperature_max',
+                             'humidity_avg', 'wind_speed_avg']].round(2)
+        summary.columns = ['province', 'Avg Temp', 'Min Temp', 'Max Temp', 'Avg Humidity', 'Avg Wind Speed']
+        return summary
+
+def live_windows(connection_string: str, days: int, cities: list, provinces: list) -> dict:
+    """Auto-refresh windows for the current controls, kept in session state across reruns"""
+    key = (connection_string, days, tuple(sorted(cities)), tuple(sorted(provinces)))
+    state = st.session_state.get('live')
+    if state is None or state['key'] != key:
+        filters = {'cities': cities, 'provinces': provinces}
+        state = {'key': key, 'windows': {
+            'hours': LiveWindow(partial(queries.weather_rollup_changes, connection_string, days, 'hour', **filters),
+                                'updated_at', 'bucket', days, ['city', 'bucket'], freq='h'),
+            'days': LiveWindow(partial(queries.weather_rollup_changes, connection_string, days, 'day', **filters),
+                               'updated_at', 'bucket', days, ['city', 'bucket'], freq='D'),
+            'air_quality': LiveWindow(partial(queries.air_quality_rollup_changes, connection_string, days, 'day', **filters),
+                                      'updated_at', 'bucket', days, ['city', 'bucket'], freq='D'),
+            # The recent table only needs the last hour of raw readings, appended by id
+            'recent': LiveWindow(partial(queries.weather_reading_changes, connection_string, 1 / 24,
+                                         columns=('temperature', 'humidity', 'weather'), **filters),
+                                 'id', 'timestamp', 1 / 24),
+        }}
+        st.session_state['live'] = state
+    return state['windows']
 
 def run_dashboard():
     """Run the Streamlit dashboard"""
@@ -105,88 +137,111 @@ def run_dashboard():
     st.title("🌤️ Weather Analytics Dashboard")
     st.markdown("Real-time weather data analytics for the Netherlands")
     
-    # Load environment variables
-    from dotenv import load_dotenv
-    import os
-    load_dotenv()
-    
-    # Get connection string from environment variables
-    DB_SERVER = os.getenv("DB_SERVER", "localhost")
-    DB_NAME = os.getenv("DB_DATABASE", "WeatherDB") 
-    DB_USER = os.getenv("DB_USERNAME", "sa")
-    DB_PASSWORD = os.getenv("DB_PASSWORD", "YourStrong!Passw0rd")
-    
-    connection_string = f"mssql+pyodbc://{DB_USER}:{DB_PASSWORD}@{DB_SERVER}/{DB_NAME}?driver=ODBC+Driver+17+for+SQL+Server"
-    
-    # Initialize dashboard
-    dashboard = WeatherDashboard(connection_string)
+    connection_string = get_connection_string()
     
     # Sidebar controls
     st.sidebar.header("Dashboard Controls")
     days = st.sidebar.slider("Days of data to display", 1, 30, 7)
     refresh = st.sidebar.button("Refresh Data")
+    auto_refresh = st.sidebar.checkbox("Auto-refresh")
+    interval = st.sidebar.number_input("Refresh every (seconds)", 10, 3600, DASHBOARD_REFRESH_SECONDS,
+                                       disabled=not auto_refresh)
+    
+    if refresh:
+        queries.clear_cache()
+        st.session_state.pop('live', None)
     
     try:
-        # Load data
-        weather_df = dashboard.load_weather_data(days)
-        air_quality_df = dashboard.load_air_quality_data(days)
-        
-        if weather_df.empty:
+        options = queries.load_filter_options(connection_string)
+    except Exception as e:
+        logging.error("Error loading city registry: %s", e)
+        options = pd.DataFrame(columns=['city', 'province'])
+    provinces = st.sidebar.multiselect("Provinces", sorted(options['province'].dropna().unique()))
+    city_options = options[options['province'].isin(provinces)] if provinces else options
+    cities = st.sidebar.multiselect("Cities", list(city_options['city']))
+    
+    # Initialize dashboard
+    dashboard = WeatherDashboard(connection_string, cities, provinces)
+    
+    try:
+        if auto_refresh:
+            # Only rows added or re-rolled since the previous tick are fetched
+            windows = live_windows(connection_string, days, cities, provinces)
+            city_hours = windows['hours'].refresh()
+            city_days = windows['days'].refresh()
+            air_quality_days = windows['air_quality'].refresh()
+            recent_data = windows['recent'].refresh()
+            recent_data = recent_data.iloc[::-1].head(20)[['city', 'temperature', 'humidity', 'weather', 'timestamp']] \
+                if not recent_data.empty else recent_data
+            st.caption(f"Live: {sum(window.last_delta for window in windows.values())} new or updated rows "
+                       f"at {datetime.now().strftime('%H:%M:%S')}")
+        else:
+            # Pre-rolled data; repeated reruns within the cache TTL do not touch the database
+            city_hours = dashboard.load_weather_rollups(days, 'hour')
+            city_days = dashboard.load_weather_rollups(days, 'day')
+            air_quality_days = dashboard.load_air_quality_rollups(days)
+            recent_data = dashboard.load_recent_weather(20)
+        
+        if city_hours.empty:
             st.warning("No weather data available for the selected period.")
             return
+        province_hours = queries.province_rollups(city_hours)
         
         # Key metrics
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            avg_temp = weather_df['temperature'].mean()
+            avg_temp = (city_hours['temperature_avg'] * city_hours['samples']).sum() / city_hours['samples'].sum()
             st.metric("Average Temperature", f"{avg_temp:.1f}°C")
         
         with col2:
-            total_cities = weather_df['city'].nunique()
+            total_cities = city_hours['city'].nunique()
             st.metric("Cities Monitored", total_cities)
         
         with col3:
-            latest_update = weather_df['timestamp'].max()
+            latest_update = pd.to_datetime(city_hours['last_seen']).max()
             st.metric("Last Update", latest_update.strftime("%H:%M"))
         
         with col4:
-            if not air_quality_df.empty:
-                avg_aqi = air_quality_df['aqi'].mean()
+            if not air_quality_days.empty:
+                avg_aqi = (air_quality_days['aqi_avg'] * air_quality_days['samples']).sum() / air_quality_days['samples'].sum()
                 st.metric("Average AQI", f"{avg_aqi:.0f}")
         
         # Charts
         st.subheader("Temperature Trends")
-        temp_chart = dashboard.create_temperature_trends_chart(weather_df)
+        temp_chart = dashboard.create_temperature_trends_chart(province_hours)
         st.plotly_chart(temp_chart, use_container_width=True)
         
         col1, col2 = st.columns(2)
         
         with col1:
             st.subheader("Province Comparison")
-            province_chart = dashboard.create_province_comparison_chart(weather_df)
+            province_chart = dashboard.create_province_comparison_chart(province_hours)
             st.plotly_chart(province_chart, use_container_width=True)
         
         with col2:
             st.subheader("Weather Summary")
-            summary_table = dashboard.create_weather_summary_table(weather_df)
+            summary_table = dashboard.create_weather_summary_table(city_days)
             st.dataframe(summary_table, use_container_width=True)
         
         # Air Quality Section
-        if not air_quality_df.empty:
+        if not air_quality_days.empty:
             st.subheader("Air Quality Analysis")
-            aqi_heatmap = dashboard.create_air_quality_heatmap(air_quality_df)
+            aqi_heatmap = dashboard.create_air_quality_heatmap(air_quality_days)
             if aqi_heatmap:
                 st.plotly_chart(aqi_heatmap, use_container_width=True)
         
         # Recent Data Table
         st.subheader("Recent Weather Data")
-        recent_data = weather_df.head(20)[['city', 'temperature', 'humidity', 'weather', 'timestamp']]
         st.dataframe(recent_data, use_container_width=True)
         
     except Exception as e:
         st.error(f"Dashboard error: {e}")
         logging.error("Dashboard error: %s", e)
+    finally:
+        if auto_refresh:
+            time.sleep(interval)
+            st.rerun()
 
 if __name__ == "__main__":
     run_dashboard()
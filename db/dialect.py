@@ -0,0 +1,24 @@
+"""SQL expressions that compile to each supported database's own syntax.
+
+Queries are built with SQLAlchemy Core, which covers nearly everything; the
+constructs here fill the gaps where SQL Server, PostgreSQL and SQLite
+disagree.
+"""
+from sqlalchemy import Date
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import GenericFunction
+
+class day(GenericFunction):
+    """The calendar date of a datetime column, usable in SELECT and GROUP BY"""
+    type = Date()
+    identifier = "calendar_date"  # keeps func.day() the database's own DAY()
+    inherit_cache = True
+
+@compiles(day)
+def _day(element, compiler, **kw):
+    return "CAST(%s AS DATE)" % compiler.process(element.clauses, **kw)
+
+@compiles(day, "sqlite")
+def _day_sqlite(element, compiler, **kw):
+    # SQLite has no DATE type; CAST would turn '2024-01-31 12:00' into 2024
+    return "date(%s)" % compiler.process(element.clauses, **kw)
@@ -0,0 +1,90 @@
+from sqlalchemy import create_engine, inspect, select, delete, func, text
+from .models import Base
+import threading
+import logging
+
+_engines = {}
+_initialized_schemas = set()
+_lock = threading.Lock()
+
+def get_engine(connection_string: str):
+    """Return the long-lived, pooled engine for a connection string"""
+    with _lock:
+        engine = _engines.get(connection_string)
+        if engine is None:
+            options = {"pool_pre_ping": True}
+            if connection_string.startswith("mssql+pyodbc"):
+                # Send executemany batches as arrays instead of one round trip per row
+                options["fast_executemany"] = True
+            engine = create_engine(connection_string, **options)
+            _engines[connection_string] = engine
+        return engine
+
+def reset_engines():
+    """Drop pooled engines inherited from a parent process without closing its connections"""
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose(close=False)
+        _engines.clear()
+
+def _remove_duplicates(conn, table, columns: list) -> int:
+    """Delete all but the most recently inserted row of each group of duplicate keys"""
+    latest = select(func.max(table.c.id)).group_by(*columns).scalar_subquery()
+    return conn.execute(delete(table).where(table.c.id.notin_(latest))).rowcount
+
+def _add_missing_columns(engine):
+    """Add nullable columns declared in the models to tables that predate them"""
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD "
+                                  f"{preparer.format_column(column)} {column.type.compile(engine.dialect)}"))
+            logging.info("Added column %s to %s", column.name, table.name)
+
+def _create_missing_indexes(engine):
+    """Add indexes declared in the models to tables that predate them.
+
+    Duplicate rows would block a unique index, and merge loads cannot run
+    without it, so they are removed first, keeping the latest row per key.
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if not index.unique:
+                try:
+                    index.create(engine)
+                    logging.info("Created index %s on %s", index.name, table.name)
+                except Exception as e:
+                    logging.warning("Could not create index %s on %s: %s", index.name, table.name, e)
+                continue
+            try:
+                with engine.begin() as conn:
+                    removed = _remove_duplicates(conn, table, list(index.columns))
+                    if removed:
+                        logging.warning("Removed %d duplicate rows from %s before creating %s",
+                                        removed, table.name, index.name)
+                    index.create(conn)
+            except Exception as e:
+                raise RuntimeError(f"Could not create unique index {index.name} on {table.name}, "
+                                   f"which merge loads require: {e}") from e
+            logging.info("Created index %s on %s", index.name, table.name)
+
+def ensure_schema(engine):
+    """Create all tables once per process for the given engine"""
+    key = str(engine.url)
+    with _lock:
+        if key in _initialized_schemas:
+            return
+        Base.metadata.create_all(engine)
+        _add_missing_columns(engine)
+        _create_missing_indexes(engine)
+        _initialized_schemas.add(key)
+        logging.info("Database schema verified for %s", engine.url.render_as_string(hide_password=True))
@@ -1,12 +1,11 @@
-from sqlalchemy import create_engine
-from .models import Base
+from .engine import get_engine, ensure_schema
 import logging
 
 def create_all_tables(connection_string: str):
     """Create all tables in the database"""
     try:
-        engine = create_engine(connection_string)
-        Base.metadata.create_all(engine)
+        engine = get_engine(connection_string)
+        ensure_schema(engine)
         logging.info("All database tables created successfully")
         return True
     except Exception as e:
@@ -0,0 +1,64 @@
+"""One-off data migrations for rows written under earlier semantics.
+
+Usage:
+    python -m db.migrations forecast-dates-to-utc --loaded-before 2026-10-17T00:00
+"""
+import logging
+import time
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import bindparam, delete, select, update
+from db.models import WeatherForecast
+
+def _local_to_utc(value: datetime) -> datetime:
+    # Inverse of datetime.fromtimestamp on this host, daylight saving included
+    return datetime.utcfromtimestamp(time.mktime(value.timetuple()))
+
+def forecast_dates_to_utc(engine, loaded_before: datetime) -> dict:
+    """Convert forecast_date of rows loaded before `loaded_before` from host local time to UTC.
+
+    Forecasts used to be stored with datetime.fromtimestamp, in the local
+    time of the host that ran the pipeline; they are now stored in UTC like
+    every other timestamp. Run this once, on the host that loaded the old
+    rows, with the time the new version was deployed. Where a UTC row for the
+    same city and time has been loaded since, the old row is deleted instead.
+    """
+    table = WeatherForecast.__table__
+    with engine.begin() as conn:
+        old = pd.read_sql(select(table.c.id, table.c.city, table.c.forecast_date)
+                          .where(table.c.created_at < loaded_before), conn)
+        if old.empty:
+            return {"converted": 0, "deleted": 0}
+        old["forecast_date"] = [_local_to_utc(value) for value in pd.to_datetime(old["forecast_date"])]
+
+        current = pd.read_sql(select(table.c.city, table.c.forecast_date)
+                              .where(table.c.created_at >= loaded_before), conn)
+        current_keys = set(zip(current["city"], pd.to_datetime(current["forecast_date"])))
+        superseded = [(city, date) in current_keys for city, date in zip(old["city"], old["forecast_date"])]
+        deleted = old[superseded]
+        converted = old[[not flag for flag in superseded]]
+
+        if not deleted.empty:
+            conn.execute(delete(table).where(table.c.id.in_([int(row_id) for row_id in deleted["id"]])))
+        if not converted.empty:
+            conn.execute(
+                update(table).where(table.c.id == bindparam("row_id")).values(forecast_date=bindparam("utc")),
+                [{"row_id": int(row.id), "utc": row.forecast_date.to_pydatetime()}
+                 for row in converted.itertuples()]
+            )
+    logging.info("Converted %d forecast rows to UTC and deleted %d superseded ones", len(converted), len(deleted))
+    return {"converted": len(converted), "deleted": len(deleted)}
+
+if __name__ == "__main__":
+    import argparse
+    from config import get_connection_string
+    from db.engine import get_engine
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["forecast-dates-to-utc"])
+    parser.add_argument("--loaded-before", type=datetime.fromisoformat, required=True,
+                        help="when the version storing forecasts in UTC was deployed")
+    args = parser.parse_args()
+
+    print(forecast_dates_to_utc(get_engine(get_connection_string()), args.loaded_before))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Index, Text
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -6,6 +6,10 @@ Base = declarative_base()
 
 class WeatherData(Base):
     __tablename__ = 'weather_data'
+    __table_args__ = (
+        Index('ux_weather_data_city_timestamp', 'city', 'timestamp', unique=True),
+        Index('ix_weather_data_timestamp', 'timestamp'),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     city = Column(String(100))
     temperature = Column(Float)
@@ -25,6 +29,10 @@ class WeatherData(Base):
 
 class AirQuality(Base):
     __tablename__ = 'air_quality'
+    __table_args__ = (
+        Index('ux_air_quality_city_timestamp', 'city', 'timestamp', unique=True),
+        Index('ix_air_quality_timestamp', 'timestamp'),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     city = Column(String(100))
     coordinates_lat = Column(Float)
@@ -42,6 +50,9 @@ class AirQuality(Base):
 
 class WeatherForecast(Base):
     __tablename__ = 'weather_forecast'
+    __table_args__ = (
+        Index('ux_weather_forecast_city_forecast_date', 'city', 'forecast_date', unique=True),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     city = Column(String(100))
     forecast_date = Column(DateTime)
@@ -50,8 +61,144 @@ class WeatherForecast(Base):
     weather = Column(String(255))
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class City(Base):
+    """Registry of tracked cities; the OpenWeather id is learned from weather responses"""
+    __tablename__ = 'cities'
+    __table_args__ = (
+        Index('ux_cities_name', 'name', unique=True),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(100))
+    province = Column(String(100))
+    lat = Column(Float)
+    lon = Column(Float)
+    owm_id = Column(Integer)  # OpenWeather city id, used by the group endpoint
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class QualityBaseline(Base):
+    """Streaming per-city statistics used by the anomaly rule (count, exponentially weighted mean/M2)"""
+    __tablename__ = 'quality_baselines'
+    __table_args__ = (
+        Index('ux_quality_baselines_table_city_metric', 'table_name', 'city', 'metric', unique=True),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String(100))
+    city = Column(String(100))
+    metric = Column(String(50))
+    count = Column(Integer)
+    mean = Column(Float)
+    m2 = Column(Float)        # Sum of squared deviations from the mean
+    observed_until = Column(DateTime)  # Latest reading folded in; repeats of it are skipped
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class ShardLease(Base):
+    """One shard of a sharded run, leased by a worker process or host"""
+    __tablename__ = 'shard_leases'
+    __table_args__ = (
+        Index('ux_shard_leases_run_shard', 'run_id', 'shard', unique=True),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(String(64))
+    shard = Column(Integer)
+    shard_count = Column(Integer)
+    status = Column(String(20), default='pending')  # 'pending', 'leased', 'done', 'failed'
+    owner = Column(String(100))
+    lease_expires_at = Column(DateTime)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    stats = Column(Text)  # JSON run statistics reported by the worker
+
+class WeatherRollup(Base):
+    """Hourly and daily weather aggregates per city, refreshed after every load"""
+    __tablename__ = 'weather_rollups'
+    __table_args__ = (
+        Index('ux_weather_rollups_key', 'granularity', 'bucket', 'city', unique=True),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    granularity = Column(String(10))  # 'hour' or 'day'
+    bucket = Column(DateTime)         # start of the hour or day (UTC)
+    city = Column(String(100))
+    province = Column(String(100))
+    samples = Column(Integer)
+    temperature_avg = Column(Float)
+    temperature_min = Column(Float)
+    temperature_max = Column(Float)
+    humidity_avg = Column(Float)
+    wind_speed_avg = Column(Float)
+    pressure_avg = Column(Float)
+    last_seen = Column(DateTime)      # latest raw timestamp in the bucket
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class AirQualityRollup(Base):
+    """Hourly and daily air quality aggregates per city, refreshed after every load"""
+    __tablename__ = 'air_quality_rollups'
+    __table_args__ = (
+        Index('ux_air_quality_rollups_key', 'granularity', 'bucket', 'city', unique=True),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    granularity = Column(String(10))
+    bucket = Column(DateTime)
+    city = Column(String(100))
+    samples = Column(Integer)
+    aqi_avg = Column(Float)
+    aqi_max = Column(Integer)
+    pm2_5_avg = Column(Float)
+    pm10_avg = Column(Float)
+    no2_avg = Column(Float)
+    o3_avg = Column(Float)
+    last_seen = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class PipelineRun(Base):
+    """Timing and throughput summary of one pipeline or scheduled job run"""
+    __tablename__ = 'pipeline_runs'
+    __table_args__ = (
+        Index('ix_pipeline_runs_started_at', 'started_at'),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(String(64))
+    job = Column(String(50))      # 'full', 'weather', 'air_quality', 'forecast'
+    status = Column(String(20))   # 'succeeded', 'failed'
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    duration_seconds = Column(Float)
+    cities_succeeded = Column(Integer)
+    cities_failed = Column(Integer)
+    rows_loaded = Column(Integer)
+    error = Column(String(500))
+    summary = Column(Text)  # JSON per-stage histograms and counters recorded during the run
+
+class LoadWatermark(Base):
+    """Newest row loaded into each time-series table, maintained by the loader for freshness checks"""
+    __tablename__ = 'load_watermarks'
+    table_name = Column(String(100), primary_key=True)
+    latest_timestamp = Column(DateTime)  # never moves backwards, even for backfills
+    rows_loaded = Column(Integer)        # rows in the most recent load
+    loaded_at = Column(DateTime)
+
+# Column whose maximum is a table's load watermark
+WATERMARK_COLUMNS = {
+    'weather_data': 'timestamp',
+    'air_quality': 'timestamp',
+    'weather_forecast': 'created_at',
+}
+
+# Natural keys used by the merge load mode, backed by the unique indexes above
+NATURAL_KEYS = {
+    'weather_data': ('city', 'timestamp'),
+    'air_quality': ('city', 'timestamp'),
+    'weather_forecast': ('city', 'forecast_date'),
+    'quality_baselines': ('table_name', 'city', 'metric'),
+    'cities': ('name',),
+    'weather_rollups': ('granularity', 'bucket', 'city'),
+    'air_quality_rollups': ('granularity', 'bucket', 'city'),
+}
+
 class DataQuality(Base):
     __tablename__ = 'data_quality'
+    __table_args__ = (
+        Index('ix_data_quality_timestamp', 'timestamp'),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     table_name = Column(String(100))
     check_type = Column(String(100))  # 'missing_data', 'outlier', 'duplicate'
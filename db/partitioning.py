@@ -0,0 +1,155 @@
+"""Monthly partitioning and retention for the time-series tables.
+
+On SQL Server the tables can be moved onto a monthly RANGE RIGHT partition
+scheme; retention then truncates whole partitions and merges their
+boundaries instead of running large DELETEs. Other databases fall back to a
+range DELETE on the (indexed) time column.
+
+Usage:
+    python -m db.partitioning setup      # one-off, SQL Server only
+    python -m db.partitioning maintain   # add future partitions, apply retention
+"""
+from sqlalchemy import delete, text
+from datetime import datetime, timedelta
+from .engine import get_engine
+from .models import Base
+import logging
+
+PARTITION_FUNCTION = "pf_monthly"
+PARTITION_SCHEME = "ps_monthly"
+
+# Partitioned tables and the column that decides their partition
+PARTITIONED_TABLES = {
+    "weather_data": "timestamp",
+    "air_quality": "timestamp",
+    "weather_forecast": "forecast_date",
+}
+
+def month_start(value: datetime, months: int = 0) -> datetime:
+    """First instant of the month containing value, shifted by a number of months"""
+    month_index = value.year * 12 + value.month - 1 + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+def _boundaries(conn) -> list:
+    """Current boundary values of the partition function, oldest first"""
+    return [row[0] for row in conn.execute(text("""
+        SELECT CAST(prv.value AS datetime)
+        FROM sys.partition_range_values prv
+        JOIN sys.partition_functions pf ON pf.function_id = prv.function_id
+        WHERE pf.name = :name
+        ORDER BY prv.boundary_id
+    """), {"name": PARTITION_FUNCTION})]
+
+def is_partitioned(engine) -> bool:
+    """Whether the monthly partition function exists on this database"""
+    if engine.dialect.name != "mssql":
+        return False
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT 1 FROM sys.partition_functions WHERE name = :name"),
+                            {"name": PARTITION_FUNCTION}).first() is not None
+
+def _move_table_to_scheme(conn, table_name: str, column: str):
+    """Rebuild a table's clustered and secondary indexes on the partition scheme"""
+    table = Base.metadata.tables[table_name]
+    quote = conn.dialect.identifier_preparer.quote
+    target = conn.dialect.identifier_preparer.format_table(table)
+    on_scheme = f"ON {PARTITION_SCHEME}({quote(column)})"
+
+    # The identity primary key cannot be partition-aligned, so it becomes a
+    # plain aligned index and the table is clustered on (time, id) instead
+    pk_name = conn.execute(text("""
+        SELECT name FROM sys.key_constraints
+        WHERE parent_object_id = OBJECT_ID(:table) AND type = 'PK'
+    """), {"table": table_name}).scalar()
+    if pk_name:
+        conn.exec_driver_sql(f"ALTER TABLE {target} DROP CONSTRAINT {quote(pk_name)}")
+    conn.exec_driver_sql(f"CREATE CLUSTERED INDEX cx_{table_name} ON {target} ({quote(column)}, id) {on_scheme}")
+    conn.exec_driver_sql(f"CREATE INDEX ix_{table_name}_id ON {target} (id) {on_scheme}")
+
+    for index in table.indexes:
+        columns = ", ".join(quote(indexed.name) for indexed in index.columns)
+        unique = "UNIQUE " if index.unique else ""
+        conn.exec_driver_sql(
+            f"CREATE {unique}INDEX {quote(index.name)} ON {target} ({columns}) "
+            f"WITH (DROP_EXISTING = ON) {on_scheme}"
+        )
+
+def setup_monthly_partitions(engine, months_back: int = 12, months_ahead: int = 3):
+    """Create the monthly partition scheme and move the time-series tables onto it"""
+    if engine.dialect.name != "mssql":
+        raise NotImplementedError("Monthly partitioning is only available on SQL Server")
+    if is_partitioned(engine):
+        logging.info("Partition function %s already exists", PARTITION_FUNCTION)
+        return
+
+    now = datetime.utcnow()
+    boundaries = [month_start(now, offset) for offset in range(-months_back, months_ahead + 1)]
+    values = ", ".join(f"'{boundary:%Y-%m-%d}'" for boundary in boundaries)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            f"CREATE PARTITION FUNCTION {PARTITION_FUNCTION} (datetime) AS RANGE RIGHT FOR VALUES ({values})"
+        )
+        conn.exec_driver_sql(f"CREATE PARTITION SCHEME {PARTITION_SCHEME} AS PARTITION {PARTITION_FUNCTION} ALL TO ([PRIMARY])")
+        for table_name, column in PARTITIONED_TABLES.items():
+            _move_table_to_scheme(conn, table_name, column)
+            logging.info("Partitioned %s monthly on %s", table_name, column)
+
+def add_future_partitions(engine, months_ahead: int = 3):
+    """Split empty boundaries ahead of time so new months never land in one partition"""
+    with engine.begin() as conn:
+        existing = set(_boundaries(conn))
+        for offset in range(1, months_ahead + 1):
+            boundary = month_start(datetime.utcnow(), offset)
+            if boundary in existing:
+                continue
+            conn.exec_driver_sql(f"ALTER PARTITION SCHEME {PARTITION_SCHEME} NEXT USED [PRIMARY]")
+            conn.exec_driver_sql(f"ALTER PARTITION FUNCTION {PARTITION_FUNCTION}() SPLIT RANGE ('{boundary:%Y-%m-%d}')")
+            logging.info("Added partition boundary %s", boundary.date())
+
+def apply_retention(engine, retention_days: int) -> dict:
+    """Remove data older than the retention window, by partition where possible"""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+
+    if is_partitioned(engine):
+        with engine.begin() as conn:
+            # RANGE RIGHT: partition n holds values below boundary n, so every
+            # partition whose upper boundary is at or before the cutoff is expired
+            expired = [boundary for boundary in _boundaries(conn) if boundary <= cutoff]
+            if not expired:
+                return {}
+            for table_name in PARTITIONED_TABLES:
+                conn.exec_driver_sql(f"TRUNCATE TABLE {table_name} WITH (PARTITIONS (1 TO {len(expired)}))")
+            for boundary in expired:
+                conn.exec_driver_sql(f"ALTER PARTITION FUNCTION {PARTITION_FUNCTION}() MERGE RANGE ('{boundary:%Y-%m-%d}')")
+        logging.info("Dropped %d monthly partitions older than %s", len(expired), expired[-1].date())
+        return {table_name: len(expired) for table_name in PARTITIONED_TABLES}
+
+    # Without partitions, fall back to a range delete on the indexed time column
+    deleted = {}
+    with engine.begin() as conn:
+        for table_name, column in PARTITIONED_TABLES.items():
+            table = Base.metadata.tables[table_name]
+            result = conn.execute(delete(table).where(table.c[column] < cutoff))
+            deleted[table_name] = result.rowcount
+    logging.info("Deleted rows older than %s: %s", cutoff, deleted)
+    return deleted
+
+def maintain_partitions(engine, retention_days: int, months_ahead: int = 3):
+    """Routine maintenance: keep future partitions ready and enforce retention"""
+    if is_partitioned(engine):
+        add_future_partitions(engine, months_ahead)
+    return apply_retention(engine, retention_days)
+
+if __name__ == "__main__":
+    import sys
+    from config import DATA_RETENTION_DAYS, get_connection_string
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    engine = get_engine(get_connection_string())
+    if sys.argv[1:] == ["setup"]:
+        setup_monthly_partitions(engine)
+    elif sys.argv[1:] == ["maintain"]:
+        maintain_partitions(engine, DATA_RETENTION_DAYS)
+    else:
+        print(__doc__)
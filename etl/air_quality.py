@@ -1,35 +1,33 @@
 import requests
-from config import OPENWEATHER_API_KEY
+from config import OPENWEATHER_API_KEY, AIR_POLLUTION_URL, FORECAST_URL
+from etl.client import get_json
+from etl.resilience import CircuitOpenError
 import logging
 
 def get_air_quality(lat: float, lon: float):
     """Get air quality data for given coordinates"""
-    url = "http://api.openweathermap.org/data/2.5/air_pollution"
+    url = AIR_POLLUTION_URL
     params = {
         "lat": lat,
         "lon": lon,
         "appid": OPENWEATHER_API_KEY
     }
     try:
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        return get_json(url, params)
+    except (requests.exceptions.RequestException, CircuitOpenError) as e:
         logging.error("Failed to fetch air quality data for lat=%s, lon=%s: %s", lat, lon, e)
         return None
 
 def get_weather_forecast(city: str):
     """Get 5-day weather forecast for a city"""
-    url = "https://api.openweathermap.org/data/2.5/forecast"
+    url = FORECAST_URL
     params = {
         "q": city,
         "appid": OPENWEATHER_API_KEY,
         "units": "metric"
     }
     try:
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        return get_json(url, params)
+    except (requests.exceptions.RequestException, CircuitOpenError) as e:
         logging.error("Failed to fetch forecast data for %s: %s", city, e)
         return None
@@ -0,0 +1,207 @@
+"""Columnar Parquet archive of the time-series tables.
+
+With ARCHIVE_ENABLED, every batch load_batch commits is also written under
+ARCHIVE_PATH, Hive-partitioned by table, date and city:
+
+    archive/weather_data/date=2026-10-17/city=Amsterdam/part-<ns>-<id>-0.parquet
+
+Columns are stored in the compact types of the table's model (float32,
+int32, dictionary-encoded text) with zstd compression. Each load adds small
+files, so compact() merges every partition into one file sorted by time and
+drops the rows merge-mode reloads archived twice. read_archive() and
+iter_archive() prune partitions by date and city and push time filters down
+to the Parquet row groups, so analytical scans and backfills never touch
+the OLTP database.
+
+Usage:
+    python -m etl.archive compact [--table weather_data] [--min-files 2]
+"""
+import functools
+import logging
+import operator
+import os
+import time
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sqlalchemy import Boolean, DateTime, Float, Integer, String, Text
+from config import ARCHIVE_PATH
+from db.models import Base, NATURAL_KEYS
+from monitoring import metrics
+
+# Column each table is partitioned and range-filtered on
+ARCHIVE_TIME_COLUMNS = {
+    "weather_data": "timestamp",
+    "air_quality": "timestamp",
+    "weather_forecast": "forecast_date",
+}
+
+_PARTITIONING = ds.partitioning(pa.schema([("date", pa.string()), ("city", pa.string())]), flavor="hive")
+
+# Checked in order, so Text is matched before its base class String
+_ARROW_TYPES = (
+    (Float, pa.float32()),
+    (Integer, pa.int32()),
+    (DateTime, pa.timestamp("us")),
+    (Boolean, pa.bool_()),
+    (Text, pa.string()),
+    (String, pa.dictionary(pa.int32(), pa.string())),
+)
+
+def arrow_schema(table_name: str) -> pa.Schema:
+    """Columns of an archived table in compact Arrow types, without the surrogate id"""
+    fields = []
+    for column in Base.metadata.tables[table_name].columns:
+        if column.name == "id":
+            continue
+        if column.name == "city":
+            # A partition key: kept in the directory name, not in the files
+            fields.append(pa.field("city", pa.string()))
+            continue
+        arrow_type = next(arrow_type for sql_type, arrow_type in _ARROW_TYPES if isinstance(column.type, sql_type))
+        fields.append(pa.field(column.name, arrow_type))
+    return pa.schema(fields)
+
+def to_arrow(df: pd.DataFrame, table_name: str) -> pa.Table:
+    """Convert a loaded frame to the archive schema plus its date partition column"""
+    schema = arrow_schema(table_name)
+    times = pd.to_datetime(df[ARCHIVE_TIME_COLUMNS[table_name]])
+    # Model columns missing from the frame are archived as nulls; others are dropped
+    df = df.reindex(columns=schema.names).assign(**{ARCHIVE_TIME_COLUMNS[table_name]: times})
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    return table.append_column("date", pa.array(times.dt.strftime("%Y-%m-%d"), pa.string()))
+
+def _file_schema(table_name: str) -> pa.Schema:
+    schema = arrow_schema(table_name)
+    return schema.remove(schema.get_field_index("city"))
+
+def _basename() -> str:
+    # Names sort in write order, which compaction relies on to keep the latest rows
+    return f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+
+def write_batch(frames: dict, root: str = ARCHIVE_PATH) -> dict:
+    """Append frames to the archive as new files; tables without a time column are skipped"""
+    row_counts = {}
+    for table_name, df in frames.items():
+        if df is None or df.empty or ARCHIVE_TIME_COLUMNS.get(table_name) not in df.columns:
+            continue
+        start = time.perf_counter()
+        ds.write_dataset(
+            to_arrow(df, table_name), os.path.join(root, table_name), format="parquet",
+            partitioning=_PARTITIONING, basename_template=_basename() + "-{i}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+        )
+        metrics.archive_seconds.observe(time.perf_counter() - start, table=table_name)
+        metrics.rows_archived.inc(len(df), table=table_name)
+        row_counts[table_name] = len(df)
+    return row_counts
+
+def archive_filter(table_name: str, start=None, end=None, cities: list = None):
+    """Filter on the partitions and the time column; end is exclusive"""
+    time_column = ds.field(ARCHIVE_TIME_COLUMNS[table_name])
+    conditions = []
+    if start is not None:
+        start = pd.Timestamp(start)
+        conditions += [ds.field("date") >= start.strftime("%Y-%m-%d"),
+                       time_column >= pa.scalar(start.to_pydatetime(), pa.timestamp("us"))]
+    if end is not None:
+        end = pd.Timestamp(end)
+        conditions += [ds.field("date") <= end.strftime("%Y-%m-%d"),
+                       time_column < pa.scalar(end.to_pydatetime(), pa.timestamp("us"))]
+    if cities:
+        conditions.append(ds.field("city").isin(list(cities)))
+    return functools.reduce(operator.and_, conditions) if conditions else None
+
+def _dataset_schema(table_name: str) -> pa.Schema:
+    return arrow_schema(table_name).append(pa.field("date", pa.string()))
+
+def _dataset(table_name: str, root: str):
+    path = os.path.join(root, table_name)
+    if not os.path.isdir(path):
+        return None
+    # An explicit schema skips reading every file footer to discover one
+    return ds.dataset(path, schema=_dataset_schema(table_name), format="parquet", partitioning=_PARTITIONING)
+
+def _frame(table: pa.Table) -> pd.DataFrame:
+    df = table.to_pandas()
+    if "city" in df.columns:
+        df["city"] = df["city"].astype("category")
+    return df
+
+def iter_archive(table_name: str, start=None, end=None, cities: list = None, columns: list = None,
+                 root: str = ARCHIVE_PATH, batch_size: int = 65536):
+    """Yield matching rows as DataFrames of at most batch_size rows, for scans larger than memory"""
+    dataset = _dataset(table_name, root)
+    if dataset is None:
+        return
+    for batch in dataset.to_batches(columns=columns, filter=archive_filter(table_name, start, end, cities),
+                                    batch_size=batch_size):
+        if batch.num_rows:
+            yield _frame(pa.Table.from_batches([batch]))
+
+def read_archive(table_name: str, start=None, end=None, cities: list = None, columns: list = None,
+                 root: str = ARCHIVE_PATH) -> pd.DataFrame:
+    """Archived rows between start and end (exclusive) for the given cities, as one DataFrame"""
+    dataset = _dataset(table_name, root)
+    if columns is None:
+        columns = arrow_schema(table_name).names
+    if dataset is None:
+        return _frame(_dataset_schema(table_name).empty_table().select(columns))
+    return _frame(dataset.to_table(columns=columns, filter=archive_filter(table_name, start, end, cities)))
+
+def _compact_partition(directory: str, paths: list, table_name: str) -> int:
+    """Rewrite a partition's files as one; returns the number of duplicate rows dropped"""
+    schema = _file_schema(table_name)
+    time_column = ARCHIVE_TIME_COLUMNS[table_name]
+    df = pa.concat_tables(pq.read_table(path, schema=schema, partitioning=None) for path in paths).to_pandas()
+    # City is fixed within a partition, so the rest of the natural key identifies a row
+    keys = [key for key in NATURAL_KEYS.get(table_name, ()) if key != "city"] or [time_column]
+    compacted = df.drop_duplicates(subset=keys, keep="last").sort_values(time_column, kind="stable")
+
+    # Written under a hidden name, which readers skip, then moved into place
+    temporary = os.path.join(directory, f".compact-{uuid.uuid4().hex}.parquet")
+    pq.write_table(pa.Table.from_pandas(compacted, schema=schema, preserve_index=False), temporary,
+                   compression="zstd")
+    os.replace(temporary, os.path.join(directory, _basename() + "-0.parquet"))
+    for path in paths:
+        os.remove(path)
+    return len(df) - len(compacted)
+
+def compact(root: str = ARCHIVE_PATH, tables: list = None, min_files: int = 2) -> dict:
+    """Merge every partition holding at least min_files files into one.
+
+    Files written while a partition is compacted are left alone. Run one
+    compaction at a time.
+    """
+    stats = {}
+    for table_name in tables or ARCHIVE_TIME_COLUMNS:
+        partitions = files_merged = rows_dropped = 0
+        for directory, _, names in os.walk(os.path.join(root, table_name)):
+            files = sorted(name for name in names if name.startswith("part-") and name.endswith(".parquet"))
+            if len(files) < min_files:
+                continue
+            rows_dropped += _compact_partition(directory, [os.path.join(directory, name) for name in files],
+                                               table_name)
+            partitions += 1
+            files_merged += len(files)
+        if partitions:
+            logging.info("Compacted %d %s archive partitions: %d files merged, %d duplicate rows dropped",
+                         partitions, table_name, files_merged, rows_dropped)
+        stats[table_name] = {"partitions": partitions, "files_merged": files_merged, "rows_dropped": rows_dropped}
+    return stats
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["compact"])
+    parser.add_argument("--table", action="append", choices=sorted(ARCHIVE_TIME_COLUMNS))
+    parser.add_argument("--min-files", type=int, default=2)
+    args = parser.parse_args()
+
+    print(json.dumps(compact(tables=args.table, min_files=args.min_files), indent=2))
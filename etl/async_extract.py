@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import time
+import aiohttp
+from config import OPENWEATHER_API_KEY, OPENWEATHER_BASE_URL, EXTRACT_CONCURRENCY, REQUEST_TIMEOUT, CITY_WINDOW
+from etl import cache as response_caches
+from etl import rate_limit
+from etl import resilience
+from etl.registry import as_city, group_batches
+from monitoring import metrics
+
+class AsyncWeatherClient:
+    """Asynchronous OpenWeather client sharing one pooled, keep-alive HTTP session"""
+
+    def __init__(self, api_key: str = OPENWEATHER_API_KEY, base_url: str = OPENWEATHER_BASE_URL,
+                 concurrency: int = EXTRACT_CONCURRENCY, timeout: int = REQUEST_TIMEOUT,
+                 limiter: rate_limit.RateLimiter = None, cache: response_caches.ResponseCache = None,
+                 retry_policy: resilience.RetryPolicy = None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.limiter = limiter or rate_limit.openweather_limiter
+        self.cache = response_caches.response_cache if cache is None else cache
+        self.retry_policy = retry_policy or resilience.default_policy
+        self._session = None
+
+    async def __aenter__(self):
+        # The connector limit caps the number of in-flight requests across all cities
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60, ttl_dns_cache=300)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._session.close()
+
+    async def _send(self, url: str, params: dict, headers: dict, endpoint: str):
+        """One rate-limited GET returning the response and, for 2xx responses, its parsed body"""
+        waited = time.perf_counter()
+        await self.limiter.acquire_async()
+        start = time.perf_counter()
+        metrics.rate_limit_wait_seconds.observe(start - waited, endpoint=endpoint)
+        status_code = None
+        try:
+            async with self._session.get(url, params=params, headers=headers) as response:
+                status_code = response.status
+                payload = await response.json() if 200 <= status_code < 300 else None
+                return response, payload
+        finally:
+            self.limiter.release(status_code)
+            metrics.extract_seconds.observe(time.perf_counter() - start, endpoint=endpoint)
+            metrics.extract_requests.inc(endpoint=endpoint, outcome=status_code or "error")
+
+    async def _get_json(self, endpoint: str, params: dict):
+        url = f"{self.base_url}/{endpoint}"
+        cache = self.cache
+        key = response_caches.cache_key(url, params)
+        ttl = response_caches.endpoint_ttl(url)
+        entry = cache.lookup(key) if cache is not None and ttl else None
+        if entry is not None and entry.is_fresh(cache.clock()):
+            metrics.extract_requests.inc(endpoint=endpoint, outcome="cache")
+            return entry.value
+
+        headers = {"If-None-Match": entry.etag} if entry is not None and entry.etag else None
+        params = {name: value for name, value in {**params, "appid": self.api_key}.items() if value is not None}
+        breaker = resilience.breaker_for(url)
+        attempt = 0
+        while True:
+            breaker.before_call()
+            try:
+                response, payload = await self._send(url, params, headers, endpoint)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                breaker.record_failure()
+                delay = self.retry_policy.next_delay(attempt)
+                if delay is None:
+                    raise
+            else:
+                if response.status not in self.retry_policy.retry_statuses:
+                    breaker.record_success()
+                    break
+                if response.status >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                delay = self.retry_policy.next_delay(attempt, response.headers.get("Retry-After"))
+                if delay is None:
+                    response.raise_for_status()
+            metrics.retries.inc(endpoint=endpoint)
+            logging.warning("Retrying %s in %.2fs (attempt %d of %d)", endpoint, delay, attempt + 2,
+                            self.retry_policy.max_attempts)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        if response.status == 304 and entry is not None:
+            cache.renew(key, entry, ttl)
+            return entry.value
+        response.raise_for_status()
+
+        if cache is not None and ttl:
+            cache.store(key, payload, ttl, response.headers.get("ETag"))
+        return payload
+
+    async def get_weather(self, city: str):
+        """Get current weather for a city"""
+        return await self._get_json("weather", {"q": city, "units": "metric"})
+
+    async def get_weather_group(self, city_ids: list) -> list:
+        """Get current weather for up to 20 cities by OpenWeather id in one request"""
+        payload = await self._get_json("group", {"id": ",".join(str(city_id) for city_id in city_ids), "units": "metric"})
+        return payload.get("list", [])
+
+    async def get_air_quality(self, lat: float, lon: float):
+        """Get air quality data for given coordinates"""
+        try:
+            return await self._get_json("air_pollution", {"lat": lat, "lon": lon})
+        except (aiohttp.ClientError, asyncio.TimeoutError, resilience.CircuitOpenError) as e:
+            logging.error("Failed to fetch air quality data for lat=%s, lon=%s: %s", lat, lon, e)
+            return None
+
+    async def get_weather_forecast(self, city: str):
+        """Get 5-day weather forecast for a city"""
+        try:
+            return await self._get_json("forecast", {"q": city, "units": "metric"})
+        except (aiohttp.ClientError, asyncio.TimeoutError, resilience.CircuitOpenError) as e:
+            logging.error("Failed to fetch forecast data for %s: %s", city, e)
+            return None
+
+    async def fetch_city(self, city, weather_data: dict = None) -> dict:
+        """Fetch weather, air quality and forecast payloads for a single city.
+
+        city is a registry record or a name. With known coordinates all three
+        requests run concurrently; weather_data skips the weather request when
+        it already came from a group request.
+        """
+        city = as_city(city)
+        name = city['name']
+        forecast_task = asyncio.create_task(self.get_weather_forecast(name))
+        air_quality_task = None
+        if city.get('lat') is not None and city.get('lon') is not None:
+            air_quality_task = asyncio.create_task(self.get_air_quality(city['lat'], city['lon']))
+
+        try:
+            if weather_data is None:
+                try:
+                    weather_data = await self.get_weather(name)
+                except Exception as e:
+                    logging.error("Failed to fetch weather data for %s: %s", name, e)
+                    return {'city': name, 'error': str(e), 'success': False}
+
+            if air_quality_task is None:
+                coords = weather_data['coord']
+                air_quality_task = asyncio.create_task(self.get_air_quality(coords['lat'], coords['lon']))
+            air_quality_data = await air_quality_task
+            forecast_data = await forecast_task
+        finally:
+            # After a failed weather request, or when this city is cancelled
+            await _cancel_pending([forecast_task, air_quality_task])
+
+        return {
+            'city': name,
+            'weather': weather_data,
+            'air_quality': air_quality_data,
+            'forecast': forecast_data,
+            'success': True
+        }
+
+    async def fetch_group_weather(self, cities: list) -> dict:
+        """Current weather by city name for every city with a known id, via the group endpoint"""
+        batches = group_batches(cities)
+        results = await asyncio.gather(*(self.get_weather_group([city['owm_id'] for city in batch])
+                                         for batch in batches), return_exceptions=True)
+        weather_by_name = {}
+        for batch, payloads in zip(batches, results):
+            if isinstance(payloads, Exception):
+                # Those cities fall back to one weather request each
+                logging.warning("Group weather request failed for %d cities: %s", len(batch), payloads)
+                continue
+            by_id = {payload.get('id'): payload for payload in payloads}
+            for city in batch:
+                if city['owm_id'] in by_id:
+                    weather_by_name[city['name']] = by_id[city['owm_id']]
+        return weather_by_name
+
+async def _cancel_pending(tasks: list):
+    """Cancel the tasks that have not finished and wait until they have"""
+    pending = [task for task in tasks if task is not None and not task.done()]
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+async def iter_cities_async(cities: list, window: int = CITY_WINDOW, **client_options):
+    """Yield each city's payloads as soon as they arrive, fetching a window of cities at a time.
+
+    Only one window of cities is in flight or held in memory, however long
+    the city list; results come in completion order. When the consumer stops
+    early, the rest of the window is cancelled before the session closes.
+    """
+    async with AsyncWeatherClient(**client_options) as client:
+        for start in range(0, len(cities), window):
+            chunk = cities[start:start + window]
+            weather_by_name = await client.fetch_group_weather(chunk)
+            tasks = [asyncio.create_task(client.fetch_city(city, weather_by_name.get(as_city(city)['name'])))
+                     for city in chunk]
+            try:
+                for result in asyncio.as_completed(tasks):
+                    yield await result
+            finally:
+                await _cancel_pending(tasks)
+
+async def extract_cities_async(cities: list, **client_options) -> list:
+    """Fetch the raw payloads for all cities into a list"""
+    return [result async for result in iter_cities_async(cities, **client_options)]
+
+def iter_cities(cities: list, window: int = CITY_WINDOW, **client_options):
+    """Synchronous generator over the async engine; one event loop and session serve every window"""
+    loop = asyncio.new_event_loop()
+    results = iter_cities_async(cities, window, **client_options)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(results.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        # Closes the session when the consumer stops early
+        loop.run_until_complete(results.aclose())
+        loop.close()
+
+def extract_cities(cities: list, **client_options) -> list:
+    """Synchronous entry point for the async extraction engine"""
+    return list(iter_cities(cities, **client_options))
@@ -0,0 +1,187 @@
+"""Streaming per-city baselines for statistical anomaly detection.
+
+Each (table, city, metric) keeps a running count, mean and M2 (sum of
+squared deviations). New rows are summarized per city with one groupby and
+combined with the stored state using Chan's parallel form of Welford's
+update, so a run costs O(new rows) no matter how much history exists.
+
+Older samples are exponentially down-weighted: a sample's weight halves
+after ANOMALY_HALF_LIFE newer samples of the same city, so the baseline
+follows seasonal drift instead of freezing on its first weeks. The weight
+of the history follows from the count alone, so no extra state is stored.
+"""
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from sqlalchemy import select
+from config import ANOMALY_HALF_LIFE
+from db.engine import get_engine, ensure_schema
+from db.models import QualityBaseline
+
+STATE_COLUMNS = ['count', 'mean', 'm2', 'observed_until']
+
+def decay_factor(half_life: float = ANOMALY_HALF_LIFE) -> float:
+    """Per-sample weight decay for a half-life in samples; 1.0 (no decay) when half_life is 0"""
+    return 0.5 ** (1.0 / half_life) if half_life else 1.0
+
+def weight(count, decay: float):
+    """Total weight of `count` samples when each newer sample decays the older ones by `decay`"""
+    if decay == 1.0:
+        return count
+    return (1 - decay ** count) / (1 - decay)
+
+def combine(current: pd.DataFrame, batch: pd.DataFrame, decay: float = 1.0) -> pd.DataFrame:
+    """Merge two sets of (count, mean, m2) statistics aligned on the same index.
+
+    The batch is the newer of the two; with decay < 1 the current statistics
+    are down-weighted by one factor per sample in the batch.
+    """
+    count_a = current['count'].fillna(0)
+    mean_a = current['mean'].fillna(0.0)
+    m2_a = current['m2'].fillna(0.0)
+    count_b, mean_b, m2_b = batch['count'], batch['mean'], batch['m2']
+
+    fade = decay ** count_b
+    weight_a = weight(count_a, decay) * fade
+    weight_b = weight(count_b, decay)
+    total = weight_a + weight_b
+    delta = mean_b - mean_a
+    return pd.DataFrame({
+        'count': (count_a + count_b).astype('int64'),
+        'mean': mean_a + delta * weight_b / total,
+        'm2': m2_a * fade + m2_b + delta ** 2 * weight_a * weight_b / total,
+        'observed_until': pd.concat([pd.to_datetime(current['observed_until']),
+                                     pd.to_datetime(batch['observed_until'])], axis=1).max(axis=1),
+    }, index=batch.index)
+
+def summarize(df: pd.DataFrame, metrics: list, observed_until: pd.Series = None) -> pd.DataFrame:
+    """Per (city, metric) count, mean, M2 and latest timestamp of a batch of rows.
+
+    Readings no newer than observed_until, indexed by (city, metric), are
+    left out: the provider repeats an observation until it has a new one.
+    """
+    if 'timestamp' not in df.columns:
+        df = df.assign(timestamp=pd.NaT)
+    values = df[['city', 'timestamp'] + metrics].melt(id_vars=['city', 'timestamp'], var_name='metric')
+    values = values.dropna(subset=['value'])
+    values['timestamp'] = pd.to_datetime(values['timestamp'])
+    if observed_until is not None:
+        seen = pd.to_datetime(observed_until.reindex(pd.MultiIndex.from_frame(values[['city', 'metric']])))
+        values = values[~(values['timestamp'].to_numpy() <= seen.to_numpy())]
+    grouped = values.groupby(['city', 'metric'])
+    stats = grouped['value'].agg(['count', 'mean', 'var'])
+    stats['m2'] = stats.pop('var').fillna(0.0) * (stats['count'] - 1)
+    stats['observed_until'] = grouped['timestamp'].max()
+    return stats
+
+class BaselineStore:
+    """Per-city running statistics, loaded once and saved back by merge"""
+
+    def __init__(self, connection_string: str, half_life: float = ANOMALY_HALF_LIFE):
+        self.connection_string = connection_string
+        self.decay = decay_factor(half_life)
+        self._state = None
+        self._dirty = {}
+        self._checkpoint = None
+
+    def _load(self) -> dict:
+        if self._state is None:
+            engine = get_engine(self.connection_string)
+            ensure_schema(engine)
+            table = QualityBaseline.__table__
+            with engine.connect() as conn:
+                rows = conn.execute(select(table.c.table_name, table.c.city, table.c.metric, table.c['count'],
+                                           table.c.mean, table.c.m2, table.c.observed_until)).fetchall()
+            frame = pd.DataFrame(rows, columns=['table_name', 'city', 'metric'] + STATE_COLUMNS)
+            self._state = {
+                table_name: group.set_index(['city', 'metric'])[STATE_COLUMNS]
+                for table_name, group in frame.groupby('table_name')
+            }
+        return self._state
+
+    def get(self, table_name: str) -> pd.DataFrame:
+        """Current statistics for a table, indexed by (city, metric)"""
+        state = self._load().get(table_name)
+        if state is None:
+            index = pd.MultiIndex.from_arrays([[], []], names=['city', 'metric'])
+            state = pd.DataFrame(columns=STATE_COLUMNS, index=index, dtype='float64')
+        return state
+
+    def _moments(self, state: pd.DataFrame, df: pd.DataFrame, metric: str, min_count: int):
+        """Baseline mean and standard deviation for each row; NaN where the city is still warming up"""
+        stats = state.reindex(pd.MultiIndex.from_arrays([df['city'], [metric] * len(df)]))
+        count = stats['count'].to_numpy(dtype='float64')
+        mean = stats['mean'].to_numpy(dtype='float64')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(stats['m2'].to_numpy(dtype='float64') / (weight(count, self.decay) - 1))
+        std[(count < min_count) | ~(std > 0)] = np.nan
+        return mean, std
+
+    def zscores(self, table_name: str, df: pd.DataFrame, metrics: list, min_count: int) -> pd.DataFrame:
+        """Distance of each value from its city's mean in standard deviations.
+
+        NaN where the city has fewer than min_count samples or no spread yet.
+        """
+        state = self.get(table_name)
+        scores = {}
+        for metric in metrics:
+            mean, std = self._moments(state, df, metric, min_count)
+            scores[metric] = (df[metric].to_numpy(dtype='float64') - mean) / std
+        return pd.DataFrame(scores, index=df.index)
+
+    def winsorize(self, table_name: str, df: pd.DataFrame, metrics: list, min_count: int,
+                  threshold: float) -> pd.DataFrame:
+        """Clip values to within `threshold` standard deviations of their city's mean.
+
+        Flagged readings are folded in clipped, so a real shift in the weather
+        moves the baseline while a single glitch can only nudge it.
+        """
+        state = self.get(table_name)
+        clipped = df.copy()
+        for metric in metrics:
+            mean, std = self._moments(state, df, metric, min_count)
+            values = df[metric].to_numpy(dtype='float64')
+            limited = np.clip(values, mean - threshold * std, mean + threshold * std)
+            clipped[metric] = np.where(np.isnan(std), values, limited)
+        return clipped
+
+    def update(self, table_name: str, df: pd.DataFrame, metrics: list):
+        """Fold a batch of rows into the running statistics, skipping readings already folded in"""
+        metrics = [metric for metric in metrics if metric in df.columns]
+        if df.empty or not metrics:
+            return
+        state = self.get(table_name)
+        batch = summarize(df, metrics, state['observed_until'])
+        if batch.empty:
+            return
+        updated = combine(state.reindex(batch.index), batch, self.decay)
+        unchanged = state.drop(updated.index, errors='ignore')
+        self._state[table_name] = pd.concat([unchanged, updated]) if not unchanged.empty else updated
+        self._dirty.setdefault(table_name, set()).update(updated.index)
+
+    def checkpoint(self):
+        """Remember the current statistics so the updates that follow can be rolled back"""
+        # update() replaces each table's frame rather than mutating it, so shallow copies suffice
+        self._checkpoint = (dict(self._load()), {table_name: set(keys) for table_name, keys in self._dirty.items()})
+
+    def rollback(self):
+        """Forget the updates since the last checkpoint, e.g. when their rows failed to load"""
+        if self._checkpoint is not None:
+            self._state, self._dirty = self._checkpoint
+            self._checkpoint = None
+
+    def pending_frame(self) -> pd.DataFrame:
+        """Changed baselines as quality_baselines rows, ready for a merge load"""
+        frames = []
+        for table_name, keys in self._dirty.items():
+            rows = self._state[table_name].loc[sorted(keys)].reset_index()
+            rows.insert(0, 'table_name', table_name)
+            frames.append(rows)
+        if not frames:
+            return pd.DataFrame(columns=['table_name', 'city', 'metric'] + STATE_COLUMNS)
+        pending = pd.concat(frames, ignore_index=True)
+        pending['updated_at'] = datetime.utcnow()
+        return pending
+
+    def mark_saved(self):
+        self._dirty = {}
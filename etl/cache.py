@@ -0,0 +1,192 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from urllib.parse import urlencode
+from config import CACHE_BACKEND, CACHE_PATH, CACHE_MAX_ENTRIES, CACHE_TTLS
+
+# Never part of a cache key, so rotating the API key keeps the cache valid
+_EXCLUDED_PARAMS = {"appid"}
+
+def cache_key(url: str, params: dict) -> str:
+    """Stable key for a request: the URL plus its sorted parameters, without credentials"""
+    params = sorted((key, str(value)) for key, value in (params or {}).items()
+                    if key not in _EXCLUDED_PARAMS and value is not None)
+    return f"{url}?{urlencode(params)}"
+
+def endpoint_name(url: str) -> str:
+    """Last path segment of an API URL, e.g. 'weather' or 'air_pollution'"""
+    return url.rstrip("/").rsplit("/", 1)[-1]
+
+def endpoint_ttl(url: str) -> int:
+    """Freshness lifetime for the endpoint at the end of a URL; 0 means do not cache"""
+    return CACHE_TTLS.get(endpoint_name(url), 0)
+
+class CacheEntry:
+    """A cached payload with its validator and expiry time"""
+
+    def __init__(self, value, etag: str = None, expires_at: float = 0.0):
+        self.value = value
+        self.etag = etag
+        self.expires_at = expires_at
+
+    def is_fresh(self, now: float) -> bool:
+        return now < self.expires_at
+
+class ResponseCache(ABC):
+    """Base class for response caches with hit/miss accounting.
+
+    Expired entries are kept until evicted so their ETag can still be used
+    for a conditional request; a 304 answer then renews them.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self._stats_lock = threading.Lock()
+
+    def lookup(self, key: str) -> CacheEntry:
+        """Return the entry for a key, fresh or stale, counting a hit only when fresh"""
+        entry = self._get(key)
+        with self._stats_lock:
+            if entry is not None and entry.is_fresh(self.clock()):
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry
+
+    def store(self, key: str, value, ttl: int, etag: str = None):
+        if ttl > 0:
+            self._set(key, CacheEntry(value, etag, self.clock() + ttl))
+
+    def renew(self, key: str, entry: CacheEntry, ttl: int):
+        """Extend a stale entry after the server confirmed it is unchanged (304)"""
+        with self._stats_lock:
+            self.revalidations += 1
+        self.store(key, entry.value, ttl, entry.etag)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+    @abstractmethod
+    def _get(self, key: str) -> CacheEntry:
+        """The entry stored under a key, or None"""
+
+    @abstractmethod
+    def _set(self, key: str, entry: CacheEntry):
+        """Store an entry, evicting others if the cache is full"""
+
+    @abstractmethod
+    def clear(self):
+        """Remove every entry"""
+
+class MemoryCache(ResponseCache):
+    """In-process LRU cache bounded by entry count"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, clock=time.time):
+        super().__init__(clock)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> CacheEntry:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _set(self, key: str, entry: CacheEntry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class SQLiteCache(ResponseCache):
+    """On-disk cache shared between runs and processes, evicting least recently used entries"""
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = CACHE_MAX_ENTRIES, clock=time.time):
+        super().__init__(clock)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                etag TEXT,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_response_cache_accessed_at ON response_cache (accessed_at)")
+
+    def _get(self, key: str) -> CacheEntry:
+        with self._lock:
+            row = self._conn.execute("SELECT value, etag, expires_at FROM response_cache WHERE key = ?",
+                                     (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE response_cache SET accessed_at = ? WHERE key = ?", (self.clock(), key))
+        return CacheEntry(json.loads(row[0]), row[1], row[2])
+
+    def _set(self, key: str, entry: CacheEntry):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, etag, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(entry.value), entry.etag, entry.expires_at, self.clock())
+            )
+            evicted = self._conn.execute("""
+                DELETE FROM response_cache WHERE key IN (
+                    SELECT key FROM response_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,)).rowcount
+            self.evictions += max(evicted, 0)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+def build_cache(backend: str = CACHE_BACKEND) -> ResponseCache:
+    """Create the configured cache backend, or None when caching is disabled"""
+    if backend == "memory":
+        return MemoryCache()
+    if backend == "sqlite":
+        return SQLiteCache()
+    if backend != "none":
+        logging.warning("Unknown CACHE_BACKEND %r, response caching disabled", backend)
+    return None
+
+# Shared by every OpenWeather extractor in this process
+response_cache = build_cache()
@@ -0,0 +1,89 @@
+import logging
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from config import REQUEST_TIMEOUT, EXTRACT_CONCURRENCY
+from etl import cache as response_caches
+from etl import rate_limit
+from etl import resilience
+from monitoring import metrics
+
+# One pooled keep-alive session shared by every extractor
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=EXTRACT_CONCURRENCY))
+_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=EXTRACT_CONCURRENCY))
+
+def _send(url: str, params: dict, headers: dict, endpoint: str, limiter: rate_limit.RateLimiter):
+    """One rate-limited GET; network errors propagate"""
+    with metrics.rate_limit_wait_seconds.time(endpoint=endpoint):
+        limiter.acquire()
+    status_code = None
+    start = time.perf_counter()
+    try:
+        response = _session.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+        status_code = response.status_code
+        return response
+    finally:
+        limiter.release(status_code)
+        metrics.extract_seconds.observe(time.perf_counter() - start, endpoint=endpoint)
+        metrics.extract_requests.inc(endpoint=endpoint, outcome=status_code or "error")
+
+def get_json(url: str, params: dict, limiter: rate_limit.RateLimiter = None,
+             cache: response_caches.ResponseCache = None, policy: resilience.RetryPolicy = None):
+    """GET a JSON document through the shared session, response cache and rate limiter.
+
+    Fresh cached responses are returned without touching the network or the
+    rate limit; stale ones are revalidated with If-None-Match when they have an ETag.
+    Transient failures are retried with backoff, and CircuitOpenError is raised
+    without a request while the endpoint's circuit breaker is open.
+    """
+    limiter = limiter or rate_limit.openweather_limiter
+    policy = policy or resilience.default_policy
+    if cache is None:
+        cache = response_caches.response_cache
+    endpoint = response_caches.endpoint_name(url)
+    key = response_caches.cache_key(url, params)
+    ttl = response_caches.endpoint_ttl(url)
+    entry = cache.lookup(key) if cache is not None and ttl else None
+    if entry is not None and entry.is_fresh(cache.clock()):
+        metrics.extract_requests.inc(endpoint=endpoint, outcome="cache")
+        return entry.value
+
+    headers = {"If-None-Match": entry.etag} if entry is not None and entry.etag else None
+    breaker = resilience.breaker_for(url)
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            response = _send(url, params, headers, endpoint, limiter)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            breaker.record_failure()
+            delay = policy.next_delay(attempt)
+            if delay is None:
+                raise
+        else:
+            if response.status_code not in policy.retry_statuses:
+                breaker.record_success()
+                break
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                # Throttled: the API is up, so this does not count towards opening the circuit
+                breaker.record_success()
+            delay = policy.next_delay(attempt, response.headers.get("Retry-After"))
+            if delay is None:
+                response.raise_for_status()
+        metrics.retries.inc(endpoint=endpoint)
+        logging.warning("Retrying %s in %.2fs (attempt %d of %d)", endpoint, delay, attempt + 2, policy.max_attempts)
+        time.sleep(delay)
+        attempt += 1
+
+    if response.status_code == 304 and entry is not None:
+        cache.renew(key, entry, ttl)
+        return entry.value
+    response.raise_for_status()
+    payload = response.json()
+
+    if cache is not None and ttl:
+        cache.store(key, payload, ttl, response.headers.get("ETag"))
+    return payload
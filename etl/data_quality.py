@@ -1,64 +1,288 @@
 import pandas as pd
 from datetime import datetime
-from db.models import DataQuality
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from db.engine import get_engine, ensure_schema
+from etl.baselines import BaselineStore
+from etl.load import load_batch
+from config import ANOMALY_Z_THRESHOLD, ANOMALY_MIN_SAMPLES
 import logging
 
+# Matches the length of DataQuality.details
+MAX_DETAILS_LENGTH = 500
+
+POLLUTANT_COLUMNS = ['co', 'no', 'no2', 'o3', 'so2', 'pm2_5', 'pm10', 'nh3']
+
+class NotNullRule:
+    """Critical columns must be present and filled"""
+
+    def __init__(self, columns: list, check_type: str = 'missing_data', severity: str = 'failed'):
+        self.columns = columns
+        self.check_type = check_type
+        self.severity = severity
+
+    def evaluate(self, df: pd.DataFrame) -> pd.Series:
+        present = [column for column in self.columns if column in df.columns]
+        # A missing column counts as missing in every row
+        if len(present) < len(self.columns):
+            return pd.Series(True, index=df.index)
+        return df[present].isnull().any(axis=1)
+
+    def describe(self, df: pd.DataFrame, violations: pd.Series) -> str:
+        absent = [column for column in self.columns if column not in df.columns]
+        if absent:
+            return f"Missing columns: {absent}"
+        missing = df[self.columns].isnull().sum()
+        return f"Missing data in columns: {missing[missing > 0].to_dict()}"
+
+    def passed_details(self) -> str:
+        return 'No missing critical data'
+
+class RangeRule:
+    """Values must lie within [minimum, maximum]; missing values are not flagged"""
+
+    def __init__(self, columns: list, minimum=None, maximum=None, check_type: str = 'range_check',
+                 severity: str = 'warning'):
+        self.columns = columns
+        self.minimum = minimum
+        self.maximum = maximum
+        self.check_type = check_type
+        self.severity = severity
+
+    def evaluate(self, df: pd.DataFrame) -> pd.Series:
+        values = df[[column for column in self.columns if column in df.columns]]
+        outside = pd.DataFrame(False, index=values.index, columns=values.columns)
+        if self.minimum is not None:
+            outside |= values.lt(self.minimum)
+        if self.maximum is not None:
+            outside |= values.gt(self.maximum)
+        return outside.any(axis=1)
+
+    def describe(self, df: pd.DataFrame, violations: pd.Series) -> str:
+        columns = [column for column in ['city'] + self.columns if column in df.columns]
+        return f"Values outside [{self.minimum}, {self.maximum}]: {df.loc[violations, columns].to_dict('records')}"
+
+    def passed_details(self) -> str:
+        return f"All {', '.join(self.columns)} values within [{self.minimum}, {self.maximum}]"
+
+class UniqueRule:
+    """Rows must be unique on a natural key"""
+
+    def __init__(self, columns: list, check_type: str = 'duplicate_check', severity: str = 'warning'):
+        self.columns = columns
+        self.check_type = check_type
+        self.severity = severity
+
+    def evaluate(self, df: pd.DataFrame) -> pd.Series:
+        if not set(self.columns).issubset(df.columns):
+            return pd.Series(False, index=df.index)
+        return df.duplicated(subset=self.columns)
+
+    def describe(self, df: pd.DataFrame, violations: pd.Series) -> str:
+        return f"Found {int(violations.sum())} duplicate records"
+
+    def passed_details(self) -> str:
+        return 'No duplicates found'
+
+class AnomalyRule:
+    """Values must stay within a number of standard deviations of their city's baseline.
+
+    Every row is folded into the baselines afterwards, flagged values clipped
+    to the threshold, so a glitch barely moves the baseline while a lasting
+    change in the weather is still followed.
+    """
+
+    def __init__(self, table_name: str, metrics: list, baselines: BaselineStore,
+                 threshold: float = ANOMALY_Z_THRESHOLD, min_count: int = ANOMALY_MIN_SAMPLES,
+                 check_type: str = 'statistical_anomaly', severity: str = 'warning'):
+        self.table_name = table_name
+        self.metrics = metrics
+        self.baselines = baselines
+        self.threshold = threshold
+        self.min_count = min_count
+        self.check_type = check_type
+        self.severity = severity
+        self._scores = None
+
+    def evaluate(self, df: pd.DataFrame) -> pd.Series:
+        metrics = [metric for metric in self.metrics if metric in df.columns]
+        if 'city' not in df.columns or not metrics:
+            return pd.Series(False, index=df.index)
+        self._scores = self.baselines.zscores(self.table_name, df, metrics, self.min_count)
+        violations = self._scores.abs().gt(self.threshold).any(axis=1)
+        clipped = self.baselines.winsorize(self.table_name, df, metrics, self.min_count, self.threshold)
+        self.baselines.update(self.table_name, clipped, metrics)
+        return violations
+
+    def describe(self, df: pd.DataFrame, violations: pd.Series) -> str:
+        scores = self._scores[violations]
+        flagged = scores.where(scores.abs() > self.threshold).stack()
+        records = [{'city': df.at[index, 'city'], 'metric': metric,
+                    'value': df.at[index, metric], 'z': round(float(score), 1)}
+                   for (index, metric), score in flagged.items()]
+        return f"Values beyond {self.threshold} standard deviations of the city baseline: {records}"
+
+    def passed_details(self) -> str:
+        return f"All {', '.join(self.metrics)} values within {self.threshold} standard deviations"
+
+# Metrics tracked by the per-city baselines
+BASELINE_METRICS = {
+    'weather_data': ['temperature', 'humidity', 'pressure'],
+    'air_quality': POLLUTANT_COLUMNS,
+}
+
+# Declared rules per target table, evaluated together over each frame
+QUALITY_RULES = {
+    'weather_data': [
+        NotNullRule(['city', 'temperature', 'humidity']),
+        # Netherlands: -20°C to 45°C
+        RangeRule(['temperature'], -20, 45, 'temperature_outlier'),
+        RangeRule(['humidity'], 0, 100, 'humidity_range'),
+        UniqueRule(['city', 'timestamp']),
+    ],
+    'air_quality': [
+        NotNullRule(['city', 'aqi', 'timestamp']),
+        RangeRule(['aqi'], 1, 5, 'aqi_range'),
+        RangeRule(POLLUTANT_COLUMNS, minimum=0, check_type='negative_concentration'),
+        UniqueRule(['city', 'timestamp']),
+    ],
+    'weather_forecast': [
+        NotNullRule(['city', 'forecast_date', 'temperature']),
+        RangeRule(['temperature'], -20, 45, 'temperature_outlier'),
+        RangeRule(['humidity'], 0, 100, 'humidity_range'),
+        UniqueRule(['city', 'forecast_date']),
+    ],
+}
+
+def default_rules(baselines: BaselineStore) -> dict:
+    """QUALITY_RULES plus the baseline anomaly rules bound to a store"""
+    rules = {table_name: list(table_rules) for table_name, table_rules in QUALITY_RULES.items()}
+    for table_name, metrics in BASELINE_METRICS.items():
+        rules[table_name].append(AnomalyRule(table_name, metrics, baselines))
+    return rules
+
+class QualityReport:
+    """Outcome of evaluating a rule set; one result dict per rule"""
+
+    def __init__(self, results: list = None):
+        self.results = results or []
+
+    @property
+    def passed(self) -> bool:
+        return all(result['status'] == 'passed' for result in self.results)
+
+    @property
+    def failures(self) -> list:
+        return [result for result in self.results if result['status'] != 'passed']
+
+    @property
+    def issues(self) -> list:
+        """Readable summaries of every failed or warning check, for alerts.
+
+        Each starts with '<table> <check_type>', which alerts deduplicate on.
+        """
+        return [f"{result['table_name']} {result['check_type']} ({result['status']}): "
+                f"{result['violations']} of {result['rows']} rows" for result in self.failures]
+
+    def extend(self, other: 'QualityReport'):
+        self.results.extend(other.results)
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.results)
+
+def evaluate_rules(df: pd.DataFrame, table_name: str, rules: list) -> QualityReport:
+    """Evaluate every rule over a DataFrame and summarize the violations.
+
+    Each rule yields a boolean violation mask; the masks are counted in a
+    single column-wise reduction instead of one scan per check.
+    """
+    masks = pd.DataFrame({index: rule.evaluate(df) for index, rule in enumerate(rules)}, index=df.index)
+    counts = masks.sum().tolist() if len(rules) else []
+
+    results = []
+    for index, (rule, count) in enumerate(zip(rules, counts)):
+        if count:
+            details = rule.describe(df, masks[index])
+            status = rule.severity
+        else:
+            details = rule.passed_details()
+            status = 'passed'
+        results.append({
+            'table_name': table_name,
+            'check_type': rule.check_type,
+            'status': status,
+            'details': details[:MAX_DETAILS_LENGTH],
+            'violations': int(count),
+            'rows': len(df),
+        })
+    return QualityReport(results)
+
 class DataQualityChecker:
-    def __init__(self, connection_string: str):
-        self.engine = create_engine(connection_string)
-        Session = sessionmaker(bind=self.engine)
-        self.session = Session()
-    
+    def __init__(self, connection_string: str, rules: dict = None):
+        self.connection_string = connection_string
+        self.engine = get_engine(connection_string)
+        ensure_schema(self.engine)
+        self.baselines = BaselineStore(connection_string)
+        self.rules = default_rules(self.baselines) if rules is None else rules
+        self._pending = []
+
+    def validate(self, df: pd.DataFrame, table_name: str, rules: list = None) -> QualityReport:
+        """Run the rule set for a table and queue the results for the audit table"""
+        if rules is None:
+            rules = self.rules.get(table_name, [])
+        report = evaluate_rules(df, table_name, rules)
+        for result in report.results:
+            self._log_quality_check(table_name, result['check_type'], result['status'], result['details'])
+        return report
+
+    def validate_frames(self, frames: dict) -> QualityReport:
+        """Validate every frame that has declared rules; frames maps table name to DataFrame.
+
+        Call discard_baselines() if the frames then fail to load, so rows that
+        never reached the database do not shape the baselines.
+        """
+        self.baselines.checkpoint()
+        report = QualityReport()
+        for table_name, df in frames.items():
+            if table_name in self.rules and df is not None:
+                report.extend(self.validate(df, table_name))
+        return report
+
+    def discard_baselines(self):
+        """Undo the baseline updates of the latest validate_frames() call"""
+        self.baselines.rollback()
+
     def check_missing_data(self, df: pd.DataFrame, table_name: str) -> bool:
         """Check for missing critical data"""
-        critical_columns = ['city', 'temperature', 'humidity']
-        missing_data = df[critical_columns].isnull().sum()
-        
-        if missing_data.any():
-            details = f"Missing data in columns: {missing_data[missing_data > 0].to_dict()}"
-            self._log_quality_check(table_name, 'missing_data', 'failed', details)
-            return False
-        else:
-            self._log_quality_check(table_name, 'missing_data', 'passed', 'No missing critical data')
-            return True
-    
+        return self.validate(df, table_name, [NotNullRule(['city', 'temperature', 'humidity'])]).passed
+
     def check_temperature_outliers(self, df: pd.DataFrame, table_name: str) -> bool:
         """Check for unrealistic temperatures (Netherlands: -20°C to 45°C)"""
-        outliers = df[(df['temperature'] < -20) | (df['temperature'] > 45)]
-        
-        if not outliers.empty:
-            details = f"Temperature outliers found: {outliers[['city', 'temperature']].to_dict('records')}"
-            self._log_quality_check(table_name, 'temperature_outlier', 'warning', details)
-            return False
-        else:
-            self._log_quality_check(table_name, 'temperature_outlier', 'passed', 'No temperature outliers')
-            return True
-    
+        return self.validate(df, table_name, [RangeRule(['temperature'], -20, 45, 'temperature_outlier')]).passed
+
     def check_duplicates(self, df: pd.DataFrame, table_name: str) -> bool:
         """Check for duplicate city records within the same timestamp"""
-        duplicates = df.duplicated(subset=['city', 'timestamp']).sum()
-        
-        if duplicates > 0:
-            details = f"Found {duplicates} duplicate records"
-            self._log_quality_check(table_name, 'duplicate_check', 'warning', details)
-            return False
-        else:
-            self._log_quality_check(table_name, 'duplicate_check', 'passed', 'No duplicates found')
-            return True
-    
+        return self.validate(df, table_name, [UniqueRule(['city', 'timestamp'])]).passed
+
     def _log_quality_check(self, table_name: str, check_type: str, status: str, details: str):
-        """Log quality check results to database"""
-        quality_record = DataQuality(
-            table_name=table_name,
-            check_type=check_type,
-            status=status,
-            details=details
-        )
-        self.session.add(quality_record)
-        self.session.commit()
+        """Queue a quality check result; written in bulk by flush()"""
+        self._pending.append({
+            'table_name': table_name,
+            'check_type': check_type,
+            'status': status,
+            'details': details,
+            'timestamp': datetime.utcnow()
+        })
         logging.info("Data quality check %s for %s: %s", check_type, table_name, status)
-    
+
+    def flush(self) -> int:
+        """Write queued results in one bulk insert and save updated baselines, in one transaction"""
+        records = pd.DataFrame(self._pending)
+        baselines = self.baselines.pending_frame()
+        if records.empty and baselines.empty:
+            return 0
+        load_batch({'data_quality': records, 'quality_baselines': baselines}, self.connection_string, mode='merge')
+        self._pending = []
+        self.baselines.mark_saved()
+        return len(records)
+
     def close(self):
-        self.session.close()
+        self.flush()
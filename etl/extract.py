@@ -1,5 +1,12 @@
-import requests
-from config import BASE_URL, OPENWEATHER_API_KEY
+import logging
+from collections import deque
+from concurrent.futures import Future
+from config import BASE_URL, GROUP_URL, OPENWEATHER_API_KEY, EXTRACT_MODE, CITY_WINDOW
+from etl.client import get_json
+from etl.air_quality import get_air_quality, get_weather_forecast
+from etl.async_extract import iter_cities
+from etl.registry import group_batches
+from monitoring.metrics import RunContextExecutor
 
 def get_weather(city: str):
     params = {
@@ -7,6 +14,137 @@ def get_weather(city: str):
         "appid": OPENWEATHER_API_KEY,
         "units": "metric"
     }
-    response = requests.get(BASE_URL, params=params, timeout=30)
-    response.raise_for_status()
-    return response.json()
+    return get_json(BASE_URL, params)
+
+def get_weather_group(city_ids: list) -> list:
+    """Get current weather for up to 20 cities by OpenWeather id in one request"""
+    params = {
+        "id": ",".join(str(city_id) for city_id in city_ids),
+        "appid": OPENWEATHER_API_KEY,
+        "units": "metric"
+    }
+    return get_json(GROUP_URL, params).get("list", [])
+
+def get_weather_by_name(cities: list) -> dict:
+    """Current weather by city name for every registry city with a known id, 20 per request"""
+    weather_by_name = {}
+    for batch in group_batches(cities):
+        try:
+            payloads = get_weather_group([city["owm_id"] for city in batch])
+        except Exception as e:
+            # Those cities fall back to one weather request each
+            logging.warning("Group weather request failed for %d cities: %s", len(batch), e)
+            continue
+        by_id = {payload.get("id"): payload for payload in payloads}
+        for city in batch:
+            if city["owm_id"] in by_id:
+                weather_by_name[city["name"]] = by_id[city["owm_id"]]
+    return weather_by_name
+
+def process_city_data(city: dict, weather, air_quality, forecast):
+    """Collect the raw weather, air quality, and forecast payloads for a single city.
+
+    Each argument is either a payload or a future of a request already in flight.
+    """
+    try:
+        logging.info("Processing data for city: %s", city['name'])
+        
+        # Get weather data
+        weather_data = weather.result() if isinstance(weather, Future) else weather
+        
+        # Air quality waits on the weather coordinates only for cities without registry coordinates
+        if air_quality is None:
+            air_quality = get_air_quality(weather_data['coord']['lat'], weather_data['coord']['lon'])
+        air_quality_data = air_quality.result() if isinstance(air_quality, Future) else air_quality
+        
+        # Get forecast data
+        forecast_data = forecast.result() if isinstance(forecast, Future) else forecast
+    except Exception as e:
+        logging.error("Failed to process data for %s: %s", city['name'], e)
+        return {
+            'city': city['name'],
+            'error': str(e),
+            'success': False
+        }
+    
+    return {
+        'city': city['name'],
+        'weather': weather_data,
+        'air_quality': air_quality_data,
+        'forecast': forecast_data,
+        'success': True
+    }
+
+def iter_city_results(cities: list, window: int = CITY_WINDOW):
+    """Yield per-city results using the configured extraction mode"""
+    if EXTRACT_MODE == "async":
+        # One pooled session fans out a window of cities concurrently
+        yield from iter_cities(cities, window)
+        return
+    
+    # Weather, air quality and forecast requests run in parallel, a window of cities at a time
+    with RunContextExecutor(max_workers=5) as executor:
+        for start in range(0, len(cities), window):
+            chunk = cities[start:start + window]
+            
+            # Cities with a known OpenWeather id get current weather in groups of 20
+            grouped = executor.submit(get_weather_by_name, chunk)
+            requests_by_city = deque()
+            for city in chunk:
+                air_quality = None
+                if city['lat'] is not None and city['lon'] is not None:
+                    air_quality = executor.submit(get_air_quality, city['lat'], city['lon'])
+                forecast = executor.submit(get_weather_forecast, city['name'])
+                requests_by_city.append((city, air_quality, forecast))
+            
+            weather_by_name = grouped.result()
+            for city, _, _ in requests_by_city:
+                if city['name'] not in weather_by_name:
+                    weather_by_name[city['name']] = executor.submit(get_weather, city['name'])
+            
+            while requests_by_city:
+                city, air_quality, forecast = requests_by_city.popleft()
+                yield process_city_data(city, weather_by_name[city['name']], air_quality, forecast)
+
+def _dataset_result(city: dict, dataset: str, request) -> dict:
+    """Resolve one dataset's payload for a city into a result carrying only that dataset"""
+    try:
+        payload = request.result() if isinstance(request, Future) else request
+        if payload is None:
+            raise ValueError(f"no {dataset} data returned")
+    except Exception as e:
+        logging.error("Failed to fetch %s data for %s: %s", dataset, city['name'], e)
+        return {'city': city['name'], 'error': str(e), 'success': False}
+    
+    result = {'city': city['name'], 'weather': None, 'air_quality': None, 'forecast': None, 'success': True}
+    result[dataset] = payload
+    return result
+
+def iter_dataset_results(cities: list, dataset: str, window: int = CITY_WINDOW):
+    """Yield per-city results for a single dataset: 'weather', 'air_quality' or 'forecast'.
+
+    Scheduled jobs use this to call only the endpoint they load. Air quality
+    needs registry coordinates; cities without them are skipped until a
+    weather run has learned them.
+    """
+    with RunContextExecutor(max_workers=5) as executor:
+        for start in range(0, len(cities), window):
+            chunk = cities[start:start + window]
+            
+            if dataset == 'weather':
+                requests_by_name = get_weather_by_name(chunk)
+                for city in chunk:
+                    if city['name'] not in requests_by_name:
+                        requests_by_name[city['name']] = executor.submit(get_weather, city['name'])
+            elif dataset == 'air_quality':
+                requests_by_name = {city['name']: executor.submit(get_air_quality, city['lat'], city['lon'])
+                                    for city in chunk if city['lat'] is not None and city['lon'] is not None}
+            elif dataset == 'forecast':
+                requests_by_name = {city['name']: executor.submit(get_weather_forecast, city['name'])
+                                    for city in chunk}
+            else:
+                raise ValueError(f"Unknown dataset: {dataset}")
+            
+            for city in chunk:
+                if city['name'] in requests_by_name:
+                    yield _dataset_result(city, dataset, requests_by_name[city['name']])
@@ -1,16 +1,210 @@
-
-from sqlalchemy import create_engine
+import logging
+import time
+from datetime import datetime
 import pandas as pd
+from sqlalchemy import case, update
+from config import LOAD_CHUNK_SIZE, LOAD_MODE, ARCHIVE_ENABLED, ARCHIVE_PATH
+from db.engine import get_engine, ensure_schema
+from etl.archive import write_batch
+from db.models import Base, NATURAL_KEYS, LoadWatermark, WATERMARK_COLUMNS
+from monitoring import metrics
+
+# Placeholder per DB-API paramstyle for the raw executemany path
+_PLACEHOLDERS = {"qmark": "?", "format": "%s", "pyformat": "%s"}
+
+# Refreshed on every write, so they do not count as a change when merging
+_AUDIT_COLUMNS = {"created_at", "updated_at"}
+
+def _column_values(series: pd.Series) -> list:
+    """Convert a column to plain Python values with None for missing entries"""
+    if series.dtype.kind == "M":
+        values = series.array.to_pydatetime().tolist()
+    else:
+        values = series.tolist()
+    if series.hasnans:
+        missing = series.isna().tolist()
+        values = [None if is_missing else value for value, is_missing in zip(values, missing)]
+    return values
+
+def _executemany(conn, target: str, columns: list, rows: list, chunk_size: int):
+    """Run a plain driver-level INSERT executemany in chunks.
+
+    Skipping SQLAlchemy's per-value bind processing is what makes this fast;
+    with pyodbc each chunk goes out as one parameter array (fast_executemany).
+    """
+    preparer = conn.dialect.identifier_preparer
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        target,
+        ", ".join(preparer.quote(column) for column in columns),
+        ", ".join([_PLACEHOLDERS[conn.dialect.paramstyle]] * len(columns))
+    )
+    for start in range(0, len(rows), chunk_size):
+        conn.exec_driver_sql(sql, rows[start:start + chunk_size])
+
+def _frame_rows(df: pd.DataFrame, columns: list) -> list:
+    return list(zip(*(_column_values(df[column]) for column in columns)))
+
+def _insert_frame(conn, df: pd.DataFrame, table_name: str, chunk_size: int) -> int:
+    """Insert a DataFrame in executemany chunks on an open connection"""
+    table = Base.metadata.tables.get(table_name)
+    if table is None:
+        # Not one of our models; let pandas create and fill the table
+        df.to_sql(table_name, conn, if_exists="append", index=False, chunksize=chunk_size)
+        return len(df)
+
+    columns = [column for column in df.columns if column in table.c]
+    rows = _frame_rows(df, columns)
+
+    if conn.dialect.paramstyle not in _PLACEHOLDERS:
+        statement = table.insert()
+        rows = [dict(zip(columns, row)) for row in rows]
+        for start in range(0, len(rows), chunk_size):
+            conn.execute(statement, rows[start:start + chunk_size])
+        return len(rows)
+
+    _executemany(conn, conn.dialect.identifier_preparer.format_table(table), columns, rows, chunk_size)
+    return len(rows)
+
+def _merge_sql(dialect: str, target: str, staging: str, columns: list, keys: tuple, quote) -> str:
+    """Build the upsert from the staging table into the target table"""
+    update_columns = [column for column in columns if column not in keys]
+    compare_columns = [column for column in update_columns if column not in _AUDIT_COLUMNS]
+    column_list = ", ".join(quote(column) for column in columns)
 
-def load_to_sql(df: pd.DataFrame, connection_string: str, table_name: str = "weather_data"):
-    engine = create_engine(connection_string)
-    # Auto-create table if it does not exist
+    if dialect == "mssql":
+        on_clause = " AND ".join(f"t.{quote(key)} = s.{quote(key)}" for key in keys)
+        matched = ""
+        if compare_columns:
+            # EXCEPT compares NULLs as equal, so unchanged rows are not rewritten
+            matched = "WHEN MATCHED AND EXISTS (SELECT {} EXCEPT SELECT {}) THEN UPDATE SET {}\n".format(
+                ", ".join(f"s.{quote(column)}" for column in compare_columns),
+                ", ".join(f"t.{quote(column)}" for column in compare_columns),
+                ", ".join(f"t.{quote(column)} = s.{quote(column)}" for column in update_columns)
+            )
+        return (
+            f"MERGE {target} WITH (HOLDLOCK) AS t\n"
+            f"USING {staging} AS s ON {on_clause}\n"
+            f"{matched}"
+            f"WHEN NOT MATCHED BY TARGET THEN INSERT ({column_list}) "
+            f"VALUES ({', '.join(f's.{quote(column)}' for column in columns)});"
+        )
+
+    # SQLite and PostgreSQL share the ON CONFLICT syntax; WHERE true keeps
+    # SQLite from parsing ON CONFLICT as part of the SELECT's join
+    if compare_columns:
+        distinct = "IS NOT" if dialect == "sqlite" else "IS DISTINCT FROM"
+        conflict_action = "DO UPDATE SET {} WHERE {}".format(
+            ", ".join(f"{quote(column)} = excluded.{quote(column)}" for column in update_columns),
+            " OR ".join(f"{target}.{quote(column)} {distinct} excluded.{quote(column)}" for column in compare_columns)
+        )
+    else:
+        conflict_action = "DO NOTHING"
+    return (
+        f"INSERT INTO {target} ({column_list})\n"
+        f"SELECT {column_list} FROM {staging} WHERE true\n"
+        f"ON CONFLICT ({', '.join(quote(key) for key in keys)}) {conflict_action}"
+    )
+
+def _merge_frame(conn, df: pd.DataFrame, table_name: str, chunk_size: int) -> int:
+    """Upsert a DataFrame on its natural key through a temporary staging table"""
+    dialect = conn.dialect.name
+    if dialect not in ("mssql", "sqlite", "postgresql"):
+        raise NotImplementedError(f"Merge load mode is not supported on {dialect}")
+
+    table = Base.metadata.tables[table_name]
+    keys = NATURAL_KEYS[table_name]
+    missing_keys = [key for key in keys if key not in df.columns]
+    if missing_keys:
+        raise ValueError(f"Cannot merge into {table_name} without natural key columns {missing_keys}")
+    df = df.drop_duplicates(subset=list(keys), keep="last")
+    columns = [column for column in df.columns if column in table.c and column != "id"]
+
+    preparer = conn.dialect.identifier_preparer
+    target = preparer.format_table(table)
+    column_list = ", ".join(preparer.quote(column) for column in columns)
+
+    # Temporary tables are dropped on rollback, so no cleanup is needed on failure
+    if dialect == "mssql":
+        staging = f"#stg_{table_name}"
+        conn.exec_driver_sql(f"SELECT {column_list} INTO {staging} FROM {target} WHERE 1 = 0")
+    else:
+        staging = f"stg_{table_name}"
+        conn.exec_driver_sql(f"CREATE TEMPORARY TABLE {staging} AS SELECT {column_list} FROM {target} WHERE 1 = 0")
+
+    _executemany(conn, staging, columns, _frame_rows(df, columns), chunk_size)
+    conn.exec_driver_sql(_merge_sql(dialect, target, staging, columns, keys, preparer.quote))
+    conn.exec_driver_sql(f"DROP TABLE {staging}")
+    return len(df)
+
+def _update_watermarks(conn, watermarks: dict):
+    """Advance each table's load watermark; runs in the load's transaction so it commits with the rows"""
+    table = LoadWatermark.__table__
+    loaded_at = datetime.utcnow()
+    for table_name, (latest, rows) in watermarks.items():
+        # Keep the later of the stored and the loaded timestamp in one statement
+        result = conn.execute(
+            update(table)
+            .where(table.c.table_name == table_name)
+            .values(latest_timestamp=case((table.c.latest_timestamp > latest, table.c.latest_timestamp), else_=latest),
+                    rows_loaded=rows, loaded_at=loaded_at)
+        )
+        if result.rowcount == 0:
+            conn.execute(table.insert().values(table_name=table_name, latest_timestamp=latest,
+                                               rows_loaded=rows, loaded_at=loaded_at))
+
+def load_batch(frames: dict, connection_string: str, chunk_size: int = LOAD_CHUNK_SIZE,
+               mode: str = LOAD_MODE, archive_path: str = None) -> dict:
+    """Load several tables in one transaction; frames maps table name to DataFrame.
+
+    mode is 'append' for plain inserts or 'merge' to upsert tables that have a
+    natural key, so retried and overlapping runs do not create duplicates.
+    Time-series tables also advance their row in load_watermarks. Once the
+    transaction commits, the frames are archived to archive_path, or to
+    ARCHIVE_PATH when ARCHIVE_ENABLED is set.
+    """
+    engine = get_engine(connection_string)
+    ensure_schema(engine)
+
+    row_counts = {}
+    watermarks = {}
+    with engine.begin() as conn:
+        for table_name, df in frames.items():
+            if df is None or df.empty:
+                continue
+            start = time.perf_counter()
+            if mode == "merge" and table_name in NATURAL_KEYS:
+                row_counts[table_name] = _merge_frame(conn, df, table_name, chunk_size)
+            else:
+                row_counts[table_name] = _insert_frame(conn, df, table_name, chunk_size)
+            elapsed = time.perf_counter() - start
+            metrics.load_seconds.observe(elapsed, table=table_name)
+            metrics.rows_loaded.inc(row_counts[table_name], table=table_name)
+            if elapsed > 0:
+                metrics.load_rows_per_second.observe(row_counts[table_name] / elapsed, table=table_name)
+            column = WATERMARK_COLUMNS.get(table_name)
+            if column in df.columns:
+                latest = pd.to_datetime(df[column]).max()
+                if not pd.isna(latest):
+                    watermarks[table_name] = (latest.to_pydatetime(), row_counts[table_name])
+        if watermarks:
+            _update_watermarks(conn, watermarks)
+    
+    archive_path = archive_path or (ARCHIVE_PATH if ARCHIVE_ENABLED else None)
+    if archive_path:
+        load_to_archive(frames, archive_path)
+    return row_counts
+
+def load_to_archive(frames: dict, root: str = ARCHIVE_PATH) -> dict:
+    """Write frames to the Parquet archive; a failure is logged, since the rows are already in SQL"""
     try:
-        from db.models import Base
-        Base.metadata.create_all(engine)
+        return write_batch(frames, root)
     except Exception as e:
-        print(f"Warning: Could not auto-create table: {e}")
-    df.to_sql(table_name, engine, if_exists="append", index=False)
+        logging.error("Failed to archive batch to %s: %s", root, e)
+        return {}
+
+def load_to_sql(df: pd.DataFrame, connection_string: str, table_name: str = "weather_data",
+                chunk_size: int = LOAD_CHUNK_SIZE, mode: str = LOAD_MODE):
+    load_batch({table_name: df}, connection_string, chunk_size, mode)
 
 def load_air_quality_to_sql(df: pd.DataFrame, connection_string: str):
     """Load air quality data to SQL"""
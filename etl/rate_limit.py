@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from config import OPENWEATHER_CALLS_PER_MINUTE, OPENWEATHER_BURST, EXTRACT_CONCURRENCY
+
+class TokenBucket:
+    """Thread-safe token bucket pacing calls at `calls_per_period` per period.
+
+    Up to `burst` calls may go at once; the refill runs at the full budget
+    rate, and QuotaWindow keeps the burst from pushing a window over budget.
+    """
+
+    def __init__(self, calls_per_period: int, period: float = 60.0, burst: int = 1):
+        self.capacity = max(1, min(burst, calls_per_period))
+        self.rate = calls_per_period / period
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return the number of seconds to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+class QuotaWindow:
+    """Thread-safe cap of `calls_per_period` calls in any window of `period` seconds.
+
+    A call counts from when it starts until `period` seconds after it has
+    finished. Its request reached the server somewhere in between, so the
+    server never sees more than the budget in a window, however late requests
+    arrive.
+    """
+
+    def __init__(self, calls_per_period: int, period: float = 60.0):
+        self.calls_per_period = calls_per_period
+        self.period = period
+        self._in_flight = 0
+        self._finished = deque()
+        self._lock = threading.Lock()
+
+    def try_enter(self) -> float:
+        """Start a call and return 0, or return the number of seconds to wait before trying again"""
+        with self._lock:
+            now = time.monotonic()
+            while self._finished and self._finished[0] <= now - self.period:
+                self._finished.popleft()
+            if self._in_flight + len(self._finished) < self.calls_per_period:
+                self._in_flight += 1
+                return 0.0
+            if self._finished:
+                return self._finished[0] + self.period - now
+            # Every slot is taken by a call still in flight
+            return self.period / self.calls_per_period
+
+    def leave(self):
+        """Finish a call started with try_enter"""
+        with self._lock:
+            self._in_flight -= 1
+            self._finished.append(time.monotonic())
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit: grows by one per window of successes, halves on overload.
+
+    One overload shows up in every request that was in flight at the time, so
+    the limit is halved once per overload: after a decrease, failures are not
+    counted again until the requests then in flight have been released.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, decrease_factor: float = 0.5):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.decrease_factor = decrease_factor
+        self.limit = float(max_limit)
+        self._in_flight = 0
+        # Releases left before a failure may reduce the limit again
+        self._cooldown = 0
+        self._condition = threading.Condition()
+        # Futures of coroutines waiting in acquire_async, with the loop each belongs to
+        self._async_waiters = []
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if self._in_flight < int(self.limit):
+                self._in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    async def acquire_async(self):
+        """Wait without blocking the event loop until release() frees a slot.
+
+        Threads and event loops share one limit, so waiters park on a future
+        that release() resolves through its loop instead of an asyncio.Condition,
+        which is bound to a single loop and not thread-safe.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._in_flight < int(self.limit):
+                    self._in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            finally:
+                with self._condition:
+                    if (loop, waiter) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter))
+
+    def release(self, status_code: int = None):
+        """Release a slot and adapt the limit to the response status"""
+        with self._condition:
+            self._in_flight -= 1
+            cooling_down = self._cooldown > 0
+            self._cooldown = max(0, self._cooldown - 1)
+            if status_code is not None and (status_code == 429 or status_code >= 500):
+                if not cooling_down:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self._cooldown = self._in_flight
+                    logging.warning("Received HTTP %s, reducing concurrency limit to %d", status_code, int(self.limit))
+            elif status_code is not None and status_code < 400:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+            # Woken waiters compete for the slot again, as notify_all does for threads
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+def _wake(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+class RateLimiter:
+    """Shared throttle for API calls: a token bucket and quota window with adaptive concurrency"""
+
+    def __init__(self, calls_per_period: int, max_concurrency: int, period: float = 60.0,
+                 burst: int = 1, min_concurrency: int = 1):
+        self.bucket = TokenBucket(calls_per_period, period, burst)
+        self.window = QuotaWindow(calls_per_period, period)
+        self.concurrency = AdaptiveConcurrency(max_concurrency, min_concurrency)
+
+    def acquire(self):
+        """Block until a call may be made"""
+        self.concurrency.acquire()
+        delay = self.bucket.reserve()
+        if delay:
+            time.sleep(delay)
+        delay = self.window.try_enter()
+        while delay:
+            time.sleep(delay)
+            delay = self.window.try_enter()
+
+    async def acquire_async(self):
+        """Wait without blocking the event loop until a call may be made"""
+        await self.concurrency.acquire_async()
+        delay = self.bucket.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+        delay = self.window.try_enter()
+        while delay:
+            await asyncio.sleep(delay)
+            delay = self.window.try_enter()
+
+    def release(self, status_code: int = None):
+        """Report the outcome of a call; None means no response was received"""
+        self.window.leave()
+        self.concurrency.release(status_code)
+
+# Shared by every OpenWeather extractor in this process
+openweather_limiter = RateLimiter(OPENWEATHER_CALLS_PER_MINUTE, EXTRACT_CONCURRENCY, burst=OPENWEATHER_BURST)
@@ -0,0 +1,116 @@
+"""Persistent registry of the cities the pipeline tracks.
+
+Seeded with the provincial cities of the Netherlands. Coordinates are known
+up front so air quality and forecasts do not have to wait for a weather
+lookup; OpenWeather ids are learned from weather responses and then allow
+current weather for many cities to be fetched through the group endpoint.
+"""
+import logging
+import pandas as pd
+from datetime import datetime
+from sqlalchemy import select
+from db.engine import get_engine, ensure_schema
+from db.models import City
+from config import GROUP_BATCH_SIZE
+from etl.load import load_batch
+
+# Major cities per province in the Netherlands
+SEED_CITIES = [
+    {"name": "Amsterdam", "province": "Noord-Holland", "lat": 52.3676, "lon": 4.9041},
+    {"name": "Haarlem", "province": "Noord-Holland", "lat": 52.3874, "lon": 4.6462},
+    {"name": "Rotterdam", "province": "Zuid-Holland", "lat": 51.9244, "lon": 4.4777},
+    {"name": "The Hague", "province": "Zuid-Holland", "lat": 52.0705, "lon": 4.3007},
+    {"name": "Utrecht", "province": "Utrecht", "lat": 52.0907, "lon": 5.1214},
+    {"name": "Eindhoven", "province": "Noord-Brabant", "lat": 51.4416, "lon": 5.4697},
+    {"name": "Den Bosch", "province": "Noord-Brabant", "lat": 51.6978, "lon": 5.3037},
+    {"name": "Maastricht", "province": "Limburg", "lat": 50.8514, "lon": 5.6910},
+    {"name": "Groningen", "province": "Groningen", "lat": 53.2194, "lon": 6.5665},
+    {"name": "Leeuwarden", "province": "Friesland", "lat": 53.2012, "lon": 5.7999},
+    {"name": "Assen", "province": "Drenthe", "lat": 52.9925, "lon": 6.5649},
+    {"name": "Zwolle", "province": "Overijssel", "lat": 52.5168, "lon": 6.0830},
+    {"name": "Arnhem", "province": "Gelderland", "lat": 51.9851, "lon": 5.8987},
+    {"name": "Nijmegen", "province": "Gelderland", "lat": 51.8126, "lon": 5.8372},
+    {"name": "Middelburg", "province": "Zeeland", "lat": 51.4988, "lon": 3.6136},
+    {"name": "Lelystad", "province": "Flevoland", "lat": 52.5185, "lon": 5.4714},
+]
+
+# Province per city name for the seeded cities
+PROVINCES = {city["name"]: city["province"] for city in SEED_CITIES}
+
+_COLUMNS = ["name", "province", "lat", "lon", "owm_id"]
+
+class CityRegistry:
+    """Cities loaded from the cities table, seeded on first use.
+
+    With shard_count > 1 only the cities whose id falls in the given shard
+    are loaded, so sharded workers never read the whole registry.
+    """
+
+    def __init__(self, connection_string: str, shard: int = 0, shard_count: int = 1):
+        self.connection_string = connection_string
+        self.shard = shard
+        self.shard_count = shard_count
+        self._cities = None
+
+    def load(self) -> list:
+        """Return the registered cities as dicts, seeding the table when it is empty"""
+        engine = get_engine(self.connection_string)
+        ensure_schema(engine)
+        table = City.__table__
+        query = select(*(table.c[column] for column in _COLUMNS)).order_by(table.c.id)
+        if self.shard_count > 1:
+            query = query.where(table.c.id % self.shard_count == self.shard)
+        with engine.connect() as conn:
+            rows = conn.execute(query).fetchall()
+        if rows or self.shard_count > 1:
+            self._cities = [dict(zip(_COLUMNS, row)) for row in rows]
+        else:
+            self._cities = [{**city, "owm_id": None} for city in SEED_CITIES]
+            self._save(self._cities)
+            logging.info("Seeded city registry with %d cities", len(self._cities))
+        return self._cities
+
+    @property
+    def cities(self) -> list:
+        return self._cities if self._cities is not None else self.load()
+
+    @property
+    def provinces(self) -> dict:
+        return {city["name"]: city["province"] for city in self.cities}
+
+    def learn(self, results: list) -> int:
+        """Record OpenWeather ids and coordinates from (city name, weather payload) pairs"""
+        by_name = {city["name"]: city for city in self.cities}
+        changed = []
+        for name, payload in results:
+            city = by_name.get(name)
+            if city is None or not payload:
+                continue
+            learned = {
+                "owm_id": payload.get("id"),
+                "lat": payload.get("coord", {}).get("lat", city["lat"]),
+                "lon": payload.get("coord", {}).get("lon", city["lon"]),
+            }
+            if any(city[key] != value for key, value in learned.items()):
+                city.update(learned)
+                changed.append(city)
+        if changed:
+            self._save(changed)
+        return len(changed)
+
+    def _save(self, cities: list):
+        df = pd.DataFrame(cities, columns=_COLUMNS)
+        df["owm_id"] = df["owm_id"].astype("Int64")
+        df["updated_at"] = datetime.utcnow()
+        load_batch({"cities": df}, self.connection_string, mode="merge")
+
+def as_city(city) -> dict:
+    """Accept a registry record or a bare city name"""
+    if isinstance(city, dict):
+        return city
+    return {"name": city, "province": PROVINCES.get(city), "lat": None, "lon": None, "owm_id": None}
+
+def group_batches(cities: list, batch_size: int = GROUP_BATCH_SIZE) -> list:
+    """Split the cities with a known OpenWeather id into group-endpoint sized batches"""
+    known = [city for city in map(as_city, cities) if city.get("owm_id")]
+    return [known[start:start + batch_size] for start in range(0, len(known), batch_size)]
@@ -0,0 +1,135 @@
+"""Retry and circuit-breaker policies shared by the sync and async OpenWeather clients.
+
+Transient failures (connection errors, timeouts, 429 and 5xx responses) are
+retried a bounded number of times with exponential backoff and full jitter,
+waiting at least as long as a Retry-After header asks. Each endpoint URL has
+its own circuit breaker: after a run of consecutive connection failures or
+5xx responses it opens and calls fail immediately with CircuitOpenError,
+until a single trial call after the reset timeout shows the endpoint is back.
+"""
+import email.utils
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from config import (RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY,
+                    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS)
+
+# 429 is retried but does not count against the breaker: the API is up, just busy
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit breaker is open"""
+
+def parse_retry_after(value: str):
+    """Seconds to wait from a Retry-After header (delay-seconds or HTTP-date); None if absent or invalid"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+class RetryPolicy:
+    """Bounded retries with exponential backoff and full jitter"""
+
+    def __init__(self, max_attempts: int = RETRY_MAX_ATTEMPTS, base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY, retry_statuses: frozenset = RETRY_STATUSES,
+                 rng: random.Random = None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = retry_statuses
+        self.rng = rng or random.Random()
+
+    def next_delay(self, attempt: int, retry_after: str = None):
+        """Seconds to sleep before retrying after failed attempt number `attempt` (0-based).
+
+        None means give up: the attempts are used up, or the server asked us
+        to wait longer than max_delay.
+        """
+        if attempt + 1 >= self.max_attempts:
+            return None
+        delay = self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        requested = parse_retry_after(retry_after)
+        if requested is not None:
+            if requested > self.max_delay:
+                return None
+            delay = max(delay, requested)
+        return delay
+
+class CircuitBreaker:
+    """Closed, open and half-open states for one endpoint"""
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_SECONDS, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self._trial_started = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go out now"""
+        with self._lock:
+            if self.state == "closed":
+                return
+            now = self.clock()
+            if self.state == "open" and now - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial_started = None
+            if self.state == "half_open":
+                # One trial call at a time; a trial that never reported back is replaced
+                if self._trial_started is None or now - self._trial_started >= self.reset_timeout:
+                    self._trial_started = now
+                    return
+            raise CircuitOpenError(f"Circuit open for {self.name} after {self.failures} consecutive failures")
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logging.info("Circuit for %s closed again", self.name)
+            self.state = "closed"
+            self.failures = 0
+            self._trial_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                if self.state == "closed":
+                    logging.warning("Circuit for %s opened after %d consecutive failures", self.name, self.failures)
+                self.state = "open"
+                self.opened_at = self.clock()
+                self._trial_started = None
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def breaker_for(url: str) -> CircuitBreaker:
+    """The circuit breaker shared by every call to an endpoint URL"""
+    with _breakers_lock:
+        breaker = _breakers.get(url)
+        if breaker is None:
+            breaker = _breakers[url] = CircuitBreaker(url)
+        return breaker
+
+def reset_breakers():
+    """Forget all breaker state, e.g. in a freshly forked worker"""
+    global _breakers_lock
+    _breakers.clear()
+    _breakers_lock = threading.Lock()
+
+# Shared by every OpenWeather extractor in this process
+default_policy = RetryPolicy()
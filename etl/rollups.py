@@ -0,0 +1,131 @@
+"""Incrementally maintained hourly and daily rollups of weather and air quality readings.
+
+After a load, only the windows that can contain new rows are recomputed:
+hours from the hour before the run started, aggregated from the raw tables, and the
+days containing them, re-aggregated from the hourly rollups so a day never
+rescans raw history. The results are merged into weather_rollups and
+air_quality_rollups on (granularity, bucket, city), so refreshing the same
+window twice is harmless.
+
+Usage:
+    python -m etl.rollups --since 2024-01-01   # backfill from raw history
+"""
+import logging
+from datetime import datetime, timedelta
+import pandas as pd
+from sqlalchemy import select
+from db.engine import get_engine, ensure_schema
+from db.models import WeatherData, AirQuality, WeatherRollup, AirQualityRollup
+from etl.load import load_batch
+
+# Rollup column -> (raw column, aggregation); averages are weighted by samples when rolled up to days
+WEATHER_AGGREGATES = {
+    'temperature_avg': ('temperature', 'mean'),
+    'temperature_min': ('temperature', 'min'),
+    'temperature_max': ('temperature', 'max'),
+    'humidity_avg': ('humidity', 'mean'),
+    'wind_speed_avg': ('wind_speed', 'mean'),
+    'pressure_avg': ('pressure', 'mean'),
+}
+AIR_QUALITY_AGGREGATES = {
+    'aqi_avg': ('aqi', 'mean'),
+    'aqi_max': ('aqi', 'max'),
+    'pm2_5_avg': ('pm2_5', 'mean'),
+    'pm10_avg': ('pm10', 'mean'),
+    'no2_avg': ('no2', 'mean'),
+    'o3_avg': ('o3', 'mean'),
+}
+# How far an observation's time may precede the run that loads it (provider update interval plus cache TTL)
+OBSERVATION_LAG = timedelta(hours=1)
+
+def _read_raw(conn, table, columns: list, since: datetime) -> pd.DataFrame:
+    query = select(*(table.c[column] for column in columns)).where(table.c.timestamp >= since)
+    return pd.read_sql(query, conn)
+
+def hourly_rollup(raw: pd.DataFrame, aggregates: dict, keep: list = ()) -> pd.DataFrame:
+    """Aggregate raw readings into one row per city and hour"""
+    if raw.empty:
+        return pd.DataFrame()
+    raw = raw.assign(bucket=pd.to_datetime(raw['timestamp']).dt.floor('h'))
+    named = dict(aggregates)
+    named.update({column: (column, 'last') for column in keep})
+    hourly = raw.groupby(['city', 'bucket'], sort=False).agg(
+        samples=('timestamp', 'size'), last_seen=('timestamp', 'max'), **named
+    ).reset_index()
+    hourly.insert(0, 'granularity', 'hour')
+    return hourly
+
+def daily_rollup(hourly: pd.DataFrame, aggregates: dict, keep: list = ()) -> pd.DataFrame:
+    """Combine hourly rollups into one row per city and day"""
+    if hourly.empty:
+        return pd.DataFrame()
+    hourly = hourly.assign(day=pd.to_datetime(hourly['bucket']).dt.floor('D'))
+    means = [name for name, (_, how) in aggregates.items() if how == 'mean']
+    # Sample-weighted sums so the daily mean equals the mean of the raw readings;
+    # hours where a metric is missing do not count towards its weight
+    weights = pd.DataFrame({name: hourly['samples'].where(hourly[name].notna(), 0) for name in means})
+    hourly = pd.concat([hourly, hourly[means].mul(weights).add_suffix('_sum'), weights.add_suffix('_n')], axis=1)
+
+    agg = {'samples': ('samples', 'sum'), 'last_seen': ('last_seen', 'max')}
+    for name in means:
+        agg[f'{name}_sum'] = (f'{name}_sum', 'sum')
+        agg[f'{name}_n'] = (f'{name}_n', 'sum')
+    agg.update({name: (name, how) for name, (_, how) in aggregates.items() if how != 'mean'})
+    agg.update({column: (column, 'last') for column in keep})
+    daily = hourly.groupby(['city', 'day'], sort=False).agg(**agg).reset_index()
+    for name in means:
+        total = daily.pop(f'{name}_sum')
+        weight = daily.pop(f'{name}_n')
+        daily[name] = total / weight.where(weight > 0)
+    daily = daily.rename(columns={'day': 'bucket'})
+    daily.insert(0, 'granularity', 'day')
+    return daily
+
+def refresh_rollups(connection_string: str, since: datetime) -> dict:
+    """Recompute every hour and day that can contain readings loaded at or after `since`"""
+    engine = get_engine(connection_string)
+    ensure_schema(engine)
+    # Readings are stamped with the provider's observation time, which trails the run that loads them
+    hour_start = pd.Timestamp(since - OBSERVATION_LAG).floor('h').to_pydatetime()
+    day_start = pd.Timestamp(hour_start).floor('D').to_pydatetime()
+
+    frames = {}
+    sources = [
+        ('weather_rollups', WeatherData.__table__, WeatherRollup.__table__, WEATHER_AGGREGATES, ['province']),
+        ('air_quality_rollups', AirQuality.__table__, AirQualityRollup.__table__, AIR_QUALITY_AGGREGATES, []),
+    ]
+    with engine.connect() as conn:
+        for table_name, raw_table, rollup_table, aggregates, keep in sources:
+            columns = ['city', 'timestamp'] + sorted({column for column, _ in aggregates.values()}) + keep
+            hourly = hourly_rollup(_read_raw(conn, raw_table, columns, hour_start), aggregates, keep)
+            if hourly.empty:
+                continue
+            # Hours of the affected days that were rolled up by earlier runs
+            earlier = pd.read_sql(
+                select(rollup_table).where(rollup_table.c.granularity == 'hour',
+                                           rollup_table.c.bucket >= day_start,
+                                           rollup_table.c.bucket < hour_start), conn
+            )
+            # Re-applied in pandas: SQLite compares datetimes as text, and stored and bound values differ in precision
+            earlier = earlier[pd.to_datetime(earlier['bucket']) < hour_start]
+            day_hours = pd.concat([earlier[hourly.columns], hourly], ignore_index=True) if not earlier.empty else hourly
+            daily = daily_rollup(day_hours, aggregates, keep)
+            frames[table_name] = pd.concat([hourly, daily], ignore_index=True).assign(updated_at=datetime.utcnow())
+
+    if not frames:
+        return {}
+    row_counts = load_batch(frames, connection_string, mode="merge")
+    logging.info("Refreshed rollups since %s: %s", hour_start, row_counts)
+    return row_counts
+
+if __name__ == "__main__":
+    import argparse
+    from config import get_connection_string
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--since", required=True, type=datetime.fromisoformat, help="ISO date or timestamp (UTC)")
+    args = parser.parse_args()
+
+    connection = get_connection_string()
+    print(refresh_rollups(connection, args.since))
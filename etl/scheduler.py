@@ -0,0 +1,160 @@
+"""Interval scheduler with per-job cadences, jitter, overlap protection and catch-up policies.
+
+Occurrences are anchored to fixed slots (anchor + n * interval), so a slow
+run or a late wake-up never shifts the schedule. Each occurrence starts at a
+random offset of up to `jitter` seconds into its slot to spread API load.
+When occurrences were missed (the process was busy or suspended) the job's
+catch-up policy decides what happens:
+
+    skip  drop the missed occurrences and wait for the next slot
+    once  run a single time now for all of them
+    all   run once for every missed occurrence, back to back
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import SCHEDULE_JITTER, SCHEDULE_CATCH_UP, SCHEDULER_WORKERS
+
+CATCH_UP_POLICIES = ("skip", "once", "all")
+
+class Job:
+    """A function run every `interval` seconds"""
+
+    def __init__(self, name: str, func, interval: float, jitter: float = 0.0,
+                 catch_up: str = "once", skip_if_running: bool = True):
+        if interval <= 0:
+            raise ValueError(f"Job {name} needs a positive interval, got {interval}")
+        if catch_up not in CATCH_UP_POLICIES:
+            raise ValueError(f"Unknown catch-up policy {catch_up!r}; expected one of {CATCH_UP_POLICIES}")
+        self.name = name
+        self.func = func
+        self.interval = interval
+        # Keep every start inside the first half of its slot
+        self.jitter = min(max(jitter, 0.0), interval / 2)
+        self.catch_up = catch_up
+        self.skip_if_running = skip_if_running
+        self.anchor = None
+        self.slot = 0
+        self.next_run = None
+        self.running = False
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+        self.last_duration = None
+        self.last_error = None
+
+    def stats(self) -> dict:
+        return {
+            'interval': self.interval,
+            'running': self.running,
+            'runs': self.runs,
+            'skipped': self.skipped,
+            'failures': self.failures,
+            'last_duration': self.last_duration,
+            'last_error': self.last_error,
+        }
+
+class Scheduler:
+    """Run jobs on a thread pool at their own fixed cadences"""
+
+    def __init__(self, max_workers: int = SCHEDULER_WORKERS, clock=time.monotonic, rng: random.Random = None):
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.jobs = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scheduler")
+
+    def add_job(self, name: str, func, interval: float, jitter: float = SCHEDULE_JITTER,
+                catch_up: str = SCHEDULE_CATCH_UP, skip_if_running: bool = True,
+                run_immediately: bool = True) -> Job:
+        """Register a job; its first slot starts now, or one interval from now"""
+        job = Job(name, func, interval, jitter, catch_up, skip_if_running)
+        job.anchor = self.clock()
+        if run_immediately:
+            job.next_run = job.anchor
+        else:
+            job.slot = 1
+            job.next_run = self._slot_start(job)
+        self.jobs.append(job)
+        logging.info("Scheduled %s every %ss (jitter %ss, catch-up %s)", name, interval, job.jitter, catch_up)
+        return job
+
+    def _slot_start(self, job: Job) -> float:
+        offset = self.rng.uniform(0, job.jitter) if job.jitter else 0.0
+        return job.anchor + job.slot * job.interval + offset
+
+    def run_pending(self) -> list:
+        """Start every job that is due and return the names of those started"""
+        now = self.clock()
+        started = []
+        for job in self.jobs:
+            if now < job.next_run:
+                continue
+            # Slots from job.slot up to the one containing `now` are all due
+            current = max(job.slot, int((now - job.anchor) // job.interval))
+            due = current - job.slot + 1
+            job.slot = current + 1
+            job.next_run = self._slot_start(job)
+
+            with self._lock:
+                busy = job.running
+                if busy and job.skip_if_running:
+                    job.skipped += due
+                    logging.warning("Skipping %s: previous run still in progress", job.name)
+                    continue
+                if due > 1 and job.catch_up == "skip":
+                    job.skipped += due
+                    logging.warning("Skipping %d missed runs of %s", due, job.name)
+                    continue
+                runs = due if job.catch_up == "all" else 1
+                job.skipped += due - runs
+                job.running = True
+            self._executor.submit(self._run, job, runs)
+            started.append(job.name)
+        return started
+
+    def _run(self, job: Job, runs: int):
+        for _ in range(runs):
+            start = time.perf_counter()
+            try:
+                job.func()
+                job.last_error = None
+            except Exception as e:
+                job.failures += 1
+                job.last_error = str(e)
+                logging.error("Scheduled job %s failed: %s", job.name, e)
+            job.runs += 1
+            job.last_duration = round(time.perf_counter() - start, 3)
+        with self._lock:
+            job.running = False
+
+    def seconds_until_next(self) -> float:
+        if not self.jobs:
+            return 60.0
+        return max(0.0, min(job.next_run for job in self.jobs) - self.clock())
+
+    def stats(self) -> dict:
+        return {job.name: job.stats() for job in self.jobs}
+
+    @property
+    def running(self) -> bool:
+        return not self._stop.is_set()
+
+    def run_forever(self):
+        """Sleep until the next due job, start it, repeat until stop() is called"""
+        try:
+            while not self._stop.is_set():
+                self.run_pending()
+                self._stop.wait(self.seconds_until_next())
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def stop(self):
+        self._stop.set()
+
+    def shutdown(self, wait: bool = True):
+        self.stop()
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,261 @@
+"""Sharded ETL runs across worker processes or hosts, coordinated through the database.
+
+A coordinator registers a run as N shard rows in shard_leases. Workers claim
+shards with a conditional UPDATE, so any number of processes on any number
+of hosts can share a run without talking to each other. A claimed shard
+loads its slice of the city registry (city id modulo N) and runs extract,
+transform and load on its own; the lease is renewed while the shard runs,
+and a shard whose worker died is picked up again once its lease expires.
+Loads use merge mode, so re-running a shard is safe. When every shard is
+finished the coordinator merges the per-shard statistics and refreshes the
+dashboard rollups once for the whole run. Hosts do not share a rate limiter:
+each takes 1/SHARD_HOSTS of the OpenWeather quota and splits it between its
+worker processes.
+
+Usage:
+    python -m etl.sharding run --workers 8          # coordinator plus local workers
+    python -m etl.sharding start --shards 32         # register a run, print its id
+    python -m etl.sharding work RUN_ID              # join a run from another host
+    python -m etl.sharding status RUN_ID
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, or_, and_
+from config import (get_connection_string, SHARD_LEASE_SECONDS, SHARD_WORKERS, SHARD_HOSTS,
+                    OPENWEATHER_CALLS_PER_MINUTE, OPENWEATHER_BURST, EXTRACT_CONCURRENCY)
+from db.engine import get_engine, ensure_schema, reset_engines
+from db.models import ShardLease
+from etl import cache, rate_limit, resilience
+from etl.data_quality import DataQualityChecker
+from etl.extract import iter_city_results
+from etl.registry import CityRegistry
+from etl.rollups import refresh_rollups
+from etl.streaming import StreamingPipeline
+
+def create_run(connection_string: str, shard_count: int) -> str:
+    """Register a run as shard_count pending shards and return its id"""
+    engine = get_engine(connection_string)
+    ensure_schema(engine)
+    # Shards only read their slice of the registry, so an empty one must be seeded before they start
+    CityRegistry(connection_string).load()
+    run_id = uuid.uuid4().hex
+    with engine.begin() as conn:
+        conn.execute(ShardLease.__table__.insert(), [
+            {'run_id': run_id, 'shard': shard, 'shard_count': shard_count, 'status': 'pending'}
+            for shard in range(shard_count)
+        ])
+    logging.info("Registered run %s with %d shards", run_id, shard_count)
+    return run_id
+
+def acquire_lease(connection_string: str, run_id: str, owner: str,
+                  lease_seconds: int = SHARD_LEASE_SECONDS) -> dict:
+    """Claim a pending or expired shard of a run; None when nothing is left to claim"""
+    table = ShardLease.__table__
+    engine = get_engine(connection_string)
+    claimable = and_(
+        table.c.run_id == run_id,
+        or_(table.c.status == 'pending',
+            and_(table.c.status == 'leased', table.c.lease_expires_at < datetime.utcnow()))
+    )
+    with engine.connect() as conn:
+        candidates = conn.execute(select(table.c.id, table.c.shard, table.c.shard_count)
+                                  .where(claimable).order_by(table.c.shard)).fetchall()
+
+    for lease_id, shard, shard_count in candidates:
+        now = datetime.utcnow()
+        # Only one worker's UPDATE can still match the claimable condition
+        with engine.begin() as conn:
+            claimed = conn.execute(update(table).where(table.c.id == lease_id).where(claimable).values(
+                status='leased', owner=owner, started_at=now,
+                lease_expires_at=now + timedelta(seconds=lease_seconds)
+            )).rowcount
+        if claimed == 1:
+            return {'id': lease_id, 'run_id': run_id, 'shard': shard, 'shard_count': shard_count}
+    return None
+
+def renew_lease(connection_string: str, lease: dict, owner: str, lease_seconds: int = SHARD_LEASE_SECONDS) -> bool:
+    """Extend a lease still held by owner"""
+    table = ShardLease.__table__
+    with get_engine(connection_string).begin() as conn:
+        return conn.execute(update(table).where(table.c.id == lease['id'], table.c.owner == owner,
+                                                table.c.status == 'leased').values(
+            lease_expires_at=datetime.utcnow() + timedelta(seconds=lease_seconds)
+        )).rowcount == 1
+
+def complete_lease(connection_string: str, lease: dict, owner: str, stats: dict, status: str = 'done'):
+    """Record a shard's outcome and statistics"""
+    table = ShardLease.__table__
+    with get_engine(connection_string).begin() as conn:
+        conn.execute(update(table).where(table.c.id == lease['id'], table.c.owner == owner).values(
+            status=status, finished_at=datetime.utcnow(), stats=json.dumps(stats)
+        ))
+
+class LeaseHeartbeat:
+    """Renew a lease in the background while its shard runs"""
+
+    def __init__(self, connection_string: str, lease: dict, owner: str, lease_seconds: int = SHARD_LEASE_SECONDS):
+        self.connection_string = connection_string
+        self.lease = lease
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                if not renew_lease(self.connection_string, self.lease, self.owner, self.lease_seconds):
+                    logging.warning("Lost lease on shard %s of run %s", self.lease['shard'], self.lease['run_id'])
+                    return
+            except Exception as e:
+                logging.warning("Failed to renew lease on shard %s: %s", self.lease['shard'], e)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+
+def run_shard(connection_string: str, shard: int, shard_count: int) -> dict:
+    """Extract, transform and load one shard of the city registry"""
+    start = time.perf_counter()
+    registry = CityRegistry(connection_string, shard, shard_count)
+    cities = registry.cities
+    quality_checker = DataQualityChecker(connection_string)
+
+    def learn_ids(results, frames):
+        registry.learn([(result['city'], result['weather']) for result in results])
+
+    stream = StreamingPipeline(connection_string, quality_checker, registry.provinces, on_batch=learn_ids)
+    try:
+        stats = stream.run(iter_city_results(cities))
+    finally:
+        quality_checker.close()
+
+    return {
+        'shard': shard,
+        'cities': len(cities),
+        'succeeded': len(stats['succeeded']),
+        'failed': stats['failed'],
+        'batches': stats['batches'],
+        'row_counts': stats['row_counts'],
+        'quality_issues': len(stats['quality_issues']),
+        'load_errors': len(stats['load_errors']),
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+def work(connection_string: str, run_id: str, owner: str = None, lease_seconds: int = SHARD_LEASE_SECONDS) -> list:
+    """Claim and run shards of a run until none are left; returns the stats of each shard run here"""
+    owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+    ensure_schema(get_engine(connection_string))
+    completed = []
+    while True:
+        lease = acquire_lease(connection_string, run_id, owner, lease_seconds)
+        if lease is None:
+            return completed
+        logging.info("%s running shard %d/%d of run %s", owner, lease['shard'] + 1, lease['shard_count'], run_id)
+        try:
+            with LeaseHeartbeat(connection_string, lease, owner, lease_seconds):
+                stats = run_shard(connection_string, lease['shard'], lease['shard_count'])
+        except Exception as e:
+            logging.error("Shard %d of run %s failed: %s", lease['shard'], run_id, e)
+            complete_lease(connection_string, lease, owner, {'shard': lease['shard'], 'error': str(e)}, 'failed')
+            continue
+        complete_lease(connection_string, lease, owner, stats)
+        completed.append(stats)
+
+def run_status(connection_string: str, run_id: str) -> dict:
+    """Merge the statistics of every shard of a run"""
+    table = ShardLease.__table__
+    with get_engine(connection_string).connect() as conn:
+        rows = conn.execute(select(table.c.status, table.c.stats, table.c.started_at, table.c.finished_at)
+                            .where(table.c.run_id == run_id)).fetchall()
+
+    merged = {'run_id': run_id, 'shards': len(rows), 'status': {}, 'cities': 0, 'succeeded': 0,
+              'failed': [], 'batches': 0, 'row_counts': {}, 'quality_issues': 0, 'load_errors': 0, 'errors': []}
+    started = [row.started_at for row in rows if row.started_at]
+    finished = [row.finished_at for row in rows if row.finished_at]
+    for row in rows:
+        merged['status'][row.status] = merged['status'].get(row.status, 0) + 1
+        stats = json.loads(row.stats) if row.stats else {}
+        if 'error' in stats:
+            merged['errors'].append(stats['error'])
+        for key in ['cities', 'succeeded', 'batches', 'quality_issues', 'load_errors']:
+            merged[key] += stats.get(key, 0)
+        merged['failed'].extend(stats.get('failed', []))
+        for table_name, count in stats.get('row_counts', {}).items():
+            merged['row_counts'][table_name] = merged['row_counts'].get(table_name, 0) + count
+    if started and finished and len(finished) == len(rows):
+        merged['seconds'] = round((max(finished) - min(started)).total_seconds(), 3)
+    return merged
+
+def share_api_budget(processes: int, hosts: int = SHARD_HOSTS):
+    """Limit this process to its share of the OpenWeather quota.
+
+    Processes on one host split the host's share; hosts do not coordinate,
+    so SHARD_HOSTS must count every host working a run at the same time.
+    """
+    shares = max(1, processes * hosts)
+    rate_limit.openweather_limiter = rate_limit.RateLimiter(
+        max(1, OPENWEATHER_CALLS_PER_MINUTE // shares), EXTRACT_CONCURRENCY,
+        burst=max(1, OPENWEATHER_BURST // shares)
+    )
+
+def _init_worker(worker_count: int):
+    """Give a forked worker its own connections and a share of the API budget"""
+    reset_engines()
+    resilience.reset_breakers()
+    if isinstance(cache.response_cache, cache.SQLiteCache):
+        cache.response_cache = cache.build_cache()
+    share_api_budget(worker_count)
+
+def run_sharded(connection_string: str, workers: int = SHARD_WORKERS, shard_count: int = None) -> dict:
+    """Coordinate a run across local worker processes and return the merged statistics"""
+    shard_count = shard_count or workers
+    started_at = datetime.utcnow()
+    run_id = create_run(connection_string, shard_count)
+    # Workers open their own connections; the parent's pool must not be shared across fork
+    get_engine(connection_string).dispose()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(workers,)) as pool:
+        futures = [pool.submit(work, connection_string, run_id) for _ in range(workers)]
+        for future in futures:
+            future.result()
+    merged = run_status(connection_string, run_id)
+    try:
+        refresh_rollups(connection_string, started_at)
+    except Exception as e:
+        logging.error("Failed to refresh rollups: %s", e)
+    logging.info("Sharded run %s finished: %d/%d cities in %ss", run_id, merged['succeeded'],
+                 merged['cities'], merged.get('seconds'))
+    return merged
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["run", "start", "work", "status"])
+    parser.add_argument("run_id", nargs="?")
+    parser.add_argument("--workers", type=int, default=SHARD_WORKERS)
+    parser.add_argument("--shards", type=int)
+    args = parser.parse_args()
+
+    connection = get_connection_string()
+    if args.command == "run":
+        print(json.dumps(run_sharded(connection, args.workers, args.shards), indent=2))
+    elif args.command == "start":
+        print(create_run(connection, args.shards or args.workers))
+    elif args.command == "work":
+        share_api_budget(1)
+        print(json.dumps(work(connection, args.run_id), indent=2))
+    else:
+        print(json.dumps(run_status(connection, args.run_id), indent=2, default=str))
@@ -0,0 +1,175 @@
+"""Streaming ETL: extract, transform and load as stages connected by bounded queues.
+
+Each stage runs in its own thread. The transform stage groups extraction
+results into micro-batches that are flushed when they reach a size or when
+the oldest result has waited long enough, so loading starts while slower
+cities are still being fetched. Bounded queues apply backpressure, which
+keeps memory proportional to the queue and batch sizes rather than to the
+number of cities.
+"""
+import contextvars
+import logging
+import queue
+import threading
+import time
+from config import STREAM_BATCH_SIZE, STREAM_FLUSH_SECONDS, STREAM_QUEUE_SIZE, LOAD_MODE
+from etl.load import load_batch
+from etl.transform import normalize_results
+
+# Marks the end of a stage's output
+_DONE = object()
+
+# How often blocked stages check whether the pipeline is shutting down
+_POLL_SECONDS = 0.1
+
+class StreamingPipeline:
+    """Run extraction results through transform, validate and load stages concurrently"""
+
+    def __init__(self, connection_string: str, quality_checker=None, provinces: dict = None,
+                 batch_size: int = STREAM_BATCH_SIZE, flush_interval: float = STREAM_FLUSH_SECONDS,
+                 queue_size: int = STREAM_QUEUE_SIZE, load_mode: str = LOAD_MODE,
+                 on_batch=None, on_failure=None):
+        self.connection_string = connection_string
+        self.quality_checker = quality_checker
+        self.provinces = provinces
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.load_mode = load_mode
+        self.on_batch = on_batch
+        self.on_failure = on_failure
+        self._stop = threading.Event()
+        self._errors = []
+        self.stats = {}
+
+    def run(self, source) -> dict:
+        """Consume an iterable of per-city extraction results and return run statistics"""
+        self._stop.clear()
+        self._errors = []
+        self.stats = {'succeeded': [], 'failed': [], 'batches': 0, 'row_counts': {},
+                      'quality_issues': [], 'load_errors': []}
+
+        extracted = queue.Queue(maxsize=self.queue_size)
+        transformed = queue.Queue(maxsize=max(1, self.queue_size // self.batch_size))
+        # Each stage runs in a copy of the caller's context, so its metrics count towards the caller's run
+        stages = [
+            threading.Thread(target=contextvars.copy_context().run, args=(stage, *args), name=name, daemon=True)
+            for stage, args, name in [(self._extract, (source, extracted), "stream-extract"),
+                                      (self._transform, (extracted, transformed), "stream-transform"),
+                                      (self._load, (transformed,), "stream-load")]
+        ]
+        for stage in stages:
+            stage.start()
+        for stage in stages:
+            stage.join()
+
+        if self._errors:
+            raise self._errors[0]
+        return self.stats
+
+    def _fail(self, stage: str, error: Exception):
+        logging.error("Streaming %s stage failed: %s", stage, error)
+        self._errors.append(error)
+        self._stop.set()
+
+    def _put(self, target: queue.Queue, item) -> bool:
+        """Block until there is room downstream, giving up if the pipeline is stopping"""
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source: queue.Queue, timeout: float):
+        try:
+            return source.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def micro_batches(self, source: queue.Queue):
+        """Yield lists of items, flushing at batch_size items or flush_interval seconds after the first"""
+        batch = []
+        deadline = None
+        while not self._stop.is_set():
+            if batch and time.monotonic() >= deadline:
+                yield batch
+                batch = []
+            timeout = _POLL_SECONDS if not batch else min(_POLL_SECONDS, max(0.0, deadline - time.monotonic()))
+            item = self._get(source, timeout)
+            if item is None:
+                continue
+            if item is _DONE:
+                break
+            if not batch:
+                deadline = time.monotonic() + self.flush_interval
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch and not self._stop.is_set():
+            yield batch
+
+    def _extract(self, source, extracted: queue.Queue):
+        try:
+            for result in source:
+                if not self._put(extracted, result):
+                    return
+        except Exception as e:
+            self._fail("extract", e)
+        finally:
+            self._put(extracted, _DONE)
+
+    def _transform(self, extracted: queue.Queue, transformed: queue.Queue):
+        try:
+            for batch in self.micro_batches(extracted):
+                succeeded = [result for result in batch if result['success']]
+                for result in batch:
+                    if not result['success']:
+                        self.stats['failed'].append(result['city'])
+                        if self.on_failure:
+                            self.on_failure(result)
+                if not succeeded:
+                    continue
+
+                frames = normalize_results(succeeded, self.provinces)
+                if self.on_batch:
+                    self.on_batch(succeeded, frames)
+                self.stats['succeeded'].extend(result['city'] for result in succeeded)
+                if not self._put(transformed, frames):
+                    return
+        except Exception as e:
+            self._fail("transform", e)
+        finally:
+            self._put(transformed, _DONE)
+
+    def _load(self, transformed: queue.Queue):
+        try:
+            while not self._stop.is_set():
+                frames = self._get(transformed, _POLL_SECONDS)
+                if frames is None:
+                    continue
+                if frames is _DONE:
+                    return
+                self._load_frames(frames)
+        except Exception as e:
+            self._fail("load", e)
+
+    def _load_frames(self, frames: dict):
+        """Validate and load one micro-batch in its own transaction"""
+        if self.quality_checker is not None:
+            self.stats['quality_issues'].extend(self.quality_checker.validate_frames(frames).issues)
+        try:
+            row_counts = load_batch(frames, self.connection_string, mode=self.load_mode)
+        except Exception as e:
+            # A failed micro-batch is rolled back on its own; later batches still load
+            logging.error("Failed to load micro-batch: %s", e)
+            self.stats['load_errors'].append(str(e))
+            if self.quality_checker is not None:
+                self.quality_checker.discard_baselines()
+            return
+        self.stats['batches'] += 1
+        for table_name, count in row_counts.items():
+            self.stats['row_counts'][table_name] = self.stats['row_counts'].get(table_name, 0) + count
+        logging.info("Loaded micro-batch %d: %s", self.stats['batches'], row_counts)
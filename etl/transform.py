@@ -1,41 +1,57 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from config import FORECAST_HORIZON
+from etl.registry import PROVINCES
+from monitoring import metrics
 
-def normalize_weather(json_data):
-    df = pd.json_normalize(json_data)
-    # Extract weather description from list
-    weather_desc = df["weather"].apply(lambda w: w[0]["description"] if isinstance(w, list) and w else None)
+def normalize_weather_batch(payloads: list, provinces: dict = None) -> pd.DataFrame:
+    """Transform a list of current weather payloads into one DataFrame in a single columnar pass.
+
+    provinces maps city name to province; defaults to the seeded city registry.
+    """
+    if not payloads:
+        return pd.DataFrame()
     
-    # Create a mapping of cities to provinces
-    province_mapping = {
-        "Amsterdam": "Noord-Holland", "Haarlem": "Noord-Holland",
-        "Rotterdam": "Zuid-Holland", "The Hague": "Zuid-Holland",
-        "Utrecht": "Utrecht", "Eindhoven": "Noord-Brabant",
-        "Den Bosch": "Noord-Brabant", "Maastricht": "Limburg",
-        "Groningen": "Groningen", "Leeuwarden": "Friesland",
-        "Assen": "Drenthe", "Zwolle": "Overijssel",
-        "Arnhem": "Gelderland", "Nijmegen": "Gelderland",
-        "Middelburg": "Zeeland", "Lelystad": "Flevoland"
-    }
+    df = pd.json_normalize(payloads)
+    # Description of the first weather entry, extracted in one pass over the column
+    weather_desc = pd.Series(
+        [w[0]["description"] if isinstance(w, list) and w else None for w in df["weather"].tolist()],
+        index=df.index, dtype=object
+    )
     
     result = pd.DataFrame({
         "city": df["name"],
         "temperature": df["main.temp"],
         "humidity": df["main.humidity"],
         "weather": weather_desc,
-        "timestamp": datetime.utcnow(),
-        "province": df["name"].map(province_mapping),
+        "timestamp": observation_times(df),
+        "province": df["name"].map(PROVINCES if provinces is None else provinces),
         "coordinates_lat": df["coord.lat"],
         "coordinates_lon": df["coord.lon"],
         # Additional weather fields
         "wind_speed": df.get("wind.speed", None),
         "wind_direction": df.get("wind.deg", None),
         "pressure": df.get("main.pressure", None),
-        "visibility": df.get("visibility", None) / 1000 if "visibility" in df.columns else None,  # Convert to km
+        "visibility": df["visibility"] / 1000 if "visibility" in df.columns else None,  # Convert to km
         "feels_like": df.get("main.feels_like", None)
     })
     return result
 
+def observation_times(df: pd.DataFrame) -> pd.Series:
+    """UTC time of each observation from the payloads' `dt`, falling back to now where it is missing.
+
+    Keying rows on the observation rather than the fetch time makes a
+    re-fetched or cached reading merge into the row it already has.
+    """
+    now = pd.Timestamp(datetime.utcnow())
+    if "dt" not in df.columns:
+        return pd.Series(now, index=df.index)
+    return pd.to_datetime(df["dt"], unit="s").fillna(now)
+
+def normalize_weather(json_data):
+    return normalize_weather_batch([json_data])
+
 def normalize_air_quality(json_data, city: str):
     """Transform air quality JSON data to DataFrame"""
     if not json_data or 'list' not in json_data:
@@ -57,27 +73,58 @@ def normalize_air_quality(json_data, city: str):
         "pm2_5": [aqi_data['components']['pm2_5']],
         "pm10": [aqi_data['components']['pm10']],
         "nh3": [aqi_data['components']['nh3']],
-        "timestamp": [datetime.utcnow()]
+        "timestamp": [datetime.utcfromtimestamp(aqi_data['dt']) if aqi_data.get('dt') else datetime.utcnow()]
     })
     return result
 
-def normalize_forecast(json_data):
-    """Transform forecast JSON data to DataFrame"""
-    if not json_data or 'list' not in json_data:
+def normalize_forecast_batch(payloads: list, horizon: int = FORECAST_HORIZON) -> pd.DataFrame:
+    """Transform forecast payloads for many cities into one DataFrame, keeping `horizon` 3-hour steps each"""
+    cities = []
+    items = []
+    for json_data in payloads:
+        if not json_data or 'list' not in json_data:
+            continue
+        steps = json_data['list'][:horizon]
+        items.extend(steps)
+        cities.extend([json_data['city']['name']] * len(steps))
+    
+    if not items:
         return pd.DataFrame()
     
-    forecasts = []
-    city = json_data['city']['name']
+    # Epoch seconds to UTC timestamps in one vectorized conversion
+    epochs = np.fromiter((item['dt'] for item in items), dtype=np.int64, count=len(items))
+    
+    return pd.DataFrame({
+        "city": cities,
+        "forecast_date": pd.to_datetime(epochs, unit='s'),
+        "temperature": [item['main']['temp'] for item in items],
+        "humidity": [item['main']['humidity'] for item in items],
+        "weather": [item['weather'][0]['description'] if item.get('weather') else None for item in items],
+        "created_at": datetime.utcnow()
+    })
+
+def normalize_forecast(json_data, horizon: int = FORECAST_HORIZON):
+    """Transform forecast JSON data to DataFrame"""
+    return normalize_forecast_batch([json_data], horizon)
+
+def normalize_results(results: list, provinces: dict = None) -> dict:
+    """Turn successful per-city extraction results into frames keyed by target table"""
+    frames = {}
+    
+    with metrics.transform_seconds.time(table='weather_data'):
+        weather_df = normalize_weather_batch([result['weather'] for result in results if result['weather']], provinces)
+    if not weather_df.empty:
+        frames['weather_data'] = weather_df
     
-    for item in json_data['list'][:5]:  # Next 5 forecasts
-        forecast = {
-            "city": city,
-            "forecast_date": datetime.fromtimestamp(item['dt']),
-            "temperature": item['main']['temp'],
-            "humidity": item['main']['humidity'],
-            "weather": item['weather'][0]['description'],
-            "created_at": datetime.utcnow()
-        }
-        forecasts.append(forecast)
+    with metrics.transform_seconds.time(table='air_quality'):
+        air_quality_dfs = [normalize_air_quality(result['air_quality'], result['city'])
+                           for result in results if result['air_quality']]
+        air_quality_dfs = [df for df in air_quality_dfs if not df.empty]
+        if air_quality_dfs:
+            frames['air_quality'] = pd.concat(air_quality_dfs, ignore_index=True)
     
-    return pd.DataFrame(forecasts)
+    with metrics.transform_seconds.time(table='weather_forecast'):
+        forecast_df = normalize_forecast_batch([result['forecast'] for result in results if result['forecast']])
+    if not forecast_df.empty:
+        frames['weather_forecast'] = forecast_df
+    return frames
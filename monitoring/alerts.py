@@ -1,83 +1,338 @@
+"""Email alerts delivered in the background.
+
+AlertSystem formats alerts and hands them to an AlertDispatcher, so raising
+an alert never blocks the pipeline on SMTP. The dispatcher's thread collects
+alerts into a digest, sent when a run flushes it or ALERT_DIGEST_SECONDS after
+its first alert, over one SMTP connection that stays open between digests.
+An alert whose key was sent within ALERT_COOLDOWN_SECONDS is dropped, repeats
+within a digest are collapsed into a count, and at most
+ALERT_MAX_EMAILS_PER_HOUR emails go out; beyond that, alerts accumulate into
+the next digest. A digest the SMTP server did not accept is merged back into
+the pending one and retried ALERT_DIGEST_SECONDS later.
+"""
+import atexit
+import queue
 import smtplib
+import textwrap
+import threading
+import time
+from collections import deque
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 import logging
-import os
+from config import (SMTP_SERVER, SMTP_PORT, SMTP_STARTTLS, SMTP_TIMEOUT, EMAIL_USER, EMAIL_PASSWORD,
+                    ALERT_RECIPIENTS, ALERT_DIGEST_SECONDS, ALERT_COOLDOWN_SECONDS, ALERT_MAX_EMAILS_PER_HOUR)
+
+class Alert:
+    """One alert; repeats of its key within a digest only raise count"""
+
+    def __init__(self, key: str, subject: str, message: str):
+        self.key = key
+        self.subject = subject
+        self.message = message
+        self.count = 1
+
+class SMTPSender:
+    """Sends emails over a single SMTP connection, reconnecting when the server has dropped it"""
+
+    def __init__(self, server: str = SMTP_SERVER, port: int = SMTP_PORT, user: str = EMAIL_USER,
+                 password: str = EMAIL_PASSWORD, recipients: list = None, starttls: bool = SMTP_STARTTLS,
+                 timeout: float = SMTP_TIMEOUT):
+        self.server = server
+        self.port = port
+        self.user = user
+        self.password = password
+        self.recipients = ALERT_RECIPIENTS if recipients is None else recipients
+        self.starttls = starttls
+        self.timeout = timeout
+        self._smtp = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.user and self.recipients)
+
+    def _connection(self) -> smtplib.SMTP:
+        if self._smtp is None:
+            smtp = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+            try:
+                if self.starttls:
+                    smtp.starttls()
+                # Local relays accept mail without authentication
+                if self.password:
+                    smtp.login(self.user, self.password)
+            except Exception:
+                smtp.close()
+                raise
+            self._smtp = smtp
+        return self._smtp
+
+    def send(self, subject: str, message: str):
+        msg = MIMEMultipart()
+        msg['From'] = self.user
+        msg['To'] = ", ".join(self.recipients)
+        msg['Subject'] = subject
+        msg.attach(MIMEText(message, 'plain'))
+        text = msg.as_string()
+        try:
+            self._connection().sendmail(self.user, self.recipients, text)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # Servers close idle connections; one fresh connection per send is the fallback
+            self.close()
+            self._connection().sendmail(self.user, self.recipients, text)
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                self._smtp.close()
+            self._smtp = None
+
+_STOP = object()
+
+class AlertDispatcher:
+    """Background digest delivery with deduplication, cooldown and an hourly email limit"""
+
+    def __init__(self, sender: SMTPSender = None, digest_seconds: float = ALERT_DIGEST_SECONDS,
+                 cooldown: float = ALERT_COOLDOWN_SECONDS, max_per_hour: int = ALERT_MAX_EMAILS_PER_HOUR,
+                 clock=time.monotonic, queue_size: int = 1000):
+        self.sender = sender or SMTPSender()
+        self.digest_seconds = digest_seconds
+        self.cooldown = cooldown
+        self.max_per_hour = max_per_hour
+        self.clock = clock
+        self.submitted = 0
+        self.suppressed = 0
+        self.dropped = 0
+        self.dropped_flushes = 0
+        self.emails_sent = 0
+        self.alerts_sent = 0
+        self.failures = 0
+        self._stats_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        # Owned by the worker thread
+        self._pending = {}
+        self._pending_since = None
+        self._last_sent = {}
+        self._sent_times = deque()
+        self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, key: str, subject: str, message: str):
+        """Queue an alert without waiting for delivery"""
+        try:
+            self._queue.put_nowait(Alert(key, subject, message))
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            logging.warning("Alert queue full, dropped alert: %s", subject)
+            return
+        with self._stats_lock:
+            self.submitted += 1
+
+    def flush(self, wait: bool = False, timeout: float = 30) -> bool:
+        """Send the pending digest now, rate limit permitting; with wait, block until it was handled.
+
+        With the queue full the request is dropped and False returned; the
+        digest still goes out once it is due.
+        """
+        done = threading.Event()
+        try:
+            self._queue.put_nowait(done)
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped_flushes += 1
+            logging.warning("Alert queue full, dropped flush request")
+            return False
+        return done.wait(timeout) if wait else True
+
+    def close(self, timeout: float = 10):
+        """Deliver what is pending, ignoring the rate limit, and stop the worker"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        self.sender.close()
+
+    def stats(self) -> dict:
+        return {
+            "submitted": self.submitted,
+            "suppressed": self.suppressed,
+            "dropped": self.dropped,
+            "dropped_flushes": self.dropped_flushes,
+            "pending": len(self._pending),
+            "emails_sent": self.emails_sent,
+            "alerts_sent": self.alerts_sent,
+            "failures": self.failures,
+        }
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self._seconds_until_due())
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                self._deliver(force=True)
+                return
+            if isinstance(item, Alert):
+                self._add(item)
+            elif isinstance(item, threading.Event):
+                self._deliver()
+                item.set()
+            if self._pending_since is not None and self._seconds_until_due() == 0:
+                self._deliver()
+
+    def _add(self, alert: Alert):
+        now = self.clock()
+        if alert.key in self._pending:
+            self._pending[alert.key].count += 1
+            return
+        sent_at = self._last_sent.get(alert.key)
+        if sent_at is not None and now - sent_at < self.cooldown:
+            self.suppressed += 1
+            logging.debug("Suppressed repeated alert: %s", alert.subject)
+            return
+        self._pending[alert.key] = alert
+        if self._pending_since is None:
+            self._pending_since = now
+
+    def _seconds_until_due(self):
+        """Queue wait until the pending digest is due, or None when nothing is pending"""
+        if self._pending_since is None:
+            return None
+        due = self._pending_since + self.digest_seconds
+        if len(self._sent_times) >= self.max_per_hour:
+            due = max(due, self._sent_times[0] + 3600)
+        return max(0.0, due - self.clock())
+
+    def _deliver(self, force: bool = False):
+        if not self._pending:
+            return
+        now = self.clock()
+        while self._sent_times and now - self._sent_times[0] >= 3600:
+            self._sent_times.popleft()
+        if not force and len(self._sent_times) >= self.max_per_hour:
+            logging.warning("Alert email limit of %d per hour reached; %d alerts held for the next digest",
+                            self.max_per_hour, len(self._pending))
+            return
+
+        alerts = list(self._pending.values())
+        self._pending = {}
+        self._pending_since = None
+        if not self.sender.configured:
+            logging.warning("Email configuration incomplete. %d alerts not sent.", len(alerts))
+            return
+        subject, message = format_digest(alerts)
+        try:
+            self.sender.send(subject, message)
+        except Exception as e:
+            self.failures += 1
+            if force:
+                logging.error("Failed to send email alert (%d alerts): %s", len(alerts), e)
+                return
+            logging.error("Failed to send email alert (%d alerts), retrying with the next digest: %s",
+                          len(alerts), e)
+            self._requeue(alerts, now)
+            return
+        self._sent_times.append(now)
+        for alert in alerts:
+            self._last_sent[alert.key] = now
+        self.emails_sent += 1
+        self.alerts_sent += len(alerts)
+        logging.info("Alert email sent successfully (%d alerts)", len(alerts))
+
+    def _requeue(self, alerts: list, now: float):
+        """Merge alerts that were not sent back into the pending digest"""
+        for alert in alerts:
+            pending = self._pending.get(alert.key)
+            if pending is None:
+                self._pending[alert.key] = alert
+            else:
+                pending.count += alert.count
+        if self._pending_since is None:
+            self._pending_since = now
+
+def quality_check(issue: str) -> str:
+    """Table and check type of a QualityReport issue, e.g. 'weather_data statistical_anomaly'"""
+    return issue.split(" (", 1)[0]
+
+def format_digest(alerts: list) -> tuple:
+    """Subject and body of one email carrying every alert"""
+    if len(alerts) == 1 and alerts[0].count == 1:
+        return alerts[0].subject, textwrap.dedent(alerts[0].message).strip()
+    sections = []
+    for alert in alerts:
+        repeated = f" (repeated {alert.count} times)" if alert.count > 1 else ""
+        sections.append(f"{alert.subject}{repeated}\n\n{textwrap.dedent(alert.message).strip()}")
+    return f"🔔 Weather ETL Pipeline: {len(alerts)} alerts", ("\n\n" + "-" * 40 + "\n\n").join(sections)
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def default_dispatcher() -> AlertDispatcher:
+    """The dispatcher shared by every AlertSystem in this process, drained at exit"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = AlertDispatcher()
+            atexit.register(_dispatcher.close)
+        return _dispatcher
 
 class AlertSystem:
-    def __init__(self):
-        self.smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-        self.smtp_port = int(os.getenv("SMTP_PORT", "587"))
-        self.email_user = os.getenv("EMAIL_USER")
-        self.email_password = os.getenv("EMAIL_PASSWORD")
-        self.alert_recipients = os.getenv("ALERT_RECIPIENTS", "").split(",")
-    
+    def __init__(self, dispatcher: AlertDispatcher = None):
+        self.dispatcher = dispatcher or default_dispatcher()
+
     def send_weather_alert(self, city: str, temperature: float, condition: str):
         """Send weather alert for extreme conditions"""
         if temperature > 35 or temperature < -10:
             subject = f"🌡️ Extreme Weather Alert - {city}"
             message = f"""
             Extreme weather detected in {city}:
-            
+
             Temperature: {temperature}°C
             Condition: {condition}
             Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-            
+
             Please take appropriate precautions.
             """
-            self._send_email(subject, message)
-    
+            self.dispatcher.submit(f"weather:{city}", subject, message)
+
     def send_pipeline_failure_alert(self, error_message: str):
         """Send alert when ETL pipeline fails"""
         subject = "🚨 ETL Pipeline Failure Alert"
         message = f"""
         The Weather ETL Pipeline has encountered an error:
-        
+
         Error: {error_message}
         Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-        
+
         Please check the logs and take corrective action.
         """
-        self._send_email(subject, message)
-    
+        self.dispatcher.submit(f"failure:{error_message}", subject, message)
+
     def send_data_quality_alert(self, issues: list):
-        """Send alert for data quality issues"""
-        if issues:
-            subject = "⚠️ Data Quality Issues Detected"
-            message = f"""
+        """Send one alert per failed check, so the cooldown applies to each check on its own"""
+        checks = {}
+        for issue in map(str, issues):
+            checks.setdefault(quality_check(issue), []).append(issue)
+        for check, check_issues in checks.items():
+            subject = f"⚠️ Data Quality Issues Detected - {check}"
+            # Dedented before the issues are filled in, so every issue line lines up
+            message = textwrap.dedent("""
             Data quality issues detected in the Weather ETL Pipeline:
-            
+
             Issues:
-            {chr(10).join(f"- {issue}" for issue in issues)}
-            
-            Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-            
+            {issues}
+
+            Time: {time}
+
             Please review the data quality logs.
-            """
-            self._send_email(subject, message)
-    
-    def _send_email(self, subject: str, message: str):
-        """Send email notification"""
-        if not self.email_user or not self.alert_recipients:
-            logging.warning("Email configuration incomplete. Alert not sent.")
-            return
-        
-        try:
-            msg = MIMEMultipart()
-            msg['From'] = self.email_user
-            msg['To'] = ", ".join(self.alert_recipients)
-            msg['Subject'] = subject
-            
-            msg.attach(MIMEText(message, 'plain'))
-            
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.email_user, self.email_password)
-            text = msg.as_string()
-            server.sendmail(self.email_user, self.alert_recipients, text)
-            server.quit()
-            
-            logging.info("Alert email sent successfully")
-        except Exception as e:
-            logging.error("Failed to send email alert: %s", e)
+            """).format(issues="\n".join(f"- {issue}" for issue in check_issues),
+                        time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            # Keyed on the check alone: the row counts change from run to run
+            self.dispatcher.submit(f"data_quality:{check.replace(' ', ':')}", subject, message)
+
+    def flush(self, wait: bool = False) -> bool:
+        """Send everything raised so far as one digest, e.g. at the end of a run"""
+        return self.dispatcher.flush(wait)
@@ -1,13 +1,95 @@
+"""Health checks that are cheap enough to run next to the pipeline.
+
+System resources are sampled by a background thread and read from its
+latest snapshot, so a check never waits on psutil. Data freshness is a
+primary-key lookup in load_watermarks, which the loader advances in the
+same transaction as the rows, instead of a MAX() over the data tables.
+"""
+import os
+import threading
 import time
 import psutil
 import logging
-from sqlalchemy import create_engine, text
+import json
+from sqlalchemy import text, select, func
+from config import HEALTH_SAMPLE_SECONDS
+from db.dialect import day
+from db.engine import get_engine
+from db.models import PipelineRun, LoadWatermark, WeatherData, DataQuality
 from datetime import datetime, timedelta
 
+class ResourceSampler:
+    """Samples CPU, memory and disk usage every `interval` seconds on a daemon thread"""
+
+    def __init__(self, interval: float = HEALTH_SAMPLE_SECONDS, path: str = None):
+        self.interval = interval
+        # The root of the filesystem the pipeline runs from, on any OS
+        self.path = path or os.path.abspath(os.sep)
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        # The first non-blocking cpu_percent call only starts the measurement
+        psutil.cpu_percent(interval=None)
+        self.sample()
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self._thread.start()
+
+    def sample(self) -> dict:
+        try:
+            disk_percent = psutil.disk_usage(self.path).percent
+        except Exception as e:
+            logging.warning("Disk usage of %s unavailable: %s", self.path, e)
+            disk_percent = None
+        snapshot = {
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "memory_percent": psutil.virtual_memory().percent,
+            "disk_percent": disk_percent,
+            "timestamp": datetime.now()
+        }
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def snapshot(self) -> dict:
+        """The latest sample, without waiting"""
+        with self._lock:
+            return dict(self._snapshot)
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logging.error("Resource sampling failed: %s", e)
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+def default_sampler() -> ResourceSampler:
+    """The sampler shared by every HealthMonitor in this process, started on first use"""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = ResourceSampler()
+        return _sampler
+
+def freshness_status(age_hours: float) -> str:
+    if age_hours <= 2:
+        return "fresh"
+    if age_hours <= 24:
+        return "stale"
+    return "very_stale"
+
 class HealthMonitor:
-    def __init__(self, connection_string: str):
+    def __init__(self, connection_string: str, sampler: ResourceSampler = None):
         self.connection_string = connection_string
-        self.engine = create_engine(connection_string)
+        self.engine = get_engine(connection_string)
+        self.sampler = sampler
+        # The most recent log_health_check result, for callers that must not run checks themselves
+        self.last_check = None
     
     def check_database_health(self) -> dict:
         """Check database connectivity and performance"""
@@ -31,86 +113,98 @@ class HealthMonitor:
             }
     
     def check_data_freshness(self) -> dict:
-        """Check if weather data is recent (within last 2 hours)"""
+        """Check if weather data is recent (within last 2 hours), from the load watermarks"""
         try:
+            watermarks = LoadWatermark.__table__
             with self.engine.connect() as conn:
-                query = text("""
-                    SELECT MAX(timestamp) as latest_timestamp 
-                    FROM weather_data
-                """)
-                result = conn.execute(query).fetchone()
-                
-                if result and result[0]:
-                    latest_timestamp = result[0]
-                    age_hours = (datetime.utcnow() - latest_timestamp).total_seconds() / 3600
-                    
-                    if age_hours <= 2:
-                        status = "fresh"
-                    elif age_hours <= 24:
-                        status = "stale"
-                    else:
-                        status = "very_stale"
-                    
-                    return {
-                        "status": status,
-                        "latest_timestamp": latest_timestamp,
-                        "age_hours": round(age_hours, 2)
-                    }
-                else:
-                    return {
-                        "status": "no_data",
-                        "latest_timestamp": None,
-                        "age_hours": None
-                    }
+                rows = conn.execute(select(watermarks.c.table_name, watermarks.c.latest_timestamp,
+                                           watermarks.c.loaded_at)).fetchall()
         except Exception as e:
             return {
                 "status": "error",
                 "error": str(e)
             }
-    
-    def check_system_resources(self) -> dict:
-        """Check system CPU, memory, and disk usage"""
-        try:
-            # For Windows, use C:\ drive
-            disk_usage = psutil.disk_usage('C:\\')
-            disk_percent = (disk_usage.used / disk_usage.total) * 100
-        except Exception:
-            disk_percent = 0
         
+        now = datetime.utcnow()
+        tables = {row.table_name: {
+            "latest_timestamp": row.latest_timestamp,
+            "age_hours": round((now - row.latest_timestamp).total_seconds() / 3600, 2),
+            "loaded_at": row.loaded_at,
+        } for row in rows if row.latest_timestamp is not None}
+        
+        weather = tables.get("weather_data")
+        if weather is None:
+            return {
+                "status": "no_data",
+                "latest_timestamp": None,
+                "age_hours": None,
+                "tables": tables
+            }
         return {
-            "cpu_percent": psutil.cpu_percent(interval=1),
-            "memory_percent": psutil.virtual_memory().percent,
-            "disk_percent": round(disk_percent, 2),
-            "timestamp": datetime.now()
+            "status": freshness_status(weather["age_hours"]),
+            "latest_timestamp": weather["latest_timestamp"],
+            "age_hours": weather["age_hours"],
+            "tables": tables
         }
     
+    def check_system_resources(self) -> dict:
+        """Latest CPU, memory and disk usage sample from the background sampler"""
+        if self.sampler is None:
+            self.sampler = default_sampler()
+        return self.sampler.snapshot()
+    
     def get_pipeline_metrics(self) -> dict:
         """Get ETL pipeline performance metrics"""
         try:
             with self.engine.connect() as conn:
+                # Cutoffs are computed here in UTC, the time the loader stores,
+                # rather than with each database's own date arithmetic
+                now = datetime.utcnow()
+                
                 # Count records by day
-                daily_records_query = text("""
-                    SELECT DATE(timestamp) as date, COUNT(*) as record_count
-                    FROM weather_data
-                    WHERE timestamp >= DATEADD(day, -7, GETDATE())
-                    GROUP BY DATE(timestamp)
-                    ORDER BY date DESC
-                """)
+                weather = WeatherData.__table__
+                date = day(weather.c.timestamp)
+                daily_records_query = (
+                    select(date.label("date"), func.count().label("record_count"))
+                    .where(weather.c.timestamp >= now - timedelta(days=7))
+                    .group_by(date)
+                    .order_by(date.desc())
+                )
                 
                 # Data quality summary
-                quality_query = text("""
-                    SELECT status, COUNT(*) as count
-                    FROM data_quality
-                    WHERE timestamp >= DATEADD(day, -1, GETDATE())
-                    GROUP BY status
-                """)
+                quality = DataQuality.__table__
+                quality_query = (
+                    select(quality.c.status, func.count().label("count"))
+                    .where(quality.c.timestamp >= now - timedelta(days=1))
+                    .group_by(quality.c.status)
+                )
+                
+                # Latest runs with their per-stage timings
+                runs = PipelineRun.__table__
+                recent_runs_query = (
+                    select(runs.c.job, runs.c.status, runs.c.started_at, runs.c.duration_seconds,
+                           runs.c.cities_succeeded, runs.c.cities_failed, runs.c.rows_loaded, runs.c.summary)
+                    .order_by(runs.c.started_at.desc())
+                    .limit(10)
+                )
                 
                 daily_records = conn.execute(daily_records_query).fetchall()
                 quality_summary = conn.execute(quality_query).fetchall()
+                recent_runs = conn.execute(recent_runs_query).fetchall()
                 
                 return {
                     "daily_records": [{"date": str(row[0]), "count": row[1]} for row in daily_records],
                     "quality_summary": {row[0]: row[1] for row in quality_summary},
+                    "recent_runs": [{
+                        "job": row.job,
+                        "status": row.status,
+                        "started_at": row.started_at,
+                        "duration_seconds": row.duration_seconds,
+                        "cities_succeeded": row.cities_succeeded,
+                        "cities_failed": row.cities_failed,
+                        "rows_loaded": row.rows_loaded,
+                        "metrics": json.loads(row.summary).get("metrics", {}) if row.summary else {},
+                    } for row in recent_runs],
                     "timestamp": datetime.now()
                 }
         except Exception as e:
@@ -131,8 +225,9 @@ class HealthMonitor:
                     system_resources["memory_percent"], 
                     system_resources["disk_percent"])
         
-        return {
+        self.last_check = {
             "database": db_health,
             "data_freshness": data_freshness,
             "system_resources": system_resources
         }
+        return self.last_check
@@ -0,0 +1,388 @@
+"""In-process pipeline metrics: histograms and counters with pluggable sinks.
+
+Extract, transform and load record into the shared `metrics` registry. The
+registry is cumulative, which is what a Prometheus scrape expects; a run's
+summary holds only what its own job recorded: track_run opens a run scope,
+carried into stage threads by copying the context (RunContextExecutor), and
+every observation made in the scope is also recorded into a per-run
+registry. Summaries are published to every configured sink:
+
+    prometheus  text exposition on http://localhost:METRICS_PORT/metrics,
+                served by long-running processes only
+    json        the latest run summary written to METRICS_SUMMARY_PATH
+    database    one row per run in the pipeline_runs table
+"""
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import METRICS_SINKS, METRICS_PORT, METRICS_SUMMARY_PATH
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+THROUGHPUT_BUCKETS = (10, 100, 1_000, 5_000, 10_000, 50_000, 100_000, 500_000)
+
+# Shared registry -> registry of the run tracked in the current context
+_run_scopes = contextvars.ContextVar("run_scopes", default={})
+
+def _label_key(labelnames: tuple, labels: dict) -> tuple:
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+def _format_labels(labelnames: tuple, key: tuple, extra: str = None) -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, key)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    """Monotonically increasing count per label combination"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = None
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def empty_copy(self) -> "Counter":
+        return Counter(self.name, self.documentation, self.labelnames)
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        run = _run_scopes.get().get(self.registry)
+        if run is not None:
+            run.mirror(self).inc(amount, **labels)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> list:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+                for key, value in sorted(self.snapshot().items())]
+
+class Histogram:
+    """Bucketed distribution of observations per label combination"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.registry = None
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def empty_copy(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, self.labelnames, self.buckets)
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (not cumulative) counts; the last slot is +Inf
+                state = self._values[key] = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            state["buckets"][index] += 1
+            state["sum"] += value
+            state["count"] += 1
+        run = _run_scopes.get().get(self.registry)
+        if run is not None:
+            run.mirror(self).observe(value, **labels)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {key: {"buckets": list(state["buckets"]), "sum": state["sum"], "count": state["count"]}
+                    for key, state in self._values.items()}
+
+    def render(self) -> list:
+        lines = []
+        for key, state in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), state["buckets"]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state['sum']}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state['count']}")
+        return lines
+
+    def quantile(self, buckets: list, q: float):
+        """Upper bucket bound below which a fraction q of the observations fall"""
+        total = sum(buckets)
+        if not total:
+            return None
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), buckets):
+            cumulative += count
+            if cumulative >= q * total:
+                return bound
+        return "+Inf"
+
+class MetricsRegistry:
+    """Named counters and histograms shared by every pipeline stage"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            metric.registry = self
+            self._metrics[metric.name] = metric
+            return metric
+
+    def mirror(self, metric):
+        """This registry's metric of the same name as one from another registry, created empty if new"""
+        existing = self._metrics.get(metric.name)
+        return existing if existing is not None else self._register(metric.empty_copy())
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self) -> dict:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def summarize(self, before: dict, after: dict = None) -> dict:
+        """Per-metric, per-label totals recorded between two snapshots"""
+        after = self.snapshot() if after is None else after
+        summary = {}
+        for name, metric in self._metrics.items():
+            previous = before.get(name, {})
+            series = {}
+            for key, value in after.get(name, {}).items():
+                label = ",".join(key) or "all"
+                if metric.kind == "counter":
+                    delta = value - previous.get(key, 0)
+                    if delta:
+                        series[label] = delta
+                    continue
+                old = previous.get(key, {"buckets": [0] * len(value["buckets"]), "sum": 0.0, "count": 0})
+                count = value["count"] - old["count"]
+                if not count:
+                    continue
+                buckets = [new - prior for new, prior in zip(value["buckets"], old["buckets"])]
+                total = value["sum"] - old["sum"]
+                series[label] = {
+                    "count": count,
+                    "sum": round(total, 4),
+                    "mean": round(total / count, 4),
+                    "p50": metric.quantile(buckets, 0.5),
+                    "p95": metric.quantile(buckets, 0.95),
+                }
+            if series:
+                summary[name] = series
+        return summary
+
+# Shared by every stage in this process
+metrics = MetricsRegistry()
+
+extract_seconds = metrics.histogram(
+    "etl_extract_seconds", "Latency of OpenWeather requests that reached the network", ("endpoint",))
+extract_requests = metrics.counter(
+    "etl_extract_requests_total", "OpenWeather calls by endpoint and outcome (HTTP status, cache or error)",
+    ("endpoint", "outcome"))
+rate_limit_wait_seconds = metrics.histogram(
+    "etl_rate_limit_wait_seconds", "Time OpenWeather requests waited for the rate limiter", ("endpoint",))
+retries = metrics.counter("etl_retries_total", "Retried OpenWeather requests", ("endpoint",))
+transform_seconds = metrics.histogram(
+    "etl_transform_seconds", "Time to normalize one batch of payloads into a table frame", ("table",))
+load_seconds = metrics.histogram("etl_load_seconds", "Time to write one frame to its table", ("table",))
+load_rows_per_second = metrics.histogram(
+    "etl_load_rows_per_second", "Load throughput per frame", ("table",), THROUGHPUT_BUCKETS)
+rows_loaded = metrics.counter("etl_rows_loaded_total", "Rows written per table", ("table",))
+archive_seconds = metrics.histogram("etl_archive_seconds", "Time to write one frame to the Parquet archive", ("table",))
+rows_archived = metrics.counter("etl_rows_archived_total", "Rows written to the Parquet archive per table", ("table",))
+run_seconds = metrics.histogram("etl_run_seconds", "Wall-clock time of a pipeline run", ("job",),
+                                LATENCY_BUCKETS + (600.0, 1800.0, 3600.0))
+
+class JsonSummarySink:
+    """Write each run summary to a JSON file, replacing the previous one"""
+
+    def __init__(self, path: str = METRICS_SUMMARY_PATH):
+        self.path = path
+
+    def publish(self, summary: dict):
+        with open(self.path, "w") as f:
+            json.dump(summary, f, indent=2, default=str)
+
+class DatabaseSink:
+    """Store each run summary as a row in pipeline_runs"""
+
+    def __init__(self, connection_string: str):
+        self.connection_string = connection_string
+
+    def publish(self, summary: dict):
+        from db.engine import get_engine, ensure_schema
+        from db.models import PipelineRun
+
+        engine = get_engine(self.connection_string)
+        ensure_schema(engine)
+        with engine.begin() as conn:
+            conn.execute(PipelineRun.__table__.insert().values(
+                run_id=summary["run_id"],
+                job=summary["job"],
+                status=summary["status"],
+                started_at=summary["started_at"],
+                finished_at=summary["finished_at"],
+                duration_seconds=summary["duration_seconds"],
+                cities_succeeded=summary["cities_succeeded"],
+                cities_failed=summary["cities_failed"],
+                rows_loaded=sum(summary["row_counts"].values()),
+                error=summary["error"][:500] if summary["error"] else None,
+                summary=json.dumps(summary, default=str),
+            ))
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class PrometheusExporter:
+    """Serve the registry on /metrics from a background thread"""
+
+    def __init__(self, port: int = METRICS_PORT, registry: MetricsRegistry = metrics, host: str = "0.0.0.0"):
+        self.server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self.server.registry = registry
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, name="metrics-exporter", daemon=True)
+        self._thread.start()
+        logging.info("Serving Prometheus metrics on port %d", self.port)
+
+    def publish(self, summary: dict):
+        # Scrapes read the cumulative registry directly
+        pass
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+_exporter = None
+
+def build_sinks(connection_string: str, names: list = None, serve_metrics: bool = False) -> list:
+    """Sinks named in METRICS_SINKS.
+
+    The Prometheus exporter is started once per process, and only with
+    serve_metrics: a single run exits before anything could scrape it.
+    """
+    global _exporter
+    sinks = []
+    for name in names if names is not None else METRICS_SINKS:
+        if name == "prometheus":
+            if not serve_metrics:
+                continue
+            if _exporter is None:
+                try:
+                    _exporter = PrometheusExporter(METRICS_PORT)
+                except OSError as e:
+                    logging.warning("Could not start metrics exporter on port %d: %s", METRICS_PORT, e)
+                    continue
+            sinks.append(_exporter)
+        elif name == "json":
+            sinks.append(JsonSummarySink())
+        elif name == "database":
+            sinks.append(DatabaseSink(connection_string))
+        elif name:
+            logging.warning("Unknown metrics sink: %s", name)
+    return sinks
+
+class RunContextExecutor(ThreadPoolExecutor):
+    """Thread pool whose tasks run in a copy of the submitter's context, so they record into its run"""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+@contextmanager
+def track_run(job: str, sinks: list, registry: MetricsRegistry = metrics):
+    """Measure a pipeline run and publish its summary to every sink.
+
+    The caller fills the yielded dict with 'succeeded', 'failed' and
+    'row_counts', and sets 'error' when it handled a failure without raising
+    it, which marks the run failed all the same. Runs of other jobs may overlap: the summary only counts
+    what was recorded in this run's context, including threads started
+    with a copy of it.
+    """
+    run = {"succeeded": 0, "failed": 0, "row_counts": {}, "error": None}
+    recorded = MetricsRegistry()
+    scope = _run_scopes.set({**_run_scopes.get(), registry: recorded})
+    started_at = datetime.utcnow()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield run
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        error = error or run["error"]
+        run_seconds.observe(duration, job=job)
+        summary = {
+            "run_id": uuid.uuid4().hex,
+            "job": job,
+            "status": "failed" if error else "succeeded",
+            "started_at": started_at,
+            "finished_at": datetime.utcnow(),
+            "duration_seconds": round(duration, 3),
+            "cities_succeeded": run["succeeded"],
+            "cities_failed": run["failed"],
+            "row_counts": run["row_counts"],
+            "error": error,
+            "metrics": recorded.summarize({}),
+        }
+        _run_scopes.reset(scope)
+        for sink in sinks:
+            try:
+                sink.publish(summary)
+            except Exception as e:
+                logging.error("Failed to publish run metrics to %s: %s", type(sink).__name__, e)
+        logging.info("Run %s (%s) took %.1fs", summary["run_id"], job, duration)
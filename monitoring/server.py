@@ -0,0 +1,117 @@
+"""Embedded HTTP status endpoints for the long-running pipeline process.
+
+The server runs its own asyncio loop on a daemon thread and answers from
+state the pipeline already keeps in memory, so probes never query the
+database:
+
+    /healthz      liveness: the process answers and the scheduler is running
+    /readyz       readiness: the latest scheduled health check found the
+                  database reachable and the data not very stale
+    /metrics      the Prometheus text exposition of the metrics registry
+    /runs/latest  the latest run summary, overall and per job
+
+It is also a metrics sink, so each run's summary is cached here when
+track_run publishes it. In the scheduler process this /metrics takes the
+place of the separate metrics exporter, so every series is scraped once.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from functools import partial
+from aiohttp import web
+from config import STATUS_HOST, STATUS_PORT
+from monitoring.metrics import MetricsRegistry, metrics
+
+_dumps = partial(json.dumps, default=str)
+
+class StatusServer:
+    """Serve health, readiness, metrics and run summaries from a background event loop"""
+
+    def __init__(self, health_monitor=None, scheduler=None, registry: MetricsRegistry = metrics,
+                 host: str = STATUS_HOST, port: int = STATUS_PORT):
+        self.health_monitor = health_monitor
+        self.scheduler = scheduler
+        self.registry = registry
+        self.started = time.time()
+        self._runs = {}
+        self._latest_run = None
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._runner = None
+        self._error = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._serve, args=(host, port), name="status-server", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+        logging.info("Serving status endpoints on port %d", self.port)
+
+    def publish(self, summary: dict):
+        """Metrics sink: remember the latest summary of every job"""
+        with self._lock:
+            self._runs[summary["job"]] = summary
+            self._latest_run = summary
+
+    def close(self):
+        if self._runner is not None:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+
+    def _app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/healthz", self.healthz)
+        app.router.add_get("/readyz", self.readyz)
+        app.router.add_get("/metrics", self.metrics)
+        app.router.add_get("/runs/latest", self.latest_run)
+        return app
+
+    def _serve(self, host: str, port: int):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._runner = web.AppRunner(self._app(), access_log=None)
+            self._loop.run_until_complete(self._runner.setup())
+            site = web.TCPSite(self._runner, host, port)
+            self._loop.run_until_complete(site.start())
+            # Port 0 binds a free port; report the one actually used
+            self.port = self._runner.addresses[0][1]
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.close()
+
+    async def healthz(self, request):
+        running = self.scheduler is None or self.scheduler.running
+        body = {"status": "ok" if running else "stopping", "uptime_seconds": round(time.time() - self.started, 1)}
+        if self.scheduler is not None:
+            body["jobs"] = self.scheduler.stats()
+        return web.json_response(body, status=200 if running else 503, dumps=_dumps)
+
+    async def readyz(self, request):
+        check = self.health_monitor.last_check if self.health_monitor is not None else None
+        if check is None:
+            return web.json_response({"status": "starting"}, status=503, dumps=_dumps)
+        reasons = []
+        if check["database"]["status"] != "healthy":
+            reasons.append("database unreachable")
+        if check["data_freshness"]["status"] in ("very_stale", "error"):
+            reasons.append(f"data {check['data_freshness']['status']}")
+        body = {"status": "not_ready" if reasons else "ready", "reasons": reasons, "health": check}
+        return web.json_response(body, status=503 if reasons else 200, dumps=_dumps)
+
+    async def metrics(self, request):
+        return web.Response(body=self.registry.render_prometheus().encode(),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    async def latest_run(self, request):
+        with self._lock:
+            if self._latest_run is None:
+                return web.json_response({"error": "no run finished yet"}, status=404)
+            body = {"latest": self._latest_run, "jobs": dict(self._runs)}
+        return web.json_response(body, dumps=_dumps)
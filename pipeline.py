@@ -1,25 +1,28 @@
 import logging
-import schedule
-import time
-import os
-import pandas as pd
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from etl.extract import get_weather
-from etl.air_quality import get_air_quality, get_weather_forecast
-from etl.transform import normalize_weather, normalize_air_quality, normalize_forecast
-from etl.load import load_to_sql, load_air_quality_to_sql, load_forecast_to_sql
+import signal
+import sys
+import threading
+from datetime import datetime
+from functools import partial
+from etl.extract import iter_city_results, iter_dataset_results
+from etl.transform import normalize_results
+from etl.load import load_batch
+from etl.streaming import StreamingPipeline
 from etl.data_quality import DataQualityChecker
+from etl.registry import CityRegistry
+from etl.scheduler import Scheduler
+from etl.rollups import refresh_rollups
+from etl.archive import compact
 from monitoring.alerts import AlertSystem
 from monitoring.health import HealthMonitor
+from monitoring.metrics import build_sinks, track_run
+from monitoring.server import StatusServer
 from db.init_db import init_database
-from dotenv import load_dotenv
-
-load_dotenv()
-
-DB_SERVER = os.getenv("DB_SERVER")
-DB_NAME = os.getenv("DB_DATABASE") 
-DB_USER = os.getenv("DB_USERNAME")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
+from db.engine import get_engine
+from db.partitioning import maintain_partitions
+from config import (get_connection_string, EXTRACT_MODE, PIPELINE_MODE, PARTITIONING_ENABLED, ARCHIVE_ENABLED,
+                    DATA_RETENTION_DAYS, WEATHER_INTERVAL, AIR_QUALITY_INTERVAL, FORECAST_INTERVAL,
+                    HEALTH_CHECK_INTERVAL)
 
 # Configure logging
 logging.basicConfig(
@@ -28,171 +31,250 @@ logging.basicConfig(
     handlers=[logging.FileHandler("etl.log"), logging.StreamHandler()]
 )
 
-# List of major cities per province in the Netherlands
-NL_CITIES = [
-    "Amsterdam",    # Noord-Holland
-    "Haarlem",      # Noord-Holland
-    "Rotterdam",    # Zuid-Holland
-    "The Hague",    # Zuid-Holland
-    "Utrecht",      # Utrecht
-    "Eindhoven",    # Noord-Brabant
-    "Den Bosch",    # Noord-Brabant
-    "Maastricht",   # Limburg
-    "Groningen",    # Groningen
-    "Leeuwarden",   # Friesland
-    "Assen",        # Drenthe
-    "Zwolle",       # Overijssel
-    "Arnhem",       # Gelderland
-    "Nijmegen",     # Gelderland
-    "Middelburg",   # Zeeland
-    "Lelystad"      # Flevoland
-]
+def report_failure(result: dict, alert_system: AlertSystem):
+    """Alert on a city whose extraction failed"""
+    alert_system.send_pipeline_failure_alert(f"Failed to process {result['city']}: {result['error']}")
+
+def handle_batch(results: list, frames: dict, alert_system: AlertSystem, registry: CityRegistry):
+    """Per-batch side effects: extreme weather alerts and learning OpenWeather ids"""
+    weather_df = frames.get('weather_data')
+    if weather_df is not None:
+        for result, temp, condition in zip(results, weather_df['temperature'], weather_df['weather']):
+            alert_system.send_weather_alert(result['city'], temp, condition)
+    
+    for result in results:
+        logging.info("Successfully processed data for %s", result['city'])
+    
+    # Remember OpenWeather ids so later runs can use the group endpoint
+    try:
+        registry.learn([(result['city'], result['weather']) for result in results])
+    except Exception as e:
+        logging.warning("Failed to update city registry: %s", e)
 
-def process_city_data(city: str, connection: str):
-    """Process weather, air quality, and forecast data for a single city"""
+def update_rollups(connection: str, since: datetime):
+    """Refresh the dashboard rollups for readings loaded since `since`"""
     try:
-        logging.info("Processing data for city: %s", city)
-        
-        # Get weather data
-        weather_data = get_weather(city)
-        weather_df = normalize_weather(weather_data)
-        
-        # Get coordinates for air quality
-        lat = weather_df['coordinates_lat'].iloc[0]
-        lon = weather_df['coordinates_lon'].iloc[0]
-        
-        # Get air quality data
-        air_quality_data = get_air_quality(lat, lon)
-        air_quality_df = normalize_air_quality(air_quality_data, city) if air_quality_data else None
-        
-        # Get forecast data
-        forecast_data = get_weather_forecast(city)
-        forecast_df = normalize_forecast(forecast_data) if forecast_data else None
-        
-        return {
-            'city': city,
-            'weather_df': weather_df,
-            'air_quality_df': air_quality_df,
-            'forecast_df': forecast_df,
-            'success': True
-        }
+        refresh_rollups(connection, since)
     except Exception as e:
-        logging.error("Failed to process data for %s: %s", city, e)
-        return {
-            'city': city,
-            'error': str(e),
-            'success': False
-        }
+        logging.error("Failed to refresh rollups: %s", e)
 
-def run_etl():
-    """Run the complete ETL process"""
-    connection = f"mssql+pyodbc://{DB_USER}:{DB_PASSWORD}@{DB_SERVER}/{DB_NAME}?driver=ODBC+Driver+17+for+SQL+Server"
+def run_etl(connection: str = None, cities: list = None) -> dict:
+    """Run the complete ETL process and return its outcome.
+
+    connection defaults to the configured SQL Server database and cities to the
+    city registry; benchmarks pass SQLite and synthetic cities.
+    """
+    connection = connection or get_connection_string()
     
     # Initialize database tables first
     if not init_database(connection):
         logging.error("Failed to initialize database. Aborting ETL run.")
-        return
-    
-    # Initialize monitoring systems
-    alert_system = AlertSystem()
-    health_monitor = HealthMonitor(connection)
-    quality_checker = DataQualityChecker(connection)
-    
-    # Perform health check
-    health_status = health_monitor.log_health_check()
-    
-    all_weather_dfs = []
-    all_air_quality_dfs = []
-    all_forecast_dfs = []
-    failed_cities = []
+        return None
     
-    # Process cities in parallel for better performance
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_city = {executor.submit(process_city_data, city, connection): city for city in NL_CITIES}
+    with track_run('full', build_sinks(connection)) as run:
+        started_at = datetime.utcnow()
         
-        for future in as_completed(future_to_city):
-            result = future.result()
-            
-            if result['success']:
-                all_weather_dfs.append(result['weather_df'])
-                
-                if result['air_quality_df'] is not None and not result['air_quality_df'].empty:
-                    all_air_quality_dfs.append(result['air_quality_df'])
-                
-                if result['forecast_df'] is not None and not result['forecast_df'].empty:
-                    all_forecast_dfs.append(result['forecast_df'])
-                
-                # Check for weather alerts
-                weather_df = result['weather_df']
-                temp = weather_df['temperature'].iloc[0]
-                condition = weather_df['weather'].iloc[0]
-                alert_system.send_weather_alert(result['city'], temp, condition)
-                
-                logging.info("Successfully processed data for %s", result['city'])
-            else:
-                failed_cities.append(result['city'])
-                alert_system.send_pipeline_failure_alert(f"Failed to process {result['city']}: {result['error']}")
-    
-    # Data quality checks and loading
-    data_quality_issues = []
-    
-    if all_weather_dfs:
-        weather_result_df = pd.concat(all_weather_dfs, ignore_index=True)
+        # Initialize monitoring systems
+        alert_system = AlertSystem()
+        health_monitor = HealthMonitor(connection)
+        quality_checker = DataQualityChecker(connection)
+        
+        # Health check runs alongside the ETL instead of delaying it
+        health_check = threading.Thread(target=health_monitor.log_health_check, name="health-check", daemon=True)
+        health_check.start()
         
-        # Run data quality checks
-        if not quality_checker.check_missing_data(weather_result_df, 'weather_data'):
-            data_quality_issues.append("Missing weather data detected")
+        # Cities, provinces and coordinates come from the persistent registry
+        registry = CityRegistry(connection)
+        if cities is None:
+            cities = registry.cities
+        provinces = {city['name']: city['province'] for city in cities}
         
-        if not quality_checker.check_temperature_outliers(weather_result_df, 'weather_data'):
-            data_quality_issues.append("Temperature outliers detected")
+        if PIPELINE_MODE == "streaming":
+            # Extract, transform and load overlap as stages with bounded queues
+            stream = StreamingPipeline(
+                connection, quality_checker, provinces,
+                on_batch=partial(handle_batch, alert_system=alert_system, registry=registry),
+                on_failure=partial(report_failure, alert_system=alert_system)
+            )
+            try:
+                stats = stream.run(iter_city_results(cities))
+            except Exception as e:
+                logging.error("Streaming ETL run aborted: %s", e)
+                alert_system.send_pipeline_failure_alert(f"Streaming ETL run aborted: {e}")
+                stats = stream.stats
+            succeeded = stats['succeeded']
+            failed_cities = stats['failed']
+            data_quality_issues = stats['quality_issues']
+            for error in stats['load_errors']:
+                alert_system.send_pipeline_failure_alert(f"Data loading failed: {error}")
+            run['row_counts'] = stats['row_counts']
+            logging.info("Data loaded successfully in %d micro-batches: %s", stats['batches'], stats['row_counts'])
+        else:
+            results = []
+            failed_cities = []
+            for result in iter_city_results(cities):
+                if result['success']:
+                    results.append(result)
+                else:
+                    failed_cities.append(result['city'])
+                    report_failure(result, alert_system)
+            succeeded = [result['city'] for result in results]
         
-        if not quality_checker.check_duplicates(weather_result_df, 'weather_data'):
-            data_quality_issues.append("Duplicate weather records detected")
+            # Normalize every city's payloads in one columnar pass per table
+            try:
+                frames = normalize_results(results, provinces)
+            except Exception as e:
+                logging.error("Failed to transform data: %s", e)
+                alert_system.send_pipeline_failure_alert(f"Data transformation failed: {e}")
+                run['error'] = f"Data transformation failed: {e}"
+                frames = {}
+            handle_batch(results, frames, alert_system, registry)
         
+            # Run the declared quality rules over every frame in one pass
+            quality_report = quality_checker.validate_frames(frames)
+            data_quality_issues = quality_report.issues
+        
+            # Load weather, air quality and forecast data in a single transaction
+            if frames:
+                try:
+                    run['row_counts'] = load_batch(frames, connection)
+                    logging.info("Data loaded successfully for %d cities: %s", len(results), run['row_counts'])
+                except Exception as e:
+                    logging.error("Failed to load data: %s", e)
+                    alert_system.send_pipeline_failure_alert(f"Data loading failed: {e}")
+                    run['error'] = f"Data loading failed: {e}"
+                    quality_checker.discard_baselines()
+        
+        # Fold the new readings into the hourly and daily dashboard rollups
+        update_rollups(connection, started_at)
+        
+        # Roll monthly partitions forward and drop expired ones
+        if PARTITIONING_ENABLED:
+            try:
+                maintain_partitions(get_engine(connection), DATA_RETENTION_DAYS)
+            except Exception as e:
+                logging.error("Partition maintenance failed: %s", e)
+        
+        # Send data quality alerts if issues found
+        if data_quality_issues:
+            alert_system.send_data_quality_alert(data_quality_issues)
+        
+        # Write all quality results in one bulk insert
         try:
-            load_to_sql(weather_result_df, connection, "weather_data")
-            logging.info("Weather data loaded successfully for %d cities", len(all_weather_dfs))
+            quality_checker.close()
         except Exception as e:
-            logging.error("Failed to load weather data: %s", e)
-            alert_system.send_pipeline_failure_alert(f"Weather data loading failed: {e}")
-    
-    # Load air quality data
-    if all_air_quality_dfs:
-        air_quality_result_df = pd.concat(all_air_quality_dfs, ignore_index=True)
+            logging.error("Failed to record data quality results: %s", e)
+        
+        run['succeeded'] = len(succeeded)
+        run['failed'] = len(failed_cities)
+        logging.info("ETL process completed. Success: %d cities, Failed: %d cities", 
+                    len(succeeded), len(failed_cities))
+        
+        if failed_cities:
+            logging.warning("Failed cities: %s", ", ".join(failed_cities))
+        
+        # One digest email for everything this run raised, sent in the background
+        alert_system.flush()
+        health_check.join()
+    return run
+
+def run_dataset(dataset: str, connection: str, alert_system: AlertSystem, sinks: list = ()):
+    """Extract, validate and load a single dataset for every registry city"""
+    with track_run(dataset, sinks) as run:
+        started_at = datetime.utcnow()
+        registry = CityRegistry(connection)
+        quality_checker = DataQualityChecker(connection)
+        
+        results = []
+        failed_cities = []
+        for result in iter_dataset_results(registry.cities, dataset):
+            if result['success']:
+                results.append(result)
+            else:
+                failed_cities.append(result['city'])
+                report_failure(result, alert_system)
+        
         try:
-            load_air_quality_to_sql(air_quality_result_df, connection)
-            logging.info("Air quality data loaded successfully")
+            frames = normalize_results(results, registry.provinces)
         except Exception as e:
-            logging.error("Failed to load air quality data: %s", e)
-    
-    # Load forecast data
-    if all_forecast_dfs:
-        forecast_result_df = pd.concat(all_forecast_dfs, ignore_index=True)
+            logging.error("Failed to transform %s data: %s", dataset, e)
+            alert_system.send_pipeline_failure_alert(f"Transforming {dataset} data failed: {e}")
+            run['error'] = f"Transforming {dataset} data failed: {e}"
+            frames = {}
+        if dataset == 'weather':
+            handle_batch(results, frames, alert_system, registry)
+        
+        quality_report = quality_checker.validate_frames(frames)
+        if frames:
+            try:
+                run['row_counts'] = load_batch(frames, connection)
+                logging.info("Loaded %s for %d cities: %s", dataset, len(results), run['row_counts'])
+            except Exception as e:
+                logging.error("Failed to load %s data: %s", dataset, e)
+                alert_system.send_pipeline_failure_alert(f"Loading {dataset} data failed: {e}")
+                run['error'] = f"Loading {dataset} data failed: {e}"
+                quality_checker.discard_baselines()
+        if dataset in ('weather', 'air_quality'):
+            update_rollups(connection, started_at)
+        
+        if quality_report.issues:
+            alert_system.send_data_quality_alert(quality_report.issues)
         try:
-            load_forecast_to_sql(forecast_result_df, connection)
-            logging.info("Forecast data loaded successfully")
+            quality_checker.close()
         except Exception as e:
-            logging.error("Failed to load forecast data: %s", e)
-    
-    # Send data quality alerts if issues found
-    if data_quality_issues:
-        alert_system.send_data_quality_alert(data_quality_issues)
-    
-    # Close quality checker session
-    quality_checker.close()
-    
-    logging.info("ETL process completed. Success: %d cities, Failed: %d cities", 
-                len(all_weather_dfs), len(failed_cities))
-    
-    if failed_cities:
-        logging.warning("Failed cities: %s", ", ".join(failed_cities))
+            logging.error("Failed to record data quality results: %s", e)
+        
+        alert_system.flush()
+        run['succeeded'] = len(results)
+        run['failed'] = len(failed_cities)
+        logging.info("%s job completed. Success: %d cities, Failed: %d cities",
+                     dataset, len(results), len(failed_cities))
+    return len(results), failed_cities
 
-# Schedule the ETL job to run every day at 7:00 AM
-schedule.every().day.at("07:00").do(run_etl)
+def build_scheduler(connection: str, health_monitor: HealthMonitor = None, status_server: StatusServer = None) -> Scheduler:
+    """One job per dataset at its own cadence, plus health checks and storage maintenance"""
+    alert_system = AlertSystem()
+    health_monitor = health_monitor or HealthMonitor(connection)
+    # The status server serves /metrics itself; a second exporter would expose every series twice
+    sinks = build_sinks(connection, serve_metrics=status_server is None)
+    if status_server is not None:
+        sinks.append(status_server)
+    scheduler = Scheduler()
+    
+    intervals = {'weather': WEATHER_INTERVAL, 'air_quality': AIR_QUALITY_INTERVAL, 'forecast': FORECAST_INTERVAL}
+    for dataset, interval in intervals.items():
+        scheduler.add_job(dataset, partial(run_dataset, dataset, connection, alert_system, sinks), interval)
+    scheduler.add_job('health_check', health_monitor.log_health_check, HEALTH_CHECK_INTERVAL, jitter=0)
+    if PARTITIONING_ENABLED:
+        scheduler.add_job('partition_maintenance',
+                          lambda: maintain_partitions(get_engine(connection), DATA_RETENTION_DAYS),
+                          24 * 3600, jitter=0, catch_up='once')
+    if ARCHIVE_ENABLED:
+        scheduler.add_job('archive_compaction', compact, 24 * 3600, jitter=0, catch_up='once')
+    return scheduler
 
 if __name__ == "__main__":
-    run_etl()  # Run once immediately for testing
-    logging.info("Scheduler started. Waiting for next run...")
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
+    if "--once" in sys.argv:
+        # A single full run of every dataset
+        run_etl()
+        sys.exit(0)
+    
+    connection = get_connection_string()
+    if not init_database(connection):
+        logging.error("Failed to initialize database. Scheduler not started.")
+        sys.exit(1)
+    
+    # The status server answers from the health monitor's last check and the published
+    # run summaries, so probes never reach the database
+    health_monitor = HealthMonitor(connection)
+    status_server = StatusServer(health_monitor)
+    scheduler = build_scheduler(connection, health_monitor, status_server)
+    status_server.scheduler = scheduler
+    signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
+    logging.info("Scheduler started with jobs: %s", ", ".join(job.name for job in scheduler.jobs))
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        logging.info("Scheduler stopped")
+    finally:
+        status_server.close()
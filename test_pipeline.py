@@ -1,5 +1,4 @@
 import logging
-import os
 import pandas as pd
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from etl.extract import get_weather
@@ -10,14 +9,7 @@ from etl.data_quality import DataQualityChecker
 from monitoring.alerts import AlertSystem
 from monitoring.health import HealthMonitor
 from db.init_db import init_database
-from dotenv import load_dotenv
-
-load_dotenv()
-
-DB_SERVER = os.getenv("DB_SERVER")
-DB_NAME = os.getenv("DB_DATABASE") 
-DB_USER = os.getenv("DB_USERNAME")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
+from config import get_connection_string
 
 # Configure logging
 logging.basicConfig(
@@ -67,7 +59,7 @@ def process_city_data(city: str, connection: str):
 
 def run_test_etl():
     """Run a test ETL process with just a few cities"""
-    connection = f"mssql+pyodbc://{DB_USER}:{DB_PASSWORD}@{DB_SERVER}/{DB_NAME}?driver=ODBC+Driver+17+for+SQL+Server"
+    connection = get_connection_string()
     
     # Initialize database tables first
     if not init_database(connection):
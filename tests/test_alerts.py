@@ -0,0 +1,155 @@
+import email
+import email.policy
+import smtplib
+import socket
+import threading
+import unittest
+from unittest import mock
+from monitoring.alerts import AlertDispatcher, AlertSystem, SMTPSender
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+class RecordingHandler:
+    """Keeps every received message and counts SMTP sessions"""
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(email.message_from_bytes(envelope.content, policy=email.policy.default))
+        return '250 Message accepted for delivery'
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@unittest.skipIf(Controller is None, "aiosmtpd is not installed")
+class TestAlertDispatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.handler = RecordingHandler()
+        self.controller = Controller(self.handler, hostname='127.0.0.1', port=free_port())
+        self.controller.start()
+        self.addCleanup(self.controller.stop)
+
+    def dispatcher(self, **options):
+        sender = SMTPSender('127.0.0.1', self.controller.port, user='etl@example.com', password=None,
+                            recipients=['ops@example.com'], starttls=False)
+        dispatcher = AlertDispatcher(sender, digest_seconds=60, **options)
+        self.addCleanup(dispatcher.close)
+        return dispatcher
+
+    def test_run_alerts_arrive_as_one_digest(self):
+        """Test that a run's alerts are sent together and repeats are collapsed"""
+        alerts = AlertSystem(self.dispatcher())
+        alerts.send_weather_alert('Maastricht', 36.5, 'clear sky')
+        alerts.send_weather_alert('Maastricht', 36.5, 'clear sky')
+        alerts.send_weather_alert('Venlo', 36.1, 'clear sky')
+        alerts.send_weather_alert('Utrecht', 20.0, 'clear sky')  # not extreme
+        alerts.send_pipeline_failure_alert('Failed to process Atlantis: 404')
+
+        self.assertTrue(alerts.flush(wait=True))
+
+        self.assertEqual(len(self.handler.messages), 1)
+        message = self.handler.messages[0]
+        self.assertEqual(message['Subject'], '🔔 Weather ETL Pipeline: 3 alerts')
+        body = message.get_body(('plain',)).get_content()
+        self.assertIn('Extreme Weather Alert - Maastricht (repeated 2 times)', body)
+        self.assertIn('Venlo', body)
+        self.assertIn('Failed to process Atlantis: 404', body)
+
+    def test_connection_is_reused_between_digests(self):
+        """Test that later digests go over the same SMTP session"""
+        dispatcher = self.dispatcher()
+        for city in ['Maastricht', 'Venlo', 'Roermond']:
+            AlertSystem(dispatcher).send_weather_alert(city, 40.0, 'clear sky')
+            dispatcher.flush(wait=True)
+
+        self.assertEqual(len(self.handler.messages), 3)
+        self.assertEqual(self.handler.messages[0]['Subject'], '🌡️ Extreme Weather Alert - Maastricht')
+        self.assertEqual(self.handler.sessions, 1)
+
+    def test_cooldown_and_hourly_limit(self):
+        """Test that a sent alert is not repeated and excess alerts wait for the next digest"""
+        dispatcher = self.dispatcher(cooldown=3600, max_per_hour=1)
+        alerts = AlertSystem(dispatcher)
+        alerts.send_pipeline_failure_alert('Data loading failed: timeout')
+        alerts.flush(wait=True)
+        alerts.send_pipeline_failure_alert('Data loading failed: timeout')
+        alerts.send_pipeline_failure_alert('Data loading failed: deadlock')
+        alerts.flush(wait=True)
+
+        self.assertEqual(len(self.handler.messages), 1)
+        self.assertEqual(dispatcher.stats()['suppressed'], 1)
+        self.assertEqual(dispatcher.stats()['pending'], 1)
+
+        # Shutting down delivers what is held back
+        dispatcher.close()
+        self.assertEqual(len(self.handler.messages), 2)
+        self.assertIn('deadlock', self.handler.messages[1].get_body(('plain',)).get_content())
+
+    def test_digest_is_kept_when_sending_fails(self):
+        """Test that alerts of a digest the server refused go out with the next one"""
+        dispatcher = self.dispatcher()
+        alerts = AlertSystem(dispatcher)
+        alerts.send_weather_alert('Maastricht', 36.5, 'clear sky')
+        with mock.patch.object(dispatcher.sender, 'send', side_effect=smtplib.SMTPDataError(451, 'try again')):
+            alerts.flush(wait=True)
+        self.assertEqual(dispatcher.stats()['failures'], 1)
+        self.assertEqual(dispatcher.stats()['pending'], 1)
+
+        alerts.send_weather_alert('Venlo', 36.1, 'clear sky')
+        alerts.flush(wait=True)
+
+        self.assertEqual(len(self.handler.messages), 1)
+        self.assertEqual(self.handler.messages[0]['Subject'], '🔔 Weather ETL Pipeline: 2 alerts')
+
+    def test_flush_does_not_block_on_a_full_queue(self):
+        """Test that a flush request is dropped and counted rather than waiting for queue space"""
+        dispatcher = self.dispatcher(queue_size=2)
+        sending = threading.Event()
+        release = threading.Event()
+
+        def slow_send(subject, message):
+            sending.set()
+            release.wait(5)
+
+        with mock.patch.object(dispatcher.sender, 'send', side_effect=slow_send):
+            dispatcher.submit('a', 'first', 'message')
+            dispatcher.flush()
+            self.assertTrue(sending.wait(5))
+            dispatcher.submit('b', 'second', 'message')
+            dispatcher.submit('c', 'third', 'message')
+            self.assertFalse(dispatcher.flush())
+            release.set()
+
+        self.assertEqual(dispatcher.stats()['dropped_flushes'], 1)
+
+    def test_data_quality_alerts_are_keyed_on_the_check(self):
+        """Test that a check failing again with other row counts stays within its cooldown"""
+        dispatcher = self.dispatcher(cooldown=3600)
+        alerts = AlertSystem(dispatcher)
+        alerts.send_data_quality_alert(['weather_data statistical_anomaly (warning): 1 of 16 rows'])
+        alerts.flush(wait=True)
+        alerts.send_data_quality_alert(['weather_data statistical_anomaly (warning): 3 of 16 rows',
+                                        'air_quality aqi_range (warning): 2 of 16 rows'])
+        alerts.flush(wait=True)
+
+        self.assertEqual(dispatcher.stats()['suppressed'], 1)
+        self.assertEqual([message['Subject'] for message in self.handler.messages],
+                         ['⚠️ Data Quality Issues Detected - weather_data statistical_anomaly',
+                          '⚠️ Data Quality Issues Detected - air_quality aqi_range'])
+        self.assertIn('2 of 16 rows', self.handler.messages[1].get_body(('plain',)).get_content())
+
+if __name__ == '__main__':
+    unittest.main()
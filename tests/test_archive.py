@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from db.engine import get_engine
+from etl.archive import compact, iter_archive, read_archive, write_batch
+from etl.load import load_batch
+
+def readings(cities, timestamps, temperatures):
+    return pd.DataFrame({'city': cities, 'province': 'Noord-Holland', 'timestamp': timestamps,
+                         'temperature': temperatures, 'humidity': 70, 'weather': 'light rain'})
+
+class TestParquetArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmpdir.name, 'archive')
+        self.connection_string = f"sqlite:///{os.path.join(self.tmpdir.name, 'weather.db')}"
+        self.day = datetime(2026, 10, 16, 9, 0)
+
+    def tearDown(self):
+        get_engine(self.connection_string).dispose()
+        self.tmpdir.cleanup()
+
+    def files(self, table_name='weather_data'):
+        return sorted(os.path.relpath(os.path.join(directory, name), os.path.join(self.root, table_name))
+                      for directory, _, names in os.walk(os.path.join(self.root, table_name)) for name in names)
+
+    def test_batches_are_partitioned_by_date_and_city_in_compact_types(self):
+        """Test that each batch writes one file per date and city with float32 and dictionary columns"""
+        write_batch({'weather_data': readings(['Amsterdam', 'Den Haag', 'Amsterdam'],
+                                              [self.day, self.day, self.day + timedelta(days=1)],
+                                              [12.5, 13.0, 11.0])}, self.root)
+
+        files = self.files()
+        self.assertEqual([os.path.dirname(path) for path in files],
+                         ['date=2026-10-16/city=Amsterdam', 'date=2026-10-16/city=Den%20Haag',
+                          'date=2026-10-17/city=Amsterdam'])
+        schema = pq.read_schema(os.path.join(self.root, 'weather_data', files[0]))
+        self.assertNotIn('city', schema.names)
+        self.assertEqual(schema.field('temperature').type, pa.float32())
+        self.assertEqual(schema.field('weather').type, pa.dictionary(pa.int32(), pa.string()))
+        self.assertEqual(set(read_archive('weather_data', root=self.root)['city']), {'Amsterdam', 'Den Haag'})
+
+    def test_reader_filters_on_time_and_city(self):
+        """Test that reads return only rows inside the range and cities asked for"""
+        timestamps = [self.day + timedelta(hours=12 * i) for i in range(6)]
+        write_batch({'weather_data': readings(['Amsterdam', 'Haarlem'] * 3, timestamps,
+                                              [10.0, 11.0, 12.0, 13.0, 14.0, 15.0])}, self.root)
+
+        df = read_archive('weather_data', start=timestamps[1], end=timestamps[5], cities=['Haarlem'],
+                          root=self.root)
+        self.assertEqual(list(df['temperature']), [11.0, 13.0])
+        self.assertIsInstance(df['city'].dtype, pd.CategoricalDtype)
+
+        batches = list(iter_archive('weather_data', start=self.day + timedelta(days=1), columns=['temperature'],
+                                    root=self.root, batch_size=1))
+        self.assertEqual(sorted(value for batch in batches for value in batch['temperature']), [12.0, 13.0, 14.0, 15.0])
+        self.assertTrue(read_archive('air_quality', root=self.root).empty)
+
+    def test_compaction_merges_files_and_drops_reloaded_rows(self):
+        """Test that a partition's files become one file holding the latest version of each row"""
+        for temperature in (10.0, 10.5):
+            write_batch({'weather_data': readings(['Amsterdam'], [self.day], [temperature])}, self.root)
+        write_batch({'weather_data': readings(['Amsterdam'], [self.day - timedelta(hours=1)], [9.0])}, self.root)
+        self.assertEqual(len(self.files()), 3)
+
+        stats = compact(self.root, ['weather_data'])
+
+        self.assertEqual(stats['weather_data'], {'partitions': 1, 'files_merged': 3, 'rows_dropped': 1})
+        self.assertEqual(len(self.files()), 1)
+        df = read_archive('weather_data', root=self.root)
+        self.assertEqual(list(df['temperature']), [9.0, 10.5])
+        self.assertEqual(compact(self.root, ['weather_data'])['weather_data']['partitions'], 0)
+
+    def test_load_batch_archives_after_commit(self):
+        """Test that load_batch writes the batch to the archive as well as the database"""
+        forecast = pd.DataFrame({'city': ['Utrecht'], 'forecast_date': [self.day], 'temperature': [14.0],
+                                 'humidity': [80], 'weather': ['overcast clouds'], 'created_at': [self.day]})
+
+        load_batch({'weather_data': readings(['Utrecht'], [self.day], [14.5]), 'weather_forecast': forecast},
+                   self.connection_string, archive_path=self.root)
+
+        self.assertEqual(list(read_archive('weather_data', root=self.root)['temperature']), [14.5])
+        self.assertEqual(self.files('weather_forecast')[0].split(os.sep)[:2], ['date=2026-10-16', 'city=Utrecht'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+from aiohttp import web
+from etl.async_extract import AsyncWeatherClient, extract_cities_async, iter_cities_async
+from etl.rate_limit import RateLimiter
+
+RESPONSE_DELAY = 0.2
+
+async def weather_handler(request):
+    await asyncio.sleep(RESPONSE_DELAY)
+    city = request.query['q']
+    if city == 'Atlantis':
+        return web.json_response({'message': 'city not found'}, status=404)
+    return web.json_response({
+        'name': city,
+        'main': {'temp': 18.0, 'humidity': 70},
+        'weather': [{'description': 'clear sky'}],
+        'coord': {'lat': 52.0, 'lon': 5.0}
+    })
+
+async def air_pollution_handler(request):
+    await asyncio.sleep(RESPONSE_DELAY)
+    return web.json_response({
+        'coord': {'lat': float(request.query['lat']), 'lon': float(request.query['lon'])},
+        'list': [{'main': {'aqi': 2}, 'components': {}}]
+    })
+
+async def forecast_handler(request):
+    await asyncio.sleep(RESPONSE_DELAY)
+    return web.json_response({'city': {'name': request.query['q']}, 'list': []})
+
+# Group requests seen by the stub, reset for every test
+group_requests = []
+
+async def group_handler(request):
+    await asyncio.sleep(RESPONSE_DELAY)
+    group_requests.append(request.query['id'])
+    ids = [int(city_id) for city_id in request.query['id'].split(',')]
+    return web.json_response({'cnt': len(ids), 'list': [{
+        'id': city_id,
+        'name': f"City {city_id}",
+        'main': {'temp': 18.0, 'humidity': 70},
+        'weather': [{'description': 'clear sky'}],
+        'coord': {'lat': 52.0, 'lon': 5.0}
+    } for city_id in ids]})
+
+class TestAsyncExtraction(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        """Start a local stand-in for the OpenWeather endpoints"""
+        app = web.Application()
+        app.router.add_get('/weather', weather_handler)
+        app.router.add_get('/air_pollution', air_pollution_handler)
+        app.router.add_get('/forecast', forecast_handler)
+        app.router.add_get('/group', group_handler)
+        group_requests.clear()
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.limiter = RateLimiter(100000, 1000, period=1.0, burst=1000)
+
+    async def asyncTearDown(self):
+        await self.runner.cleanup()
+
+    async def test_fetch_city_returns_all_payloads(self):
+        """Test that one city yields weather, air quality and forecast payloads"""
+        async with AsyncWeatherClient(api_key='test', base_url=self.base_url, limiter=self.limiter) as client:
+            result = await client.fetch_city('Amsterdam')
+
+        self.assertTrue(result['success'])
+        self.assertEqual(result['weather']['name'], 'Amsterdam')
+        self.assertEqual(result['air_quality']['list'][0]['main']['aqi'], 2)
+        self.assertEqual(result['forecast']['city']['name'], 'Amsterdam')
+
+    async def test_failed_weather_marks_city_failed(self):
+        """Test that a failed weather request marks only that city as failed"""
+        results = await extract_cities_async(['Atlantis', 'Utrecht'], api_key='test', base_url=self.base_url, limiter=self.limiter)
+
+        self.assertEqual({r['city']: r['success'] for r in results}, {'Atlantis': False, 'Utrecht': True})
+
+    async def test_wall_clock_independent_of_city_count(self):
+        """Test that many cities finish in roughly the time of the slowest request chain"""
+        cities = [f"City {i}" for i in range(50)]
+        # IsolatedAsyncioTestCase runs in asyncio debug mode, whose per-callback
+        # bookkeeping would be timed along with the requests
+        asyncio.get_running_loop().set_debug(False)
+
+        start = time.perf_counter()
+        results = await extract_cities_async(cities, api_key='test', base_url=self.base_url,
+                                             concurrency=200, limiter=self.limiter)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(sum(r['success'] for r in results), 50)
+        # Weather and forecast overlap, air quality follows weather: two round trips
+        self.assertLess(elapsed, RESPONSE_DELAY * 2 * 3)
+
+    async def test_registry_cities_use_group_weather(self):
+        """Test that cities with a known id get current weather from one group request"""
+        cities = [{'name': f"City {i}", 'lat': 52.0, 'lon': 5.0, 'owm_id': i} for i in range(1, 21)]
+
+        results = await extract_cities_async(cities, api_key='test', base_url=self.base_url, limiter=self.limiter)
+
+        self.assertEqual(len(group_requests), 1)
+        self.assertEqual(sorted(r['weather']['id'] for r in results), list(range(1, 21)))
+
+    async def test_cities_stream_one_window_at_a_time(self):
+        """Test that results are yielded per window and the next window starts only when asked for"""
+        cities = [f"City {i}" for i in range(6)]
+        started = []
+        client_fetch_city = AsyncWeatherClient.fetch_city
+
+        async def fetch_city(client, city, weather_data=None):
+            started.append(city)
+            return await client_fetch_city(client, city, weather_data)
+
+        with mock.patch.object(AsyncWeatherClient, 'fetch_city', fetch_city):
+            results = iter_cities_async(cities, 2, api_key='test', base_url=self.base_url, limiter=self.limiter)
+            first = await results.__anext__()
+            self.assertEqual(len(started), 2)
+            self.assertIn(first['city'], cities[:2])
+            rest = [result async for result in results]
+
+        self.assertEqual(len(started), 6)
+        self.assertEqual(sorted(r['city'] for r in [first] + rest), cities)
+
+    async def test_stopping_early_cancels_the_window(self):
+        """Test that the rest of the window is cancelled, not left pending, when the consumer stops"""
+        def client_tasks():
+            return {task for task in asyncio.all_tasks()
+                    if task.get_coro().__qualname__.startswith('AsyncWeatherClient.')}
+
+        results = iter_cities_async([f"City {i}" for i in range(6)], api_key='test',
+                                    base_url=self.base_url, limiter=self.limiter)
+        await results.__anext__()
+        self.assertTrue(client_tasks())
+        await results.aclose()
+
+        self.assertEqual(client_tasks(), set())
+
+if __name__ == '__main__':
+    unittest.main()
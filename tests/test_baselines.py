@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from db.engine import get_engine
+from etl.baselines import BaselineStore, combine, summarize
+from etl.data_quality import DataQualityChecker
+
+class TestBaselines(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.connection_string = f"sqlite:///{os.path.join(self.tmpdir.name, 'weather.db')}"
+        self.start = datetime(2025, 7, 1)
+
+    def tearDown(self):
+        get_engine(self.connection_string).dispose()
+        self.tmpdir.cleanup()
+
+    def _weather(self, temperatures, city='Amsterdam', offset=0):
+        return pd.DataFrame({
+            'city': city,
+            'temperature': temperatures,
+            'humidity': 70,
+            'pressure': 1013.0,
+            'timestamp': [self.start + timedelta(hours=offset + i) for i in range(len(temperatures))]
+        })
+
+    def test_incremental_update_matches_full_history(self):
+        """Test that combining batch summaries gives the same mean and variance as one pass"""
+        values = np.random.default_rng(7).normal(15, 4, 100)
+        first = summarize(self._weather(values[:60]), ['temperature'])
+        second = summarize(self._weather(values[60:]), ['temperature'])
+
+        state = combine(first.reindex(second.index), second)
+        self.assertEqual(state['count'].iloc[0], 100)
+        self.assertAlmostEqual(state['mean'].iloc[0], values.mean())
+        self.assertAlmostEqual(state['m2'].iloc[0] / 99, values.var(ddof=1))
+
+    def test_baselines_persist_and_flag_anomalies(self):
+        """Test that baselines survive between runs and flag values far from a city's norm"""
+        history = 15 + np.random.default_rng(1).normal(0, 1, 40)
+        checker = DataQualityChecker(self.connection_string)
+        report = checker.validate(self._weather(history), 'weather_data')
+        checker.close()
+        self.assertNotIn('statistical_anomaly', [result['check_type'] for result in report.failures])
+
+        # A new run starts from the stored baselines rather than the history
+        checker = DataQualityChecker(self.connection_string)
+        report = checker.validate(self._weather([15.5, 30.0], offset=100), 'weather_data')
+        checker.close()
+
+        anomalies = [result for result in report.failures if result['check_type'] == 'statistical_anomaly']
+        self.assertEqual(len(anomalies), 1)
+        self.assertEqual(anomalies[0]['violations'], 1)
+
+        # The outlier was folded in clipped to the threshold, so it barely moved the baseline
+        count, mean = self._stored('temperature')
+        self.assertEqual(count, 42)
+        self.assertGreater(mean, history.mean())
+        self.assertLess(mean, history.mean() + 0.5)
+
+    def _stored(self, metric):
+        with get_engine(self.connection_string).connect() as conn:
+            return tuple(conn.execute(text(
+                "SELECT count, mean FROM quality_baselines WHERE city = 'Amsterdam' AND metric = :metric"
+            ), {'metric': metric}).one())
+
+    def test_baseline_follows_gradual_drift(self):
+        """Test that a steady cooling after a calm spell is followed rather than flagged run after run"""
+        rng = np.random.default_rng(3)
+        temperatures = 15 + rng.normal(0, 0.1, 200) - 0.1 * np.maximum(0, np.arange(200) - 50)
+        checker = DataQualityChecker(self.connection_string)
+        flagged = 0
+        for run, temperature in enumerate(temperatures):
+            report = checker.validate_frames({'weather_data': self._weather([temperature], offset=run)})
+            flagged += sum(result['violations'] for result in report.failures
+                           if result['check_type'] == 'statistical_anomaly')
+        # An all-time baseline that skips flagged rows flags nearly all of the last 150 runs
+        self.assertLessEqual(flagged, 5)
+
+        # A sensor glitch is still caught while the baseline follows the drift
+        report = checker.validate_frames({'weather_data': self._weather([temperatures[-1] + 30], offset=200)})
+        self.assertIn('statistical_anomaly', [result['check_type'] for result in report.failures])
+
+    def test_baselines_of_unloaded_rows_are_discarded(self):
+        """Test that a batch whose load failed does not reach the saved baselines"""
+        checker = DataQualityChecker(self.connection_string)
+        checker.validate_frames({'weather_data': self._weather([15.0, 16.0])})
+        checker.validate_frames({'weather_data': self._weather([40.0], offset=2)})
+        checker.discard_baselines()
+        checker.close()
+
+        count, mean = self._stored('temperature')
+        self.assertEqual(count, 2)
+        self.assertAlmostEqual(mean, 15.5, delta=0.05)
+
+    def test_repeated_observation_is_folded_in_once(self):
+        """Test that a reading the provider or the cache returns again does not count twice"""
+        store = BaselineStore(self.connection_string)
+        store.update('weather_data', self._weather([15.0, 16.0]), ['temperature'])
+        store.update('weather_data', self._weather([16.0, 17.0], offset=1), ['temperature'])
+
+        state = store.get('weather_data').loc[('Amsterdam', 'temperature')]
+        self.assertEqual(state['count'], 3)
+        self.assertEqual(state['observed_until'], self.start + timedelta(hours=2))
+
+    def test_new_city_is_not_flagged_during_warm_up(self):
+        """Test that cities without enough samples are never flagged"""
+        store = BaselineStore(self.connection_string)
+        scores = store.zscores('weather_data', self._weather([100.0], city='Reykjavik'), ['temperature'], 30)
+        self.assertTrue(scores['temperature'].isna().all())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from etl.cache import MemoryCache, SQLiteCache, cache_key
+from etl.client import get_json
+from etl.rate_limit import RateLimiter
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class ETagStubHandler(BaseHTTPRequestHandler):
+    """Serves a fixed weather payload and honours If-None-Match"""
+
+    def do_GET(self):
+        self.server.requests.append(self.headers.get('If-None-Match'))
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = json.dumps({'name': 'Amsterdam', 'main': {'temp': 18.0}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', '"v1"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestResponseCaches(unittest.TestCase):
+
+    def test_memory_cache_evicts_least_recently_used(self):
+        """Test that the LRU keeps recently read entries when full"""
+        cache = MemoryCache(max_entries=2)
+        cache.store('a', 1, ttl=60)
+        cache.store('b', 2, ttl=60)
+        cache.lookup('a')
+        cache.store('c', 3, ttl=60)
+
+        self.assertIsNone(cache.lookup('b'))
+        self.assertEqual(cache.lookup('a').value, 1)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_expired_entries_count_as_misses(self):
+        """Test that entries past their TTL are stale but kept for revalidation"""
+        clock = FakeClock()
+        cache = MemoryCache(clock=clock)
+        cache.store('a', {'temp': 18}, ttl=600, etag='"v1"')
+
+        self.assertTrue(cache.lookup('a').is_fresh(clock()))
+        clock.now += 601
+        entry = cache.lookup('a')
+        self.assertFalse(entry.is_fresh(clock()))
+        self.assertEqual(entry.etag, '"v1"')
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_sqlite_cache_persists_between_instances(self):
+        """Test that the on-disk cache survives a restart and stays size bounded"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'cache.db')
+            cache = SQLiteCache(path, max_entries=2)
+            for key in ['a', 'b', 'c']:
+                cache.store(key, {'key': key}, ttl=60)
+            cache.close()
+
+            cache = SQLiteCache(path, max_entries=2)
+            self.assertEqual(len(cache), 2)
+            self.assertEqual(cache.lookup('c').value, {'key': 'c'})
+            cache.close()
+
+    def test_cache_key_ignores_api_key(self):
+        """Test that the API key is not part of the cache key"""
+        url = 'https://example.test/weather'
+        self.assertEqual(cache_key(url, {'q': 'Utrecht', 'appid': 'one'}),
+                         cache_key(url, {'appid': 'two', 'q': 'Utrecht'}))
+
+class TestCachedGetJson(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ETagStubHandler)
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/weather"
+        self.limiter = RateLimiter(10000, max_concurrency=4, period=1.0, burst=100)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_fresh_hits_skip_the_network_and_stale_entries_revalidate(self):
+        """Test TTL hits and If-None-Match revalidation through get_json"""
+        clock = FakeClock()
+        cache = MemoryCache(clock=clock)
+        params = {'q': 'Amsterdam', 'appid': 'test', 'units': 'metric'}
+
+        first = get_json(self.url, params, self.limiter, cache)
+        second = get_json(self.url, params, self.limiter, cache)
+        self.assertEqual(first, second)
+        self.assertEqual(self.server.requests, [None])
+
+        clock.now += 601
+        third = get_json(self.url, params, self.limiter, cache)
+        self.assertEqual(third, first)
+        self.assertEqual(self.server.requests, [None, '"v1"'])
+        self.assertEqual(cache.stats()['revalidations'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from functools import partial
+import pandas as pd
+from dashboard import queries
+from dashboard.live import LiveWindow
+from db.engine import get_engine
+from etl.load import load_batch
+from etl.rollups import refresh_rollups
+
+def readings(city, timestamps, temperatures):
+    return pd.DataFrame({'city': city, 'province': 'Noord-Holland', 'timestamp': timestamps,
+                         'temperature': temperatures, 'humidity': 70})
+
+class TestLiveWindow(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.connection_string = f"sqlite:///{os.path.join(self.tmpdir.name, 'weather.db')}"
+        self.now = datetime.utcnow().replace(minute=30, second=0, microsecond=0)
+
+    def tearDown(self):
+        get_engine(self.connection_string).dispose()
+        self.tmpdir.cleanup()
+
+    def test_raw_readings_are_appended_by_id(self):
+        """Test that each tick fetches only readings with a higher id and old ones are evicted"""
+        load_batch({'weather_data': readings('Amsterdam', [self.now - timedelta(hours=h) for h in range(3)],
+                                             [18.0, 17.0, 16.0])}, self.connection_string)
+        window = LiveWindow(partial(queries.weather_reading_changes, self.connection_string, 1), 'id', 'timestamp', 1)
+
+        self.assertEqual(len(window.refresh()), 3)
+        self.assertEqual(window.refresh().shape[0], 3)
+        self.assertEqual(window.last_delta, 0)
+
+        load_batch({'weather_data': readings('Haarlem', [self.now], [19.0])}, self.connection_string)
+        frame = window.refresh()
+        self.assertEqual(window.last_delta, 1)
+        self.assertEqual(len(frame), 4)
+        self.assertIsInstance(frame['city'].dtype, pd.CategoricalDtype)
+
+        # Two hours later the oldest reading has left a 1-day window
+        frame = window.refresh(now=self.now + timedelta(days=1) - timedelta(hours=1, minutes=30))
+        self.assertEqual(len(frame), 3)
+
+    def test_rerolled_buckets_replace_their_rows(self):
+        """Test that a rollup refreshed in place is fetched again and replaces the old row"""
+        load_batch({'weather_data': readings('Amsterdam', [self.now - timedelta(minutes=20)], [10.0])},
+                   self.connection_string)
+        refresh_rollups(self.connection_string, self.now - timedelta(hours=1))
+        window = LiveWindow(partial(queries.weather_rollup_changes, self.connection_string, 1, 'hour'),
+                            'updated_at', 'bucket', 1, ['city', 'bucket'], freq='h')
+        self.assertEqual(list(window.refresh()['temperature_avg']), [10.0])
+
+        load_batch({'weather_data': readings('Amsterdam', [self.now - timedelta(minutes=10)], [20.0])},
+                   self.connection_string)
+        refresh_rollups(self.connection_string, self.now - timedelta(minutes=10))
+        frame = window.refresh()
+
+        self.assertEqual(window.last_delta, 1)
+        self.assertEqual(list(frame['temperature_avg']), [15.0])
+        self.assertEqual(list(frame['samples']), [2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,10 @@
+import os
+import tempfile
 import unittest
 import pandas as pd
-from etl.transform import normalize_weather, normalize_air_quality
+from sqlalchemy import text
+from db.engine import get_engine
+from etl.transform import normalize_weather, normalize_weather_batch, normalize_air_quality, normalize_forecast
 from etl.data_quality import DataQualityChecker
 from datetime import datetime
 
@@ -95,6 +99,47 @@ class TestWeatherETL(unittest.TestCase):
         self.assertFalse(result)  # Should fail due to outliers
         
         quality_checker.close()
+    
+    def test_rule_engine_covers_all_frames(self):
+        """Test that one validation run reports every table and writes results in one batch"""
+        timestamp = datetime(2025, 7, 1, 12, 0)
+        frames = {
+            'weather_data': pd.DataFrame({
+                'city': ['Amsterdam', 'Rotterdam'],
+                'temperature': [20.5, 50.0],
+                'humidity': [65, 70],
+                'timestamp': [timestamp, timestamp]
+            }),
+            'air_quality': pd.DataFrame({
+                'city': ['Amsterdam'], 'aqi': [7], 'pm2_5': [-1.0], 'timestamp': [timestamp]
+            }),
+            'weather_forecast': pd.DataFrame({
+                'city': ['Amsterdam', 'Amsterdam'],
+                'forecast_date': [timestamp, timestamp],
+                'temperature': [18.0, 18.5],
+                'humidity': [70, 72]
+            })
+        }
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            connection_string = f"sqlite:///{os.path.join(tmpdir, 'quality.db')}"
+            quality_checker = DataQualityChecker(connection_string)
+            
+            report = quality_checker.validate_frames(frames)
+            failed = {(result['table_name'], result['check_type']) for result in report.failures}
+            self.assertEqual(failed, {
+                ('weather_data', 'temperature_outlier'),
+                ('air_quality', 'aqi_range'),
+                ('air_quality', 'negative_concentration'),
+                ('weather_forecast', 'duplicate_check'),
+            })
+            self.assertEqual(len(report.issues), 4)
+            
+            quality_checker.close()
+            with get_engine(connection_string).connect() as conn:
+                stored = conn.execute(text("SELECT COUNT(*) FROM data_quality")).scalar()
+            get_engine(connection_string).dispose()
+        self.assertEqual(stored, len(report.results))
 
 class TestDataTransformations(unittest.TestCase):
     
@@ -121,6 +166,54 @@ class TestDataTransformations(unittest.TestCase):
         
         df = normalize_weather(test_data)
         self.assertIsInstance(df['timestamp'].iloc[0], datetime)
+    
+    def test_batch_matches_single_normalization(self):
+        """Test that the batch transform gives the same rows as per-city calls"""
+        payloads = [
+            {
+                'name': 'Amsterdam',
+                'main': {'temp': 20.5, 'humidity': 65, 'pressure': 1013, 'feels_like': 22.0},
+                'weather': [{'description': 'clear sky'}],
+                'coord': {'lat': 52.3676, 'lon': 4.9041},
+                'wind': {'speed': 3.5, 'deg': 180},
+                'visibility': 10000
+            },
+            {
+                'name': 'Maastricht',
+                'main': {'temp': 24.0, 'humidity': 55, 'pressure': 1009, 'feels_like': 24.5},
+                'weather': [],
+                'coord': {'lat': 50.8514, 'lon': 5.6910},
+                'wind': {'speed': 1.5, 'deg': 90},
+                'visibility': 8000
+            }
+        ]
+        
+        batch_df = normalize_weather_batch(payloads).drop(columns='timestamp')
+        single_df = pd.concat([normalize_weather(p) for p in payloads], ignore_index=True).drop(columns='timestamp')
+        
+        pd.testing.assert_frame_equal(batch_df, single_df)
+        self.assertEqual(batch_df['province'].tolist(), ['Noord-Holland', 'Limburg'])
+        self.assertIsNone(batch_df['weather'].iloc[1])
+
+    def test_forecast_keeps_full_horizon(self):
+        """Test that all 40 forecast steps are kept by default and can be limited"""
+        start = 1751371200  # 2025-07-01 12:00 UTC
+        forecast_data = {
+            'city': {'name': 'Utrecht'},
+            'list': [{
+                'dt': start + step * 3 * 3600,
+                'main': {'temp': 15.0 + step, 'humidity': 70},
+                'weather': [{'description': 'light rain'}]
+            } for step in range(40)]
+        }
+        
+        df = normalize_forecast(forecast_data)
+        self.assertEqual(len(df), 40)
+        self.assertEqual(df['forecast_date'].iloc[0], datetime(2025, 7, 1, 12, 0))
+        self.assertEqual(df['forecast_date'].iloc[-1], datetime(2025, 7, 6, 9, 0))
+        self.assertEqual(df['created_at'].nunique(), 1)
+        
+        self.assertEqual(len(normalize_forecast(forecast_data, horizon=5)), 5)
 
 if __name__ == '__main__':
     unittest.main()
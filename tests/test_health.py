@@ -0,0 +1,98 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+import pandas as pd
+import psutil
+from sqlalchemy import select
+from db.engine import get_engine
+from db.models import LoadWatermark, DataQuality
+from etl.load import load_batch
+from monitoring.health import HealthMonitor, ResourceSampler
+
+class TestResourceSampler(unittest.TestCase):
+
+    def test_snapshot_does_not_block(self):
+        """Test that resources are read from the background sample, never with a blocking interval"""
+        with mock.patch('psutil.cpu_percent', wraps=psutil.cpu_percent) as cpu_percent:
+            sampler = ResourceSampler(interval=0.05)
+            self.addCleanup(sampler.stop)
+            first = sampler.snapshot()
+            time.sleep(0.2)
+            start = time.perf_counter()
+            latest = sampler.snapshot()
+            self.assertLess(time.perf_counter() - start, 0.05)
+
+        self.assertGreater(latest['timestamp'], first['timestamp'])
+        self.assertIsNotNone(latest['disk_percent'])  # the filesystem root exists on every OS
+        self.assertTrue(all(call.kwargs.get('interval') is None for call in cpu_percent.call_args_list))
+
+class TestDataFreshness(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.connection_string = f"sqlite:///{os.path.join(self.tmpdir.name, 'weather.db')}"
+
+    def tearDown(self):
+        get_engine(self.connection_string).dispose()
+        self.tmpdir.cleanup()
+
+    def weather(self, timestamps):
+        return {'weather_data': pd.DataFrame({'city': [f'City {i}' for i in range(len(timestamps))],
+                                              'temperature': 18.0, 'timestamp': timestamps})}
+
+    def watermark(self, table_name):
+        table = LoadWatermark.__table__
+        with get_engine(self.connection_string).connect() as conn:
+            return conn.execute(select(table).where(table.c.table_name == table_name)).fetchone()
+
+    def test_loader_advances_watermark_but_never_back(self):
+        """Test that loads record the newest timestamp and a backfill leaves it in place"""
+        now = datetime.utcnow().replace(microsecond=0)
+        load_batch(self.weather([now - timedelta(minutes=30), now]), self.connection_string)
+        self.assertEqual((self.watermark('weather_data').latest_timestamp, self.watermark('weather_data').rows_loaded),
+                         (now, 2))
+
+        load_batch(self.weather([now - timedelta(days=3)]), self.connection_string, mode='append')
+        watermark = self.watermark('weather_data')
+        self.assertEqual((watermark.latest_timestamp, watermark.rows_loaded), (now, 1))
+        self.assertIsNone(self.watermark('air_quality'))
+
+    def test_freshness_reads_watermarks(self):
+        """Test that freshness is derived from the watermark table"""
+        monitor = HealthMonitor(self.connection_string)
+        load_batch({'air_quality': pd.DataFrame({'city': ['Amsterdam'], 'aqi': [2],
+                                                 'timestamp': [datetime.utcnow()]})}, self.connection_string)
+        self.assertEqual(monitor.check_data_freshness()['status'], 'no_data')
+
+        load_batch(self.weather([datetime.utcnow() - timedelta(hours=5)]), self.connection_string)
+        freshness = monitor.check_data_freshness()
+        self.assertEqual(freshness['status'], 'stale')
+        self.assertAlmostEqual(freshness['age_hours'], 5, delta=0.1)
+        self.assertEqual(set(freshness['tables']), {'weather_data', 'air_quality'})
+
+    def test_pipeline_metrics_run_on_sqlite(self):
+        """Test that daily counts and the quality summary compile and group by day outside SQL Server"""
+        now = datetime.utcnow().replace(hour=12)  # both of today's readings fall on the same date
+        load_batch(self.weather([now, now - timedelta(minutes=1), now - timedelta(days=1), now - timedelta(days=9)]),
+                   self.connection_string)
+        with get_engine(self.connection_string).begin() as conn:
+            conn.execute(DataQuality.__table__.insert(), [
+                {'table_name': 'weather_data', 'check_type': 'outlier', 'status': 'passed', 'timestamp': now},
+                {'table_name': 'weather_data', 'check_type': 'outlier', 'status': 'failed', 'timestamp': now},
+                {'table_name': 'weather_data', 'check_type': 'outlier', 'status': 'failed',
+                 'timestamp': now - timedelta(days=2)},
+            ])
+
+        metrics = HealthMonitor(self.connection_string).get_pipeline_metrics()
+        self.assertNotIn('error', metrics)
+        self.assertEqual(metrics['daily_records'], [
+            {'date': str(now.date()), 'count': 2},
+            {'date': str((now - timedelta(days=1)).date()), 'count': 1},
+        ])
+        self.assertEqual(metrics['quality_summary'], {'passed': 1, 'failed': 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import inspect, text
+from db import engine as db_engine
+from db.engine import get_engine, ensure_schema
+from etl.load import load_batch, load_to_sql
+from etl.transform import normalize_weather, normalize_air_quality
+
+class TestBatchedLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.connection_string = f"sqlite:///{os.path.join(self.tmpdir.name, 'weather.db')}"
+        self.timestamp = datetime(2025, 7, 1, 12, 0, 0)
+
+    def tearDown(self):
+        get_engine(self.connection_string).dispose()
+        self.tmpdir.cleanup()
+
+    def _count(self, table_name):
+        with get_engine(self.connection_string).connect() as conn:
+            return conn.execute(text(f"SELECT COUNT(*) FROM {table_name}")).scalar()
+
+    def test_load_batch_writes_all_tables(self):
+        """Test that weather, air quality and forecast frames load together"""
+        frames = {
+            'weather_data': pd.DataFrame({
+                'city': ['Amsterdam', 'Utrecht'],
+                'temperature': [20.5, None],
+                'humidity': [65, 70],
+                'timestamp': [self.timestamp, self.timestamp]
+            }),
+            'air_quality': pd.DataFrame({'city': ['Amsterdam'], 'aqi': [2], 'timestamp': [self.timestamp]}),
+            'weather_forecast': pd.DataFrame({
+                'city': ['Amsterdam'] * 3,
+                'forecast_date': pd.date_range(self.timestamp, periods=3, freq='3h'),
+                'temperature': [18.0, 17.5, 16.0],
+                'humidity': [70, 72, 75]
+            })
+        }
+
+        row_counts = load_batch(frames, self.connection_string, chunk_size=2)
+
+        self.assertEqual(row_counts, {'weather_data': 2, 'air_quality': 1, 'weather_forecast': 3})
+        self.assertEqual(self._count('weather_forecast'), 3)
+
+        with get_engine(self.connection_string).connect() as conn:
+            rows = conn.execute(text("SELECT city, temperature, timestamp FROM weather_data ORDER BY city")).fetchall()
+        self.assertIsNone(rows[1][1])  # NaN is stored as NULL
+        self.assertTrue(str(rows[0][2]).startswith('2025-07-01 12:00:00'))
+
+    def test_failed_table_rolls_back_batch(self):
+        """Test that a failure in one table leaves no partial batch behind"""
+        frames = {
+            'weather_data': pd.DataFrame({
+                'city': ['Amsterdam'], 'temperature': [20.5], 'humidity': [65], 'timestamp': [self.timestamp]
+            }),
+            'air_quality': pd.DataFrame({'city': ['Amsterdam'], 'aqi': [2], 'timestamp': [self.timestamp]})
+        }
+        load_to_sql(frames['weather_data'], self.connection_string)
+
+        with get_engine(self.connection_string).begin() as conn:
+            conn.execute(text("CREATE TRIGGER reject_aq BEFORE INSERT ON air_quality "
+                              "BEGIN SELECT RAISE(ABORT, 'rejected'); END"))
+
+        with self.assertRaises(Exception):
+            load_batch(frames, self.connection_string)
+        self.assertEqual(self._count('weather_data'), 1)
+
+class TestMergeLoadMode(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.connection_string = f"sqlite:///{os.path.join(self.tmpdir.name, 'weather.db')}"
+        self.forecast_df = pd.DataFrame({
+            'city': ['Amsterdam', 'Amsterdam', 'Utrecht'],
+            'forecast_date': [datetime(2025, 7, 1, 12), datetime(2025, 7, 1, 15), datetime(2025, 7, 1, 12)],
+            'temperature': [18.0, 17.5, 19.0],
+            'humidity': [70, 72, 65],
+            'weather': ['light rain', 'overcast clouds', 'clear sky'],
+            'created_at': [datetime(2025, 7, 1, 9)] * 3
+        })
+
+    def tearDown(self):
+        get_engine(self.connection_string).dispose()
+        self.tmpdir.cleanup()
+
+    def _forecasts(self):
+        with get_engine(self.connection_string).connect() as conn:
+            return conn.execute(text(
+                "SELECT city, temperature FROM weather_forecast ORDER BY city, forecast_date"
+            )).fetchall()
+
+    def test_rerunning_batch_creates_no_duplicates(self):
+        """Test that loading the same batch twice keeps one row per natural key"""
+        load_to_sql(self.forecast_df, self.connection_string, 'weather_forecast', mode='merge')
+        load_to_sql(self.forecast_df, self.connection_string, 'weather_forecast', mode='merge')
+
+        self.assertEqual(len(self._forecasts()), 3)
+
+    def test_merge_updates_changed_rows(self):
+        """Test that a newer forecast for the same slot replaces the old values"""
+        load_to_sql(self.forecast_df, self.connection_string, 'weather_forecast', mode='merge')
+
+        updated = self.forecast_df.iloc[[0]].assign(temperature=21.0)
+        load_to_sql(updated, self.connection_string, 'weather_forecast', mode='merge')
+
+        self.assertEqual([tuple(row) for row in self._forecasts()],
+                         [('Amsterdam', 21.0), ('Amsterdam', 17.5), ('Utrecht', 19.0)])
+
+    def test_duplicate_keys_within_batch_keep_last(self):
+        """Test that duplicate keys inside one batch collapse to the last row"""
+        batch = pd.concat([self.forecast_df, self.forecast_df.iloc[[2]].assign(temperature=25.0)])
+
+        load_to_sql(batch, self.connection_string, 'weather_forecast', mode='merge')
+
+        self.assertEqual(self._forecasts()[-1][1], 25.0)
+
+class TestObservationKeys(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.connection_string = f"sqlite:///{os.path.join(self.tmpdir.name, 'weather.db')}"
+
+    def tearDown(self):
+        get_engine(self.connection_string).dispose()
+        self.tmpdir.cleanup()
+
+    def _count(self, table_name):
+        with get_engine(self.connection_string).connect() as conn:
+            return conn.execute(text(f"SELECT COUNT(*) FROM {table_name}")).scalar()
+
+    def test_same_payload_loaded_twice_is_one_row(self):
+        """Test that re-fetching an unchanged observation merges into the row already stored"""
+        weather = {'name': 'Utrecht', 'dt': 1751371200, 'main': {'temp': 18.0, 'humidity': 70},
+                   'weather': [{'description': 'clear sky'}], 'coord': {'lat': 52.09, 'lon': 5.12}}
+        air_quality = {'coord': {'lat': 52.09, 'lon': 5.12}, 'list': [{
+            'dt': 1751371200, 'main': {'aqi': 2},
+            'components': dict.fromkeys(['co', 'no', 'no2', 'o3', 'so2', 'pm2_5', 'pm10', 'nh3'], 1.0)}]}
+
+        for _ in range(2):
+            load_batch({'weather_data': normalize_weather(weather),
+                        'air_quality': normalize_air_quality(air_quality, 'Utrecht')},
+                       self.connection_string, mode='merge')
+
+        self.assertEqual((self._count('weather_data'), self._count('air_quality')), (1, 1))
+        with get_engine(self.connection_string).connect() as conn:
+            stored = conn.execute(text("SELECT timestamp FROM weather_data")).scalar()
+        self.assertTrue(str(stored).startswith('2025-07-01 12:00:00'))
+
+    def test_duplicates_are_removed_before_unique_index(self):
+        """Test that a table holding duplicate keys gets its unique index, keeping the latest row"""
+        engine = get_engine(self.connection_string)
+        ensure_schema(engine)
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ux_weather_data_city_timestamp"))
+            conn.execute(text("INSERT INTO weather_data (city, temperature, timestamp) VALUES "
+                              "('Utrecht', 17.0, '2025-07-01 12:00:00.000000'), "
+                              "('Utrecht', 18.0, '2025-07-01 12:00:00.000000'), "
+                              "('Utrecht', 19.0, '2025-07-01 13:00:00.000000')"))
+        db_engine._initialized_schemas.discard(str(engine.url))
+
+        ensure_schema(engine)
+
+        with engine.connect() as conn:
+            rows = conn.execute(text("SELECT temperature FROM weather_data ORDER BY timestamp")).fetchall()
+        self.assertEqual([row[0] for row in rows], [18.0, 19.0])
+        self.assertIn('ux_weather_data_city_timestamp', {index['name'] for index in inspect(engine).get_indexes('weather_data')})
+
+    def test_columns_added_to_existing_tables(self):
+        """Test that a column added to a model is added to a table created before it"""
+        engine = get_engine(self.connection_string)
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE quality_baselines (id INTEGER PRIMARY KEY, table_name VARCHAR(100), "
+                              "city VARCHAR(100), metric VARCHAR(50), count INTEGER, mean FLOAT, m2 FLOAT, "
+                              "updated_at DATETIME)"))
+
+        ensure_schema(engine)
+
+        self.assertIn('observed_until', {column['name'] for column in inspect(engine).get_columns('quality_baselines')})
+
+if __name__ == '__main__':
+    unittest.main()
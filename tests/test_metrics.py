@@ -0,0 +1,159 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+import urllib.request
+import pandas as pd
+from sqlalchemy import select
+from db.engine import get_engine
+from db.models import PipelineRun
+from etl.load import load_batch
+from monitoring.metrics import (MetricsRegistry, PrometheusExporter, JsonSummarySink, DatabaseSink,
+                                RunContextExecutor, build_sinks, track_run)
+
+class RecordingSink:
+    def __init__(self):
+        self.summaries = {}
+
+    def publish(self, summary: dict):
+        self.summaries[summary['job']] = summary
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def test_prometheus_rendering(self):
+        """Test that histograms render cumulative buckets, sum and count per label set"""
+        registry = MetricsRegistry()
+        latency = registry.histogram("etl_extract_seconds", "Request latency", ("endpoint",), buckets=(0.1, 1.0))
+        requests = registry.counter("etl_extract_requests_total", "Requests", ("endpoint", "outcome"))
+        for value in [0.05, 0.5, 3.0]:
+            latency.observe(value, endpoint="weather")
+        requests.inc(endpoint="weather", outcome=200)
+
+        text = registry.render_prometheus()
+
+        self.assertIn("# TYPE etl_extract_seconds histogram", text)
+        self.assertIn('etl_extract_seconds_bucket{endpoint="weather",le="0.1"} 1', text)
+        self.assertIn('etl_extract_seconds_bucket{endpoint="weather",le="1.0"} 2', text)
+        self.assertIn('etl_extract_seconds_bucket{endpoint="weather",le="+Inf"} 3', text)
+        self.assertIn('etl_extract_seconds_count{endpoint="weather"} 3', text)
+        self.assertIn('etl_extract_requests_total{endpoint="weather",outcome="200"} 1', text)
+
+    def test_summary_covers_only_the_run(self):
+        """Test that a run summary is the difference between two snapshots"""
+        registry = MetricsRegistry()
+        load = registry.histogram("etl_load_seconds", "Load time", ("table",), buckets=(0.1, 1.0, 10.0))
+        load.observe(5.0, table="weather_data")
+        before = registry.snapshot()
+        for value in [0.05, 0.06, 0.07, 0.5]:
+            load.observe(value, table="weather_data")
+
+        summary = registry.summarize(before)["etl_load_seconds"]["weather_data"]
+
+        self.assertEqual(summary["count"], 4)
+        self.assertAlmostEqual(summary["sum"], 0.68)
+        self.assertEqual((summary["p50"], summary["p95"]), (0.1, 1.0))
+
+    def test_exporter_serves_metrics(self):
+        """Test that the exporter answers scrapes with the text format"""
+        registry = MetricsRegistry()
+        registry.counter("etl_rows_loaded_total", "Rows", ("table",)).inc(16, table="weather_data")
+        exporter = PrometheusExporter(0, registry, host="127.0.0.1")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{exporter.port}/metrics") as response:
+                body = response.read().decode()
+                self.assertTrue(response.headers["Content-Type"].startswith("text/plain"))
+        finally:
+            exporter.close()
+        self.assertIn('etl_rows_loaded_total{table="weather_data"} 16', body)
+
+class TestRunTracking(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.connection_string = f"sqlite:///{os.path.join(self.tmpdir.name, 'weather.db')}"
+        self.summary_path = os.path.join(self.tmpdir.name, 'run.json')
+
+    def tearDown(self):
+        get_engine(self.connection_string).dispose()
+        self.tmpdir.cleanup()
+
+    def test_run_summary_is_published_to_every_sink(self):
+        """Test that a run writes the JSON summary and a pipeline_runs row with its load timings"""
+        frame = pd.DataFrame({'city': ['Utrecht', 'Assen'], 'temperature': [18.0, 15.0],
+                              'timestamp': pd.Timestamp('2024-05-01 12:00')})
+        sinks = [JsonSummarySink(self.summary_path), DatabaseSink(self.connection_string)]
+
+        with track_run('weather', sinks) as run:
+            run['row_counts'] = load_batch({'weather_data': frame}, self.connection_string)
+            run['succeeded'] = 2
+
+        with open(self.summary_path) as f:
+            summary = json.load(f)
+        self.assertEqual(summary['status'], 'succeeded')
+        self.assertEqual(summary['metrics']['etl_rows_loaded_total'], {'weather_data': 2})
+        self.assertEqual(summary['metrics']['etl_load_seconds']['weather_data']['count'], 1)
+
+        with get_engine(self.connection_string).connect() as conn:
+            row = conn.execute(select(PipelineRun.__table__)).one()
+        self.assertEqual((row.job, row.cities_succeeded, row.rows_loaded), ('weather', 2, 2))
+
+    def test_failed_run_is_recorded(self):
+        """Test that an exception marks the run failed and still publishes it"""
+        with self.assertRaises(RuntimeError):
+            with track_run('forecast', [DatabaseSink(self.connection_string)]):
+                raise RuntimeError("API unavailable")
+
+        with get_engine(self.connection_string).connect() as conn:
+            row = conn.execute(select(PipelineRun.__table__)).one()
+        self.assertEqual((row.status, row.error), ('failed', 'API unavailable'))
+
+    def test_handled_failure_marks_the_run_failed(self):
+        """Test that a failure the pipeline caught and reported still marks its run failed"""
+        with track_run('weather', [DatabaseSink(self.connection_string)]) as run:
+            run['error'] = "Transforming weather data failed: bad payload"
+
+        with get_engine(self.connection_string).connect() as conn:
+            row = conn.execute(select(PipelineRun.__table__)).one()
+        self.assertEqual((row.status, row.error), ('failed', 'Transforming weather data failed: bad payload'))
+
+    def test_concurrent_runs_keep_their_own_metrics(self):
+        """Test that overlapping runs, and the pool threads they start, each count only their own metrics"""
+        registry = MetricsRegistry()
+        rows = registry.counter('etl_rows_loaded_total', 'Rows', ('table',))
+        sink = RecordingSink()
+        weather_started, forecast_done = threading.Event(), threading.Event()
+
+        def weather():
+            with track_run('weather', [sink], registry):
+                with RunContextExecutor(max_workers=2) as pool:
+                    pool.submit(rows.inc, 16, table='weather_data').result()
+                weather_started.set()
+                forecast_done.wait(5)
+
+        def forecast():
+            with track_run('forecast', [sink], registry):
+                rows.inc(640, table='weather_forecast')
+            forecast_done.set()
+
+        first = threading.Thread(target=weather)
+        first.start()
+        weather_started.wait(5)
+        second = threading.Thread(target=forecast)
+        second.start()
+        second.join(5)
+        first.join(5)
+
+        # The forecast run finished while the weather run was still in progress
+        self.assertTrue(forecast_done.is_set())
+        self.assertEqual(sink.summaries['weather']['metrics']['etl_rows_loaded_total'], {'weather_data': 16})
+        self.assertEqual(sink.summaries['forecast']['metrics']['etl_rows_loaded_total'], {'weather_forecast': 640})
+        self.assertIn('etl_rows_loaded_total{table="weather_data"} 16', registry.render_prometheus())
+
+    def test_exporter_is_only_started_when_serving(self):
+        """Test that a single run does not open the metrics port"""
+        sinks = build_sinks(self.connection_string, ['prometheus', 'json'])
+        self.assertEqual([type(sink) for sink in sinks], [JsonSummarySink])
+
+if __name__ == '__main__':
+    unittest.main()
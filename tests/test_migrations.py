@@ -0,0 +1,72 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import select
+from db.engine import get_engine
+from db.migrations import forecast_dates_to_utc
+from db.models import WeatherForecast
+from etl.load import load_batch
+from etl.transform import normalize_forecast
+
+def use_timezone(tz):
+    previous = os.environ.get('TZ')
+    os.environ['TZ'] = tz
+    time.tzset()
+    def restore():
+        if previous is None:
+            os.environ.pop('TZ', None)
+        else:
+            os.environ['TZ'] = previous
+        time.tzset()
+    return restore
+
+class TestForecastDatesInUtc(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.connection_string = f"sqlite:///{os.path.join(self.tmpdir.name, 'weather.db')}"
+        # A host ahead of UTC, where local and UTC forecast times differ
+        self.addCleanup(use_timezone('Europe/Amsterdam'))
+
+    def tearDown(self):
+        get_engine(self.connection_string).dispose()
+        self.tmpdir.cleanup()
+
+    def test_forecast_dates_do_not_depend_on_host_timezone(self):
+        """Test that forecast times are UTC even on a host whose local time is not"""
+        df = normalize_forecast({'city': {'name': 'Utrecht'},
+                                 'list': [{'dt': 1751371200, 'main': {'temp': 18.0, 'humidity': 70},
+                                           'weather': [{'description': 'light rain'}]}]})
+        self.assertEqual(df['forecast_date'].iloc[0], datetime(2025, 7, 1, 12, 0))
+
+    def test_migration_converts_rows_stored_in_local_time(self):
+        """Test that old local-time rows move to UTC, or are dropped where a UTC row was loaded since"""
+        deployed = datetime(2025, 7, 1, 9, 0)
+        old = pd.DataFrame({
+            'city': ['Utrecht', 'Utrecht'],
+            # What datetime.fromtimestamp stored for 12:00 and 15:00 UTC in summer time
+            'forecast_date': [datetime(2025, 7, 1, 14, 0), datetime(2025, 7, 1, 17, 0)],
+            'temperature': [18.0, 19.0], 'humidity': [70, 70], 'weather': ['light rain'] * 2,
+            'created_at': [datetime(2025, 7, 1, 6, 0)] * 2,
+        })
+        new = pd.DataFrame({'city': ['Utrecht'], 'forecast_date': [datetime(2025, 7, 1, 15, 0)],
+                            'temperature': [19.5], 'humidity': [75], 'weather': ['overcast clouds'],
+                            'created_at': [datetime(2025, 7, 1, 10, 0)]})
+        load_batch({'weather_forecast': old}, self.connection_string)
+        load_batch({'weather_forecast': new}, self.connection_string)
+        engine = get_engine(self.connection_string)
+
+        self.assertEqual(forecast_dates_to_utc(engine, deployed), {'converted': 1, 'deleted': 1})
+
+        table = WeatherForecast.__table__
+        with engine.connect() as conn:
+            rows = pd.read_sql(select(table.c.forecast_date, table.c.temperature).order_by(table.c.forecast_date), conn)
+        self.assertEqual(list(rows['forecast_date']),
+                         [datetime(2025, 7, 1, 12, 0), datetime(2025, 7, 1, 15, 0)])
+        self.assertEqual(list(rows['temperature']), [18.0, 19.5])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+from datetime import datetime, timedelta
+import pandas as pd
+from sqlalchemy import text
+from db.engine import get_engine
+from db.partitioning import month_start, apply_retention
+from etl.load import load_batch
+
+class TestPartitioning(unittest.TestCase):
+
+    def test_month_start(self):
+        """Test month boundaries across year ends"""
+        self.assertEqual(month_start(datetime(2025, 7, 15, 13, 30)), datetime(2025, 7, 1))
+        self.assertEqual(month_start(datetime(2025, 11, 30), 2), datetime(2026, 1, 1))
+        self.assertEqual(month_start(datetime(2025, 1, 10), -1), datetime(2024, 12, 1))
+
+    def test_retention_without_partitions_deletes_old_rows(self):
+        """Test the range-delete fallback used when tables are not partitioned"""
+        connection_string = "sqlite:///:memory:"
+        now = datetime.utcnow()
+        load_batch({
+            'weather_data': pd.DataFrame({
+                'city': ['Amsterdam', 'Amsterdam'],
+                'temperature': [20.5, 18.0],
+                'humidity': [65, 70],
+                'timestamp': [now - timedelta(days=400), now - timedelta(days=1)]
+            })
+        }, connection_string)
+
+        deleted = apply_retention(get_engine(connection_string), retention_days=365)
+
+        self.assertEqual(deleted['weather_data'], 1)
+        with get_engine(connection_string).connect() as conn:
+            self.assertEqual(conn.execute(text("SELECT COUNT(*) FROM weather_data")).scalar(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
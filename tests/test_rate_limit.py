@@ -0,0 +1,199 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from etl.rate_limit import AdaptiveConcurrency, QuotaWindow, RateLimiter, TokenBucket
+from etl.extract import get_weather
+from etl.air_quality import get_air_quality, get_weather_forecast
+
+# The stub enforces its quota over a one second window so the test stays fast
+QUOTA = 20
+WINDOW = 1.0
+
+class QuotaStubHandler(BaseHTTPRequestHandler):
+    """Stand-in for OpenWeather that answers 429 once the quota window is exhausted"""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            now = time.monotonic()
+            while server.calls and server.calls[0] <= now - WINDOW:
+                server.calls.popleft()
+            if len(server.calls) >= QUOTA:
+                server.rejected += 1
+                status = 429
+            else:
+                server.calls.append(now)
+                server.accepted += 1
+                status = 200
+
+        body = json.dumps({
+            'name': 'Stub',
+            'coord': {'lat': 52.0, 'lon': 5.0},
+            'city': {'name': 'Stub'},
+            'list': []
+        }).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestRateLimiterAgainstStub(unittest.TestCase):
+
+    def setUp(self):
+        """Start the quota-enforcing stub server"""
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), QuotaStubHandler)
+        self.server.lock = threading.Lock()
+        self.server.calls = deque()
+        self.server.accepted = 0
+        self.server.rejected = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+        self.patches = [
+            mock.patch('etl.extract.BASE_URL', f"{base_url}/weather"),
+            mock.patch('etl.air_quality.AIR_POLLUTION_URL', f"{base_url}/air_pollution"),
+            mock.patch('etl.air_quality.FORECAST_URL', f"{base_url}/forecast"),
+            # Every call must reach the stub, so bypass the response cache
+            mock.patch('etl.cache.response_cache', None),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_throughput_stays_near_quota_without_429s(self):
+        """Test that all three extractors share the budget and never exceed the quota"""
+        limiter = RateLimiter(QUOTA, max_concurrency=8, period=WINDOW, burst=2)
+        calls = [lambda: get_weather('Amsterdam'),
+                 lambda: get_air_quality(52.0, 5.0),
+                 lambda: get_weather_forecast('Amsterdam')] * 20
+
+        with mock.patch('etl.rate_limit.openweather_limiter', limiter):
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(lambda call: call(), calls))
+            elapsed = time.perf_counter() - start
+
+        throughput = self.server.accepted / elapsed
+        self.assertEqual(self.server.rejected, 0)
+        self.assertEqual(self.server.accepted, len(calls))
+        self.assertGreater(throughput, QUOTA / WINDOW * 0.75)
+
+    def test_unthrottled_calls_are_rejected(self):
+        """Test that the stub really enforces its quota without a limiter"""
+        limiter = RateLimiter(10000, max_concurrency=8, period=WINDOW, burst=10000)
+
+        with mock.patch('etl.rate_limit.openweather_limiter', limiter):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(lambda _: get_air_quality(52.0, 5.0), range(QUOTA * 2)))
+
+        self.assertGreater(self.server.rejected, 0)
+
+class TestQuotaBudget(unittest.TestCase):
+
+    def test_bucket_refills_at_the_full_rate(self):
+        """Test that after the burst, tokens come at calls_per_period per period"""
+        with mock.patch('time.monotonic', return_value=1000.0):
+            bucket = TokenBucket(60, period=60.0, burst=10)
+            delays = [bucket.reserve() for _ in range(60)]
+
+        self.assertEqual(delays[:10], [0.0] * 10)
+        self.assertAlmostEqual(delays[10], 1.0)
+        self.assertAlmostEqual(delays[-1], 50.0)
+
+    def test_window_counts_calls_until_a_period_after_they_finish(self):
+        """Test that the window admits the budget, then waits for the oldest finished call to expire"""
+        with mock.patch('time.monotonic') as clock:
+            clock.return_value = 1000.0
+            window = QuotaWindow(3, period=60.0)
+            self.assertEqual([window.try_enter() for _ in range(3)], [0.0] * 3)
+            self.assertEqual(window.try_enter(), 20.0)
+
+            clock.return_value = 1005.0
+            window.leave()
+            clock.return_value = 1010.0
+            window.leave()
+            self.assertEqual(window.try_enter(), 55.0)
+
+            clock.return_value = 1065.0
+            self.assertEqual(window.try_enter(), 0.0)
+            self.assertEqual(window.try_enter(), 5.0)
+
+class TestAdaptiveConcurrency(unittest.TestCase):
+
+    def test_backs_off_on_overload_and_recovers(self):
+        """Test multiplicative decrease on 429/5xx and additive increase on success"""
+        concurrency = AdaptiveConcurrency(max_limit=16, min_limit=1)
+
+        concurrency.acquire()
+        concurrency.release(429)
+        self.assertEqual(int(concurrency.limit), 8)
+
+        concurrency.acquire()
+        concurrency.release(503)
+        self.assertEqual(int(concurrency.limit), 4)
+
+        for _ in range(20):
+            concurrency.acquire()
+            concurrency.release(200)
+        self.assertGreater(concurrency.limit, 4)
+        self.assertLessEqual(concurrency.limit, 16)
+
+    def test_one_overload_halves_the_limit_once(self):
+        """Test that the requests failing together in one overload count as a single decrease"""
+        concurrency = AdaptiveConcurrency(max_limit=16, min_limit=1)
+        for _ in range(8):
+            concurrency.acquire()
+
+        for _ in range(8):
+            concurrency.release(429)
+        self.assertEqual(int(concurrency.limit), 8)
+
+        concurrency.acquire()
+        concurrency.release(429)
+        self.assertEqual(int(concurrency.limit), 4)
+
+    def test_limit_blocks_extra_callers(self):
+        """Test that callers beyond the current limit must wait"""
+        concurrency = AdaptiveConcurrency(max_limit=2)
+
+        self.assertTrue(concurrency.try_acquire())
+        self.assertTrue(concurrency.try_acquire())
+        self.assertFalse(concurrency.try_acquire())
+        concurrency.release(200)
+        self.assertTrue(concurrency.try_acquire())
+
+    def test_async_waiters_are_woken_by_release(self):
+        """Test that a coroutine over the limit sleeps until another thread releases a slot"""
+        concurrency = AdaptiveConcurrency(max_limit=1)
+        concurrency.acquire()
+
+        async def wait_for_slot():
+            with mock.patch('asyncio.sleep', side_effect=AssertionError("polled for a slot")):
+                waiter = asyncio.ensure_future(concurrency.acquire_async())
+                done, _ = await asyncio.wait([waiter], timeout=0.1)
+                self.assertFalse(done)
+                threading.Timer(0.05, concurrency.release, (200,)).start()
+                await asyncio.wait_for(waiter, 1)
+
+        asyncio.run(wait_for_slot())
+        self.assertFalse(concurrency.try_acquire())
+        concurrency.release(200)
+        self.assertTrue(concurrency.try_acquire())
+
+if __name__ == '__main__':
+    unittest.main()
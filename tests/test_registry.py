@@ -0,0 +1,124 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import urlparse, parse_qs
+from db.engine import get_engine
+from etl.extract import iter_city_results, iter_dataset_results
+from etl.rate_limit import RateLimiter
+from etl.registry import CityRegistry, SEED_CITIES, group_batches
+
+def weather_payload(city_id: int, name: str) -> dict:
+    return {'id': city_id, 'name': name, 'coord': {'lat': 52.0, 'lon': 5.0},
+            'main': {'temp': 18.0, 'humidity': 70}, 'weather': [{'description': 'clear sky'}]}
+
+class GroupStubHandler(BaseHTTPRequestHandler):
+    """Answers the group, weather, air pollution and forecast endpoints and records the paths"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        self.server.paths.append(url.path)
+        if url.path == '/group':
+            ids = [int(city_id) for city_id in query['id'][0].split(',')]
+            body = {'cnt': len(ids), 'list': [weather_payload(city_id, f"City {city_id}") for city_id in ids]}
+        elif url.path == '/weather':
+            body = weather_payload(1, query['q'][0])
+        elif url.path == '/air_pollution':
+            body = {'coord': {'lat': 52.0, 'lon': 5.0}, 'list': [{'main': {'aqi': 2}, 'components': {}}]}
+        else:
+            body = {'city': {'name': query['q'][0]}, 'list': []}
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestCityRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.connection_string = f"sqlite:///{os.path.join(self.tmpdir.name, 'weather.db')}"
+
+    def tearDown(self):
+        get_engine(self.connection_string).dispose()
+        self.tmpdir.cleanup()
+
+    def test_seeds_and_learns_ids(self):
+        """Test that the registry seeds the NL cities and persists learned OpenWeather ids"""
+        registry = CityRegistry(self.connection_string)
+        self.assertEqual(len(registry.cities), len(SEED_CITIES))
+        self.assertEqual(registry.provinces['Maastricht'], 'Limburg')
+
+        learned = registry.learn([('Utrecht', weather_payload(2745912, 'Utrecht')), ('Atlantis', {})])
+        self.assertEqual(learned, 1)
+
+        reloaded = {city['name']: city for city in CityRegistry(self.connection_string).cities}
+        self.assertEqual(reloaded['Utrecht']['owm_id'], 2745912)
+        self.assertIsNone(reloaded['Amsterdam']['owm_id'])
+
+    def test_group_batches_hold_at_most_twenty_ids(self):
+        """Test that only cities with a known id are grouped, 20 per request"""
+        cities = [{'name': f"City {i}", 'owm_id': i if i % 10 else None} for i in range(50)]
+        self.assertEqual([len(batch) for batch in group_batches(cities)], [20, 20, 5])
+
+class TestGroupedExtraction(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), GroupStubHandler)
+        self.server.paths = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.patches = [
+            mock.patch('etl.extract.BASE_URL', f"{base_url}/weather"),
+            mock.patch('etl.extract.GROUP_URL', f"{base_url}/group"),
+            mock.patch('etl.air_quality.AIR_POLLUTION_URL', f"{base_url}/air_pollution"),
+            mock.patch('etl.air_quality.FORECAST_URL', f"{base_url}/forecast"),
+            mock.patch('etl.cache.response_cache', None),
+            mock.patch('etl.rate_limit.openweather_limiter', RateLimiter(10000, 8, period=1.0, burst=1000)),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_known_ids_use_one_group_request(self):
+        """Test that cities with ids share a group request and the rest fall back to /weather"""
+        cities = [{'name': f"City {i}", 'province': None, 'lat': 52.0, 'lon': 5.0, 'owm_id': i}
+                  for i in range(1, 17)]
+        cities.append({'name': 'Newtown', 'province': None, 'lat': None, 'lon': None, 'owm_id': None})
+
+        results = list(iter_city_results(cities))
+
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(self.server.paths.count('/group'), 1)
+        self.assertEqual(self.server.paths.count('/weather'), 1)
+        self.assertEqual(self.server.paths.count('/air_pollution'), 17)
+        self.assertEqual(results[0]['weather']['id'], 1)
+
+    def test_dataset_results_call_only_their_endpoint(self):
+        """Test that a single-dataset run requests only that endpoint and skips cities without coordinates"""
+        cities = [{'name': f"City {i}", 'province': None, 'lat': 52.0, 'lon': 5.0, 'owm_id': i}
+                  for i in range(1, 5)]
+        cities.append({'name': 'Newtown', 'province': None, 'lat': None, 'lon': None, 'owm_id': None})
+
+        results = list(iter_dataset_results(cities, 'air_quality'))
+
+        self.assertEqual(self.server.paths, ['/air_pollution'] * 4)
+        self.assertEqual([result['city'] for result in results], [f"City {i}" for i in range(1, 5)])
+        self.assertIsNone(results[0]['weather'])
+        self.assertEqual(results[0]['air_quality']['list'][0]['main']['aqi'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import json
+import random
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+import requests
+from etl.async_extract import extract_cities
+from etl.client import get_json
+from etl.rate_limit import RateLimiter
+from etl.resilience import RetryPolicy, CircuitBreaker, CircuitOpenError, parse_retry_after, reset_breakers
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FlakyStubHandler(BaseHTTPRequestHandler):
+    """Answers each path with the next status from its script, then 200"""
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        with self.server.lock:
+            self.server.calls.append(path)
+            script = self.server.scripts.get(path, [])
+            status = script.pop(0) if script else 200
+        body = json.dumps({'name': 'Stub', 'coord': {'lat': 52.0, 'lon': 5.0},
+                           'main': {'temp': 18.0, 'humidity': 70}, 'weather': [{'description': 'clear sky'}],
+                           'city': {'name': 'Stub'}, 'list': []}).encode()
+        self.send_response(status)
+        if status == 429:
+            self.send_header('Retry-After', '0')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_backoff_grows_with_full_jitter(self):
+        """Test that delays stay within [0, base * 2^attempt] capped at max_delay"""
+        policy = RetryPolicy(max_attempts=10, base_delay=0.5, max_delay=4.0, rng=random.Random(1))
+        for attempt in range(8):
+            delays = [policy.next_delay(attempt) for _ in range(200)]
+            self.assertTrue(all(0 <= delay <= min(4.0, 0.5 * 2 ** attempt) for delay in delays))
+        self.assertIsNone(policy.next_delay(9))
+
+    def test_retry_after_is_respected(self):
+        """Test that Retry-After raises the delay and an excessive one gives up"""
+        policy = RetryPolicy(max_attempts=3, base_delay=0.1, max_delay=30.0)
+        self.assertGreaterEqual(policy.next_delay(0, '7'), 7.0)
+        self.assertIsNone(policy.next_delay(0, '120'))
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+        self.assertIsNone(parse_retry_after('soon'))
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_opens_fails_fast_and_recovers(self):
+        """Test closed -> open -> half-open trial -> closed"""
+        clock = FakeClock()
+        breaker = CircuitBreaker('weather', failure_threshold=3, reset_timeout=30, clock=clock)
+        for _ in range(3):
+            breaker.before_call()
+            breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+        clock.now = 30
+        breaker.before_call()
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()  # only one trial at a time
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+
+        clock.now = 60
+        breaker.before_call()
+        breaker.record_success()
+        self.assertEqual((breaker.state, breaker.failures), ('closed', 0))
+
+class TestResilientClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyStubHandler)
+        self.server.lock = threading.Lock()
+        self.server.calls = []
+        self.server.scripts = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.policy = RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=1.0)
+        self.limiter = RateLimiter(10000, 8, period=1.0, burst=1000)
+        reset_breakers()
+        self.patches = [
+            mock.patch('etl.cache.response_cache', None),
+            mock.patch('etl.resilience.default_policy', self.policy),
+            mock.patch('etl.rate_limit.openweather_limiter', self.limiter),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        reset_breakers()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_transient_errors_are_retried(self):
+        """Test that a 503 and a 429 are retried until the request succeeds"""
+        self.server.scripts['/weather'] = [503, 429]
+
+        payload = get_json(f"{self.base_url}/weather", {'q': 'Stub'})
+
+        self.assertEqual(payload['name'], 'Stub')
+        self.assertEqual(self.server.calls, ['/weather'] * 3)
+
+    def test_client_errors_are_not_retried(self):
+        """Test that a 404 fails on the first attempt"""
+        self.server.scripts['/weather'] = [404]
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            get_json(f"{self.base_url}/weather", {'q': 'Atlantis'})
+        self.assertEqual(len(self.server.calls), 1)
+
+    def test_open_circuit_fails_fast(self):
+        """Test that an endpoint that keeps failing stops receiving requests"""
+        self.server.scripts['/forecast'] = [500] * 100
+
+        for _ in range(4):
+            with self.assertRaises((requests.exceptions.HTTPError, CircuitOpenError)):
+                get_json(f"{self.base_url}/forecast", {'q': 'Stub'})
+
+        # Five consecutive 500s open the circuit; nothing else reaches the server
+        self.assertEqual(len(self.server.calls), 5)
+        with self.assertRaises(CircuitOpenError):
+            get_json(f"{self.base_url}/forecast", {'q': 'Stub'})
+        self.assertEqual(get_json(f"{self.base_url}/weather", {'q': 'Stub'})['name'], 'Stub')
+
+    def test_async_client_retries(self):
+        """Test that the async client shares the retry policy"""
+        self.server.scripts['/weather'] = [502]
+        self.server.scripts['/forecast'] = [503]
+
+        results = extract_cities(['Stub'], base_url=self.base_url, api_key='test')
+
+        self.assertTrue(results[0]['success'])
+        self.assertEqual(results[0]['forecast']['city']['name'], 'Stub')
+        self.assertEqual(self.server.calls.count('/weather'), 2)
+        self.assertEqual(self.server.calls.count('/forecast'), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, text
+from dashboard import queries
+from db.engine import get_engine
+from db.models import WeatherData
+from etl.cache import MemoryCache
+from etl.load import load_batch
+from etl.rollups import WEATHER_AGGREGATES, hourly_rollup, daily_rollup, refresh_rollups
+from etl.registry import CityRegistry
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def weather_rows(timestamps, temperatures, city='Amsterdam', province='Noord-Holland'):
+    return pd.DataFrame({
+        'city': city, 'province': province, 'timestamp': pd.to_datetime(timestamps),
+        'temperature': temperatures, 'humidity': 70.0, 'wind_speed': 3.0, 'pressure': 1013.0,
+    })
+
+class TestRollupAggregation(unittest.TestCase):
+
+    def test_daily_means_are_weighted_by_samples(self):
+        """Test that a day's mean equals the mean of its readings, not of its hourly means"""
+        raw = weather_rows(['2025-07-01 10:05', '2025-07-01 10:35', '2025-07-01 10:50', '2025-07-01 14:00'],
+                           [10.0, 12.0, 14.0, 24.0])
+        hourly = hourly_rollup(raw, WEATHER_AGGREGATES, ['province'])
+
+        self.assertEqual(list(hourly['samples']), [3, 1])
+        self.assertEqual(list(hourly['temperature_avg']), [12.0, 24.0])
+
+        daily = daily_rollup(hourly, WEATHER_AGGREGATES, ['province'])
+        self.assertEqual(len(daily), 1)
+        self.assertEqual(daily.loc[0, 'samples'], 4)
+        self.assertEqual(daily.loc[0, 'temperature_avg'], 15.0)
+        self.assertEqual((daily.loc[0, 'temperature_min'], daily.loc[0, 'temperature_max']), (10.0, 24.0))
+        self.assertEqual(daily.loc[0, 'bucket'], pd.Timestamp('2025-07-01'))
+
+    def test_missing_metric_does_not_dilute_mean(self):
+        """Test that an hour without a value for a metric carries no weight for it"""
+        raw = weather_rows(['2025-07-01 10:00', '2025-07-01 11:00', '2025-07-01 11:30'], [10.0, np.nan, np.nan])
+        daily = daily_rollup(hourly_rollup(raw, WEATHER_AGGREGATES, ['province']), WEATHER_AGGREGATES, ['province'])
+
+        self.assertEqual(daily.loc[0, 'temperature_avg'], 10.0)
+        self.assertEqual(daily.loc[0, 'humidity_avg'], 70.0)
+
+    def test_province_rollups_weight_cities_by_samples(self):
+        """Test that a province mean counts every reading of every city once"""
+        raw = pd.concat([weather_rows(['2025-07-01 10:00'] * 3, [10.0, 10.0, 10.0]),
+                         weather_rows(['2025-07-01 10:10'], [30.0], city='Haarlem')], ignore_index=True)
+        provinces = queries.province_rollups(hourly_rollup(raw, WEATHER_AGGREGATES, ['province']))
+
+        self.assertEqual(len(provinces), 1)
+        self.assertEqual(provinces.loc[0, 'samples'], 4)
+        self.assertEqual(provinces.loc[0, 'temperature_avg'], 15.0)
+        self.assertEqual(provinces.loc[0, 'temperature_max'], 30.0)
+
+class TestRefreshRollups(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.connection_string = f"sqlite:///{os.path.join(self.tmpdir.name, 'weather.db')}"
+
+    def tearDown(self):
+        get_engine(self.connection_string).dispose()
+        self.tmpdir.cleanup()
+
+    def _rollups(self, granularity):
+        with get_engine(self.connection_string).connect() as conn:
+            return conn.execute(text(
+                "SELECT bucket, samples, temperature_avg FROM weather_rollups WHERE granularity = :g ORDER BY bucket"
+            ), {'g': granularity}).fetchall()
+
+    def test_incremental_refresh_merges_into_existing_buckets(self):
+        """Test that later runs update their hour and day in place"""
+        load_batch({'weather_data': weather_rows(['2025-07-01 09:10', '2025-07-01 10:05'], [10.0, 20.0])},
+                   self.connection_string)
+        refresh_rollups(self.connection_string, datetime(2025, 7, 1, 9, 0))
+
+        load_batch({'weather_data': weather_rows(['2025-07-01 10:40'], [30.0])}, self.connection_string)
+        refresh_rollups(self.connection_string, datetime(2025, 7, 1, 10, 40))
+        # Refreshing the same window again changes nothing
+        refresh_rollups(self.connection_string, datetime(2025, 7, 1, 10, 40))
+
+        hours = self._rollups('hour')
+        self.assertEqual([(row[1], row[2]) for row in hours], [(1, 10.0), (2, 25.0)])
+        days = self._rollups('day')
+        self.assertEqual([(row[1], row[2]) for row in days], [(3, 20.0)])
+
+    def test_refresh_without_new_rows_is_a_no_op(self):
+        """Test that an empty window writes nothing"""
+        self.assertEqual(refresh_rollups(self.connection_string, datetime(2025, 7, 1)), {})
+
+class TestDashboardQueries(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.connection_string = f"sqlite:///{os.path.join(self.tmpdir.name, 'weather.db')}"
+        now = datetime.utcnow().replace(microsecond=0)
+        readings = [weather_rows([now], [20.0], city=city, province=province)
+                    for city, province in [('Amsterdam', 'Noord-Holland'), ('Haarlem', 'Noord-Holland'),
+                                           ('Utrecht', 'Utrecht'), ('Zwolle', 'Overijssel')]]
+        load_batch({
+            'weather_data': pd.concat(readings, ignore_index=True),
+            'air_quality': pd.DataFrame({'city': ['Amsterdam', 'Utrecht'], 'aqi': [2, 3], 'timestamp': [now, now]}),
+        }, self.connection_string)
+        CityRegistry(self.connection_string).load()  # seeds the Dutch cities with their provinces
+        refresh_rollups(self.connection_string, now)
+        patch = mock.patch('dashboard.queries._cache', MemoryCache(max_entries=8))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        get_engine(self.connection_string).dispose()
+        self.tmpdir.cleanup()
+
+    def test_filters_are_applied_by_the_database(self):
+        """Test that city and province filters select rows server-side, also for tables without a province"""
+        weather = queries.load_weather_rollups(self.connection_string, 1, 'hour', provinces=['Noord-Holland'])
+        self.assertEqual(sorted(weather['city']), ['Amsterdam', 'Haarlem'])
+
+        recent = queries.load_recent_weather(self.connection_string, 20, cities=['Zwolle'])
+        self.assertEqual(list(recent['city']), ['Zwolle'])
+
+        air_quality = queries.load_air_quality_rollups(self.connection_string, 1, provinces=['Utrecht'])
+        self.assertEqual(list(air_quality['city']), ['Utrecht'])
+
+    def test_chunks_are_compacted(self):
+        """Test that chunked reads return only the projected columns as float32 and categoricals"""
+        table = WeatherData.__table__
+        frame = queries.read_frame(self.connection_string,
+                                   select(table.c.city, table.c.province, table.c.temperature).order_by(table.c.city),
+                                   chunk_size=1)
+
+        self.assertEqual(list(frame.columns), ['city', 'province', 'temperature'])
+        self.assertEqual(list(frame['city']), ['Amsterdam', 'Haarlem', 'Utrecht', 'Zwolle'])
+        self.assertIsInstance(frame['city'].dtype, pd.CategoricalDtype)
+        self.assertIsInstance(frame['province'].dtype, pd.CategoricalDtype)
+        self.assertEqual(frame['temperature'].dtype, np.float32)
+
+class TestDashboardCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patch = mock.patch('dashboard.queries._cache', MemoryCache(max_entries=8, clock=self.clock))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_results_are_reused_until_ttl_expires(self):
+        """Test that reruns within the TTL skip the database and new parameters do not"""
+        loader = mock.Mock(side_effect=lambda: pd.DataFrame({'calls': [loader.call_count]}))
+
+        first = queries.cached('weather_rollups', {'days': 7}, loader, ttl=60)
+        self.clock.now = 59
+        self.assertIs(queries.cached('weather_rollups', {'days': 7}, loader, ttl=60), first)
+        self.assertEqual(loader.call_count, 1)
+
+        queries.cached('weather_rollups', {'days': 30}, loader, ttl=60)
+        self.assertEqual(loader.call_count, 2)
+
+        self.clock.now = 61
+        queries.cached('weather_rollups', {'days': 7}, loader, ttl=60)
+        self.assertEqual(loader.call_count, 3)
+
+if __name__ == '__main__':
+    unittest.main()
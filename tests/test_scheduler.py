@@ -0,0 +1,97 @@
+import random
+import threading
+import unittest
+from etl.scheduler import Scheduler
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = Scheduler(max_workers=2, clock=self.clock, rng=random.Random(7))
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+    def wait_idle(self):
+        for job in self.scheduler.jobs:
+            while job.running:
+                threading.Event().wait(0.01)
+
+    def test_slots_do_not_drift(self):
+        """Test that late wake-ups do not shift later runs off the interval grid"""
+        job = self.scheduler.add_job('weather', lambda: None, 600, jitter=0)
+
+        starts = []
+        for late in [0, 45, 130, 5]:
+            self.clock.now = job.next_run + late
+            if self.scheduler.run_pending():
+                starts.append(job.next_run - job.interval)
+            self.wait_idle()
+
+        self.assertEqual(starts, [1000, 1600, 2200, 2800])
+        self.assertEqual(job.runs, 4)
+
+    def test_jitter_stays_inside_the_slot(self):
+        """Test that jittered starts fall between the slot start and the jitter bound"""
+        job = self.scheduler.add_job('forecast', lambda: None, 600, jitter=30, run_immediately=False)
+
+        for slot in range(1, 50):
+            offset = job.next_run - (job.anchor + slot * job.interval)
+            self.assertTrue(0 <= offset <= 30, offset)
+            self.clock.now = job.next_run
+            self.scheduler.run_pending()
+            self.wait_idle()
+
+    def test_running_job_is_not_started_twice(self):
+        """Test that an occurrence due while the previous run is still going is skipped"""
+        release = threading.Event()
+        job = self.scheduler.add_job('weather', release.wait, 60, jitter=0)
+
+        self.scheduler.run_pending()
+        self.clock.now += 60
+        self.assertEqual(self.scheduler.run_pending(), [])
+        release.set()
+        self.wait_idle()
+
+        self.assertEqual((job.runs, job.skipped), (1, 1))
+        self.assertEqual(job.next_run, 1120)
+
+    def test_catch_up_policies(self):
+        """Test how each policy handles three missed occurrences"""
+        counts = {'skip': [], 'once': [], 'all': []}
+        jobs = {policy: self.scheduler.add_job(policy, lambda policy=policy: counts[policy].append(1),
+                                               60, jitter=0, catch_up=policy, run_immediately=False)
+                for policy in counts}
+
+        self.clock.now += 3 * 60 + 10
+        started = self.scheduler.run_pending()
+        self.wait_idle()
+
+        self.assertEqual(sorted(started), ['all', 'once'])
+        self.assertEqual({policy: len(runs) for policy, runs in counts.items()}, {'skip': 0, 'once': 1, 'all': 3})
+        self.assertEqual(jobs['skip'].skipped, 3)
+        self.assertEqual(jobs['once'].skipped, 2)
+        self.assertTrue(all(job.next_run == 1240 for job in jobs.values()))
+
+    def test_failures_are_recorded_and_do_not_stop_the_job(self):
+        """Test that a failing run is counted and the job stays scheduled"""
+        def fail():
+            raise RuntimeError("API unavailable")
+
+        job = self.scheduler.add_job('air_quality', fail, 3600, jitter=0)
+        self.scheduler.run_pending()
+        self.wait_idle()
+
+        self.assertEqual(self.scheduler.stats()['air_quality']['failures'], 1)
+        self.assertEqual(job.last_error, "API unavailable")
+        self.assertEqual(self.scheduler.seconds_until_next(), 3600)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from db.engine import get_engine
+from etl.registry import CityRegistry, SEED_CITIES
+from etl import rate_limit
+from etl.sharding import create_run, acquire_lease, complete_lease, work, run_status, share_api_budget
+
+class TestShardLeases(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.connection_string = f"sqlite:///{os.path.join(self.tmpdir.name, 'weather.db')}"
+
+    def tearDown(self):
+        get_engine(self.connection_string).dispose()
+        self.tmpdir.cleanup()
+
+    def test_each_shard_is_leased_once(self):
+        """Test that concurrent owners never receive the same shard"""
+        run_id = create_run(self.connection_string, 3)
+
+        leases = [acquire_lease(self.connection_string, run_id, f"worker-{i}") for i in range(4)]
+
+        self.assertEqual(sorted(lease['shard'] for lease in leases[:3]), [0, 1, 2])
+        self.assertIsNone(leases[3])
+
+    def test_expired_lease_is_reclaimed(self):
+        """Test that a shard whose worker stopped renewing can be taken over"""
+        run_id = create_run(self.connection_string, 1)
+        acquire_lease(self.connection_string, run_id, 'crashed', lease_seconds=-1)
+
+        lease = acquire_lease(self.connection_string, run_id, 'rescuer')
+        self.assertEqual(lease['shard'], 0)
+
+        complete_lease(self.connection_string, lease, 'rescuer', {'succeeded': 5, 'cities': 5})
+        self.assertIsNone(acquire_lease(self.connection_string, run_id, 'late'))
+
+    def test_work_runs_every_shard_and_merges_stats(self):
+        """Test that a worker drains the run and the coordinator sums the shard statistics"""
+        run_id = create_run(self.connection_string, 3)
+
+        def fake_shard(connection_string, shard, shard_count):
+            if shard == 2:
+                raise RuntimeError("database unavailable")
+            return {'shard': shard, 'cities': 10, 'succeeded': 9, 'failed': [f"City {shard}"],
+                    'batches': 1, 'row_counts': {'weather_data': 9}, 'quality_issues': 0, 'load_errors': 0}
+
+        with mock.patch('etl.sharding.run_shard', side_effect=fake_shard):
+            completed = work(self.connection_string, run_id, owner='worker')
+
+        self.assertEqual(len(completed), 2)
+        merged = run_status(self.connection_string, run_id)
+        self.assertEqual(merged['status'], {'done': 2, 'failed': 1})
+        self.assertEqual(merged['succeeded'], 18)
+        self.assertEqual(merged['row_counts'], {'weather_data': 18})
+        self.assertEqual(merged['failed'], ['City 0', 'City 1'])
+        self.assertEqual(merged['errors'], ['database unavailable'])
+
+    def test_registry_shards_partition_the_cities(self):
+        """Test that registry shards are disjoint and cover every city"""
+        CityRegistry(self.connection_string).load()
+
+        shards = [{city['name'] for city in CityRegistry(self.connection_string, shard, 3).cities}
+                  for shard in range(3)]
+
+        self.assertEqual(sum(len(names) for names in shards), len(SEED_CITIES))
+        self.assertEqual(set().union(*shards), {city['name'] for city in SEED_CITIES})
+
+    def test_run_seeds_an_empty_registry_before_sharding(self):
+        """Test that shards of the first run on a fresh database find the seed cities"""
+        create_run(self.connection_string, 3)
+
+        shards = [CityRegistry(self.connection_string, shard, 3).cities for shard in range(3)]
+        self.assertEqual(sum(len(cities) for cities in shards), len(SEED_CITIES))
+
+    def test_api_budget_is_split_across_hosts_and_workers(self):
+        """Test that each worker gets its share of the quota divided over every host"""
+        self.addCleanup(setattr, rate_limit, 'openweather_limiter', rate_limit.openweather_limiter)
+        with mock.patch('etl.sharding.OPENWEATHER_CALLS_PER_MINUTE', 600):
+            share_api_budget(3, hosts=2)
+        self.assertEqual(rate_limit.openweather_limiter.window.calls_per_period, 100)
+        self.assertAlmostEqual(rate_limit.openweather_limiter.bucket.rate * 60, 100)
+
+if __name__ == '__main__':
+    unittest.main()
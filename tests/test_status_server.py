@@ -0,0 +1,90 @@
+import json
+import unittest
+from unittest import mock
+from urllib.error import HTTPError
+from urllib.request import urlopen
+from etl.scheduler import Scheduler
+from monitoring.metrics import MetricsRegistry
+from monitoring.server import StatusServer
+
+class CachedHealth:
+    """Stands in for HealthMonitor; only its cached result may be read"""
+
+    def __init__(self):
+        self.last_check = None
+
+    def log_health_check(self):
+        raise AssertionError("a probe ran a health check")
+
+def healthy(freshness='fresh'):
+    return {'timestamp': '2026-10-17T12:00:00', 'database': {'status': 'healthy'},
+            'data_freshness': {'status': freshness, 'age_hours': 0.5}, 'system_resources': {}}
+
+class TestStatusServer(unittest.TestCase):
+
+    def setUp(self):
+        self.health = CachedHealth()
+        self.registry = MetricsRegistry()
+        self.scheduler = Scheduler()
+        self.addCleanup(self.scheduler.shutdown)
+        self.server = StatusServer(self.health, self.scheduler, self.registry, host='127.0.0.1', port=0)
+        self.addCleanup(self.server.close)
+
+    def get(self, path):
+        try:
+            with urlopen(f"http://127.0.0.1:{self.server.port}{path}", timeout=5) as response:
+                return response.status, response.headers, response.read().decode()
+        except HTTPError as e:
+            return e.code, e.headers, e.read().decode()
+
+    def test_readiness_follows_cached_health_check(self):
+        """Test that readiness waits for the first check and reports an unreachable database"""
+        with mock.patch('sqlalchemy.engine.Engine.connect', side_effect=AssertionError("probe hit the database")):
+            status, _, body = self.get('/readyz')
+            self.assertEqual((status, json.loads(body)['status']), (503, 'starting'))
+
+            self.health.last_check = healthy()
+            status, _, body = self.get('/readyz')
+            self.assertEqual((status, json.loads(body)['status']), (200, 'ready'))
+
+            self.health.last_check = dict(healthy('very_stale'), database={'status': 'unhealthy'})
+            status, _, body = self.get('/readyz')
+            self.assertEqual(status, 503)
+            self.assertEqual(json.loads(body)['reasons'], ['database unreachable', 'data very_stale'])
+
+    def test_liveness_and_metrics(self):
+        """Test that liveness reflects the scheduler and metrics use the Prometheus text format"""
+        self.registry.histogram('load_seconds', 'Load time', ('table',)).observe(0.2, table='weather_data')
+        status, headers, body = self.get('/metrics')
+        self.assertEqual(status, 200)
+        self.assertTrue(headers['Content-Type'].startswith('text/plain'))
+        self.assertIn('load_seconds_count{table="weather_data"} 1', body)
+
+        self.assertEqual(self.get('/healthz')[0], 200)
+        self.scheduler.stop()
+        status, _, body = self.get('/healthz')
+        self.assertEqual((status, json.loads(body)['status']), (503, 'stopping'))
+
+    def test_latest_runs_are_published_summaries(self):
+        """Test that run summaries reach /runs/latest through the sink interface"""
+        self.assertEqual(self.get('/runs/latest')[0], 404)
+        self.server.publish({'run_id': 'a', 'job': 'weather', 'status': 'success'})
+        self.server.publish({'run_id': 'b', 'job': 'air_quality', 'status': 'failed'})
+
+        status, _, body = self.get('/runs/latest')
+        runs = json.loads(body)
+        self.assertEqual(status, 200)
+        self.assertEqual(runs['latest']['run_id'], 'b')
+        self.assertEqual(runs['jobs']['weather']['status'], 'success')
+
+    def test_scheduler_serves_metrics_only_here(self):
+        """Test that the scheduler does not start a second exporter next to the status server"""
+        from pipeline import build_scheduler
+        with mock.patch('monitoring.metrics.METRICS_SINKS', ['prometheus']), \
+                mock.patch('monitoring.metrics.PrometheusExporter') as exporter:
+            scheduler = build_scheduler('sqlite://', self.health, self.server)
+            scheduler.shutdown()
+        exporter.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
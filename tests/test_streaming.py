@@ -0,0 +1,83 @@
+import os
+import tempfile
+import time
+import unittest
+from sqlalchemy import text
+from db.engine import get_engine, ensure_schema
+from etl.streaming import StreamingPipeline
+
+def city_result(i: int) -> dict:
+    return {
+        'city': f"City {i}",
+        'weather': {
+            'name': f"City {i}",
+            'main': {'temp': 15.0, 'humidity': 70},
+            'weather': [{'description': 'clear sky'}],
+            'coord': {'lat': 52.0, 'lon': 5.0}
+        },
+        'air_quality': None,
+        'forecast': None,
+        'success': True
+    }
+
+class TestStreamingPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.connection_string = f"sqlite:///{os.path.join(self.tmpdir.name, 'weather.db')}"
+        ensure_schema(get_engine(self.connection_string))
+
+    def tearDown(self):
+        get_engine(self.connection_string).dispose()
+        self.tmpdir.cleanup()
+
+    def _count(self):
+        with get_engine(self.connection_string).connect() as conn:
+            return conn.execute(text("SELECT COUNT(*) FROM weather_data")).scalar()
+
+    def test_flushes_by_size(self):
+        """Test that results are loaded in micro-batches of at most batch_size cities"""
+        failed = {'city': 'Atlantis', 'error': 'not found', 'success': False}
+        source = [city_result(i) for i in range(120)] + [failed]
+        failures = []
+
+        stats = StreamingPipeline(self.connection_string, batch_size=50, flush_interval=10,
+                                  on_failure=failures.append).run(iter(source))
+
+        self.assertEqual(stats['batches'], 3)
+        self.assertEqual(stats['row_counts'], {'weather_data': 120})
+        self.assertEqual(stats['failed'], ['Atlantis'])
+        self.assertEqual(failures, [failed])
+        self.assertEqual(self._count(), 120)
+
+    def test_loading_overlaps_slow_extraction(self):
+        """Test that a partial batch is flushed by time and loaded while extraction continues"""
+        seen_while_extracting = []
+
+        def slow_source():
+            for i in range(3):
+                yield city_result(i)
+            # Wait for the first micro-batch to reach the database before finishing
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline and self._count() == 0:
+                time.sleep(0.05)
+            seen_while_extracting.append(self._count())
+            yield city_result(3)
+
+        stats = StreamingPipeline(self.connection_string, batch_size=50, flush_interval=0.2).run(slow_source())
+
+        self.assertEqual(seen_while_extracting, [3])
+        self.assertEqual(stats['batches'], 2)
+        self.assertEqual(self._count(), 4)
+
+    def test_stage_error_stops_pipeline(self):
+        """Test that an extraction error stops every stage and is raised to the caller"""
+        def broken_source():
+            yield city_result(0)
+            raise RuntimeError("upstream exploded")
+
+        with self.assertRaises(RuntimeError):
+            StreamingPipeline(self.connection_string, batch_size=1, flush_interval=0.1).run(broken_source())
+
+if __name__ == '__main__':
+    unittest.main()